@@ -6,6 +6,9 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 
 const AdminClients = () => {
   const [clientes, setClientes] = useState([]);
+  const [totalClientes, setTotalClientes] = useState(null);
+  const [proximo, setProximo] = useState(null);
+  const [loadingMais, setLoadingMais] = useState(false);
   const [loading, setLoading] = useState(true);
   const [message, setMessage] = useState(null);
 
@@ -15,23 +18,34 @@ const AdminClients = () => {
     fetchClientes();
   }, []);
 
-  const fetchClientes = async () => {
+  const fetchClientes = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/admin/clientes`, {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '?total=1';
+      const response = await fetch(`${API_BASE_URL}/admin/clientes${params}`, {
         credentials: 'include'
       });
       const data = await response.json();
       
       if (response.ok) {
-        setClientes(data);
+        setClientes(prev => cursor ? [...prev, ...data.itens] : data.itens);
+        setProximo(data.next);
+        if (!cursor) {
+          setTotalClientes(data.total);
+        }
       }
     } catch (error) {
       console.error('Erro ao carregar clientes:', error);
     } finally {
       setLoading(false);
+      setLoadingMais(false);
     }
   };
 
+  const carregarMais = () => {
+    setLoadingMais(true);
+    fetchClientes(proximo);
+  };
+
   const toggleClienteStatus = async (clienteId, novoStatus) => {
     try {
       const response = await fetch(`${API_BASE_URL}/admin/clientes/${clienteId}`, {
@@ -50,7 +64,7 @@ const AdminClients = () => {
           type: 'success',
           text: `Cliente ${novoStatus ? 'ativado' : 'desativado'} com sucesso!`
         });
-        fetchClientes();
+        setClientes(prev => prev.map(cliente => cliente.id === clienteId ? data.cliente : cliente));
       } else {
         setMessage({
           type: 'error',
@@ -187,6 +201,14 @@ const AdminClients = () => {
                   </div>
                 </div>
               ))}
+
+              {proximo && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={carregarMais} disabled={loadingMais}>
+                    {loadingMais ? 'Carregando...' : 'Carregar mais'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -199,7 +221,7 @@ const AdminClients = () => {
             <CardContent className="p-6">
               <div className="text-center">
                 <p className="text-2xl font-bold text-blue-600">
-                  {clientes.length}
+                  {totalClientes ?? clientes.length}
                 </p>
                 <p className="text-sm text-gray-600">Total de Clientes</p>
               </div>
@@ -19,6 +19,8 @@ import { Textarea } from '@/components/ui/textarea';
 
 const AdminProducts = () => {
   const [produtos, setProdutos] = useState([]);
+  const [proximo, setProximo] = useState(null);
+  const [loadingMais, setLoadingMais] = useState(false);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [editingProduct, setEditingProduct] = useState(null);
@@ -38,23 +40,31 @@ const AdminProducts = () => {
     fetchProdutos();
   }, []);
 
-  const fetchProdutos = async () => {
+  const fetchProdutos = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/produtos`, {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_BASE_URL}/produtos${params}`, {
         credentials: 'include'
       });
       const data = await response.json();
       
       if (response.ok) {
-        setProdutos(data);
+        setProdutos(prev => cursor ? [...prev, ...data.itens] : data.itens);
+        setProximo(data.next);
       }
     } catch (error) {
       console.error('Erro ao carregar produtos:', error);
     } finally {
       setLoading(false);
+      setLoadingMais(false);
     }
   };
 
+  const carregarMais = () => {
+    setLoadingMais(true);
+    fetchProdutos(proximo);
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setFormLoading(true);
@@ -391,6 +401,14 @@ const AdminProducts = () => {
                   </div>
                 </div>
               ))}
+
+              {proximo && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={carregarMais} disabled={loadingMais}>
+                    {loadingMais ? 'Carregando...' : 'Carregar mais'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -17,6 +17,8 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 
 const AdminSales = () => {
   const [vendas, setVendas] = useState([]);
+  const [proximo, setProximo] = useState(null);
+  const [loadingMais, setLoadingMais] = useState(false);
   const [estatisticas, setEstatisticas] = useState(null);
   const [loading, setLoading] = useState(true);
   const [message, setMessage] = useState(null);
@@ -28,23 +30,31 @@ const AdminSales = () => {
     fetchEstatisticas();
   }, []);
 
-  const fetchVendas = async () => {
+  const fetchVendas = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/admin/vendas`, {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_BASE_URL}/admin/vendas${params}`, {
         credentials: 'include'
       });
       const data = await response.json();
       
       if (response.ok) {
-        setVendas(data);
+        setVendas(prev => cursor ? [...prev, ...data.itens] : data.itens);
+        setProximo(data.next);
       }
     } catch (error) {
       console.error('Erro ao carregar vendas:', error);
     } finally {
       setLoading(false);
+      setLoadingMais(false);
     }
   };
 
+  const carregarMais = () => {
+    setLoadingMais(true);
+    fetchVendas(proximo);
+  };
+
   const fetchEstatisticas = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/admin/vendas/estatisticas`, {
@@ -78,7 +88,7 @@ const AdminSales = () => {
           type: 'success',
           text: 'Status da venda atualizado com sucesso!'
         });
-        fetchVendas();
+        setVendas(prev => prev.map(venda => venda.id === vendaId ? data.venda : venda));
         fetchEstatisticas();
       } else {
         setMessage({
@@ -355,6 +365,14 @@ const AdminSales = () => {
                   </div>
                 </div>
               ))}
+
+              {proximo && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={carregarMais} disabled={loadingMais}>
+                    {loadingMais ? 'Carregando...' : 'Carregar mais'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -14,6 +14,7 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 
 const AdminSettings = () => {
   const [config, setConfig] = useState({
@@ -25,7 +26,9 @@ const AdminSettings = () => {
     email_smtp_port: 587,
     email_usuario: '',
     email_senha: '',
-    email_remetente: ''
+    email_remetente: '',
+    modo_entrega: 'anexo',
+    validade_link_horas: 72
   });
   const [loading, setLoading] = useState(true);
   const [saveLoading, setSaveLoading] = useState(false);
@@ -388,6 +391,40 @@ const AdminSettings = () => {
                 </p>
               </div>
 
+              <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+                <div className="space-y-2">
+                  <Label htmlFor="modo_entrega">Modo de Entrega do PDF</Label>
+                  <Select
+                    value={config.modo_entrega}
+                    onValueChange={(value) => handleChange('modo_entrega', value)}
+                  >
+                    <SelectTrigger id="modo_entrega">
+                      <SelectValue />
+                    </SelectTrigger>
+                    <SelectContent>
+                      <SelectItem value="anexo">PDF anexado ao email</SelectItem>
+                      <SelectItem value="link">Link de download com validade</SelectItem>
+                    </SelectContent>
+                  </Select>
+                  <p className="text-xs text-gray-500">
+                    O link mantém o email pequeno mesmo para PDFs grandes
+                  </p>
+                </div>
+
+                <div className="space-y-2">
+                  <Label htmlFor="validade_link_horas">Validade do Link (horas)</Label>
+                  <Input
+                    id="validade_link_horas"
+                    type="number"
+                    min="1"
+                    value={config.validade_link_horas}
+                    onChange={(e) => handleChange('validade_link_horas', parseInt(e.target.value))}
+                    placeholder="72"
+                    disabled={config.modo_entrega !== 'link'}
+                  />
+                </div>
+              </div>
+
               {/* Teste de Email */}
               <div className="border-t pt-4">
                 <h4 className="font-medium mb-3 flex items-center space-x-2">
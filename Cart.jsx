@@ -27,7 +27,7 @@ const Cart = () => {
     updateQuantity(produtoId, novaQuantidade);
   };
 
-  const handlePurchase = async (produto) => {
+  const handlePurchase = async () => {
     if (!user) {
       navigate('/login', { state: { from: { pathname: '/carrinho' } } });
       return;
@@ -37,13 +37,14 @@ const Cart = () => {
     setPurchaseStatus(null);
 
     try {
-      const response = await fetch(`${API_BASE_URL}/vendas/comprar`, {
+      // Todo o carrinho em um único pedido
+      const response = await fetch(`${API_BASE_URL}/vendas/pedido`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         credentials: 'include',
-        body: JSON.stringify({ produto_id: produto.id }),
+        body: JSON.stringify({ produto_ids: cartItems.map((item) => item.id) }),
       });
 
       const data = await response.json();
@@ -52,13 +53,13 @@ const Cart = () => {
         setPurchaseStatus({
           type: 'success',
           message: 'Compra realizada com sucesso!',
-          details: data.email_enviado 
-            ? 'O PDF foi enviado para seu email.' 
-            : 'Houve um problema no envio do email, mas você pode baixar o produto em seu perfil.'
+          details: data.email_enviado || data.email_agendado
+            ? 'Os PDFs serão enviados para seu email em instantes.' 
+            : 'Houve um problema no envio do email, mas você pode baixar os produtos em seu perfil.'
         });
         
-        // Remover produto do carrinho após compra bem-sucedida
-        removeFromCart(produto.id);
+        // Esvaziar o carrinho após compra bem-sucedida
+        clearCart();
       } else {
         setPurchaseStatus({
           type: 'error',
@@ -225,24 +226,6 @@ const Cart = () => {
                         <Trash2 size={14} className="mr-1" />
                         Remover
                       </Button>
-
-                      <Button
-                        onClick={() => handlePurchase(produto)}
-                        disabled={loading}
-                        size="sm"
-                      >
-                        {loading ? (
-                          <div className="flex items-center">
-                            <div className="animate-spin rounded-full h-3 w-3 border-b-2 border-white mr-2"></div>
-                            Comprando...
-                          </div>
-                        ) : (
-                          <>
-                            <CreditCard size={14} className="mr-1" />
-                            Comprar Agora
-                          </>
-                        )}
-                      </Button>
                     </div>
                   </div>
                 </div>
@@ -277,13 +260,31 @@ const Cart = () => {
 
               <div className="space-y-2">
                 <p className="text-xs text-gray-500 text-center">
-                  * Cada produto será processado individualmente
+                  * Todos os produtos são processados em um único pedido
                 </p>
                 <p className="text-xs text-gray-500 text-center">
-                  * Os PDFs serão enviados por email após a compra
+                  * Os PDFs serão enviados em um único email após a compra
                 </p>
               </div>
 
+              <Button
+                className="w-full"
+                onClick={handlePurchase}
+                disabled={loading}
+              >
+                {loading ? (
+                  <div className="flex items-center">
+                    <div className="animate-spin rounded-full h-3 w-3 border-b-2 border-white mr-2"></div>
+                    Comprando...
+                  </div>
+                ) : (
+                  <>
+                    <CreditCard size={14} className="mr-1" />
+                    Finalizar Compra
+                  </>
+                )}
+              </Button>
+
               <Button
                 variant="outline"
                 className="w-full"
@@ -1,13 +1,18 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { ShoppingCart, FileText, Star } from 'lucide-react';
+import { ShoppingCart, FileText, Star, Search } from 'lucide-react';
 import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
 import { Card, CardContent, CardFooter, CardHeader } from '@/components/ui/card';
 import { useCart } from '../contexts/CartContext';
 import { useAuth } from '../contexts/AuthContext';
 
 const ProductList = () => {
   const [produtos, setProdutos] = useState([]);
+  const [proximo, setProximo] = useState(null);
+  const [loadingMais, setLoadingMais] = useState(false);
+  const [busca, setBusca] = useState('');
+  const [termoBusca, setTermoBusca] = useState('');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const { addToCart } = useCart();
@@ -19,13 +24,19 @@ const ProductList = () => {
     fetchProdutos();
   }, []);
 
-  const fetchProdutos = async () => {
+  const fetchProdutos = async (cursor = null, termo = termoBusca) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/produtos`);
+      const params = new URLSearchParams();
+      if (termo) params.set('q', termo);
+      if (cursor) params.set('cursor', cursor);
+      const caminho = termo ? '/produtos/busca' : '/produtos';
+      const query = params.toString();
+      const response = await fetch(`${API_BASE_URL}${caminho}${query ? `?${query}` : ''}`);
       const data = await response.json();
       
       if (response.ok) {
-        setProdutos(data);
+        setProdutos(prev => cursor ? [...prev, ...data.itens] : data.itens);
+        setProximo(data.next);
       } else {
         setError(data.erro || 'Erro ao carregar produtos');
       }
@@ -33,14 +44,42 @@ const ProductList = () => {
       setError('Erro de conexão');
     } finally {
       setLoading(false);
+      setLoadingMais(false);
     }
   };
 
+  const carregarMais = () => {
+    setLoadingMais(true);
+    fetchProdutos(proximo);
+  };
+
+  const handleBusca = (e) => {
+    e.preventDefault();
+    const termo = busca.trim();
+    setTermoBusca(termo);
+    setLoading(true);
+    fetchProdutos(null, termo);
+  };
+
   const handleAddToCart = (produto) => {
     addToCart(produto);
     // Você pode adicionar uma notificação aqui
   };
 
+  // Miniaturas geradas no servidor; até ficarem prontas, usa a imagem original
+  const capaProps = (produto) => {
+    if (!produto.miniaturas) {
+      return { src: produto.imagem_capa };
+    }
+    const { versao, larguras } = produto.miniaturas;
+    const url = (largura) => `${API_BASE_URL}/produtos/${produto.id}/capa/${largura}?v=${versao}`;
+    return {
+      src: url(larguras[Math.min(1, larguras.length - 1)]),
+      srcSet: larguras.map((largura) => `${url(largura)} ${largura}w`).join(', '),
+      sizes: '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw'
+    };
+  };
+
   const formatPrice = (price) => {
     return new Intl.NumberFormat('pt-BR', {
       style: 'currency',
@@ -64,14 +103,14 @@ const ProductList = () => {
           <p className="text-lg font-semibold">Erro ao carregar produtos</p>
           <p className="text-sm">{error}</p>
         </div>
-        <Button onClick={fetchProdutos} variant="outline">
+        <Button onClick={() => fetchProdutos()} variant="outline">
           Tentar novamente
         </Button>
       </div>
     );
   }
 
-  if (produtos.length === 0) {
+  if (produtos.length === 0 && !termoBusca) {
     return (
       <div className="text-center py-12">
         <FileText size={48} className="mx-auto mb-4 text-gray-400" />
@@ -94,8 +133,27 @@ const ProductList = () => {
         <p className="text-gray-600">
           Descubra nossa coleção de PDFs digitais de alta qualidade
         </p>
+
+        <form onSubmit={handleBusca} className="mt-4 flex gap-2 max-w-xl">
+          <Input
+            value={busca}
+            onChange={(e) => setBusca(e.target.value)}
+            placeholder="Buscar por título ou descrição"
+            className="flex-1"
+          />
+          <Button type="submit" variant="outline">
+            <Search size={16} className="mr-2" />
+            Buscar
+          </Button>
+        </form>
       </div>
 
+      {termoBusca && produtos.length === 0 && (
+        <p className="text-center text-gray-500 py-12">
+          Nenhum produto encontrado para "{termoBusca}"
+        </p>
+      )}
+
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
         {produtos.map((produto) => (
           <Card key={produto.id} className="group hover:shadow-lg transition-shadow duration-300">
@@ -103,8 +161,10 @@ const ProductList = () => {
               <div className="relative overflow-hidden rounded-t-lg bg-gradient-to-br from-blue-50 to-indigo-100 h-48 flex items-center justify-center">
                 {produto.imagem_capa ? (
                   <img 
-                    src={produto.imagem_capa} 
+                    {...capaProps(produto)}
                     alt={produto.nome}
+                    loading="lazy"
+                    decoding="async"
                     className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-300"
                   />
                 ) : (
@@ -157,6 +217,14 @@ const ProductList = () => {
         ))}
       </div>
 
+      {proximo && (
+        <div className="flex justify-center mt-8">
+          <Button variant="outline" onClick={carregarMais} disabled={loadingMais}>
+            {loadingMais ? 'Carregando...' : 'Carregar mais produtos'}
+          </Button>
+        </div>
+      )}
+
       {!user && (
         <div className="mt-8 p-4 bg-blue-50 border border-blue-200 rounded-lg text-center">
           <p className="text-blue-800 mb-2">
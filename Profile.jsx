@@ -9,6 +9,8 @@ import { useAuth } from '../contexts/AuthContext';
 const Profile = () => {
   const { user, updateProfile } = useAuth();
   const [compras, setCompras] = useState([]);
+  const [proximo, setProximo] = useState(null);
+  const [loadingMais, setLoadingMais] = useState(false);
   const [loading, setLoading] = useState(true);
   const [editMode, setEditMode] = useState(false);
   const [editData, setEditData] = useState({
@@ -30,23 +32,31 @@ const Profile = () => {
     }
   }, [user]);
 
-  const fetchCompras = async () => {
+  const fetchCompras = async (cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/vendas/minhas-compras`, {
+      const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_BASE_URL}/vendas/minhas-compras${params}`, {
         credentials: 'include'
       });
       const data = await response.json();
       
       if (response.ok) {
-        setCompras(data);
+        setCompras(prev => cursor ? [...prev, ...data.itens] : data.itens);
+        setProximo(data.next);
       }
     } catch (error) {
       console.error('Erro ao carregar compras:', error);
     } finally {
       setLoading(false);
+      setLoadingMais(false);
     }
   };
 
+  const carregarMais = () => {
+    setLoadingMais(true);
+    fetchCompras(proximo);
+  };
+
   const handleReenviarEmail = async (vendaId) => {
     try {
       const response = await fetch(`${API_BASE_URL}/vendas/${vendaId}/reenviar-email`, {
@@ -56,7 +66,7 @@ const Profile = () => {
       const data = await response.json();
       
       setMessage({
-        type: data.email_enviado ? 'success' : 'error',
+        type: data.email_enviado || data.email_agendado ? 'success' : 'error',
         text: data.mensagem_email || data.mensagem
       });
       
@@ -339,6 +349,14 @@ const Profile = () => {
                   </div>
                 </div>
               ))}
+
+              {proximo && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={carregarMais} disabled={loadingMais}>
+                    {loadingMais ? 'Carregando...' : 'Carregar mais'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
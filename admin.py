@@ -1,5 +1,13 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.store import db, Administrador, ConfiguracaoLoja
+from flask import Blueprint, request, jsonify, session, current_app
+from src.models.store import db, Administrador, ConfiguracaoLoja, Cliente, Venda
+from src.utils.cache_configuracao import configuracao_loja, invalidar_configuracao
+from src.utils.cache_catalogo import responder
+from src.utils.exportacao import (
+    parametros_exportacao, filtrar_periodo, responder_exportacao, sem_indice, ErroExportacao
+)
+from src.utils.senhas import (
+    ErroSenhas, responder_erro, verificar_limites, registrar_falha, limpar_falhas, atualizar_hash
+)
 from functools import wraps
 
 admin_bp = Blueprint('admin', __name__)
@@ -22,10 +30,19 @@ def login_admin():
         if not data or not data.get('usuario') or not data.get('senha'):
             return jsonify({'erro': 'Usuário e senha são obrigatórios'}), 400
         
+        conta = f"admin:{data['usuario']}"
+        verificar_limites(conta)
+        
         admin = Administrador.query.filter_by(usuario=data['usuario'], ativo=True).first()
         
         if not admin or not admin.check_senha(data['senha']):
+            registrar_falha(conta)
             return jsonify({'erro': 'Usuário ou senha incorretos'}), 401
+        limpar_falhas(conta)
+        
+        # Hashes antigos passam para o método e custo configurados
+        if atualizar_hash(admin, data['senha']):
+            db.session.commit()
         
         # Criar sessão administrativa
         session['admin_id'] = admin.id
@@ -35,6 +52,8 @@ def login_admin():
             'mensagem': 'Login administrativo realizado com sucesso',
             'admin': admin.to_dict()
         }), 200
+    except ErroSenhas as e:
+        return responder_erro(e)
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -93,6 +112,9 @@ def criar_admin():
             'admin': admin.to_dict()
         }), 201
         
+    except ErroSenhas as e:
+        db.session.rollback()
+        return responder_erro(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -102,12 +124,13 @@ def criar_admin():
 def obter_configuracao():
     """Obtém as configurações da loja"""
     try:
-        config = ConfiguracaoLoja.query.first()
-        if not config:
+        config = configuracao_loja()
+        if config.id is None:
             # Criar configuração padrão se não existir
-            config = ConfiguracaoLoja()
-            db.session.add(config)
+            db.session.add(ConfiguracaoLoja())
             db.session.commit()
+            invalidar_configuracao()
+            config = configuracao_loja()
         
         return jsonify(config.to_dict()), 200
     except Exception as e:
@@ -146,8 +169,21 @@ def atualizar_configuracao():
             config.email_senha = data['email_senha']
         if 'email_remetente' in data:
             config.email_remetente = data['email_remetente']
-        
+        if 'modo_entrega' in data:
+            if data['modo_entrega'] not in ('anexo', 'link'):
+                return jsonify({'erro': 'Modo de entrega deve ser "anexo" ou "link"'}), 400
+            config.modo_entrega = data['modo_entrega']
+        if 'validade_link_horas' in data:
+            validade = data['validade_link_horas']
+            # Aceita 48 ou "48"; 0 ou negativo faria todo link já nascer expirado
+            if isinstance(validade, bool) or not str(validade).strip().isdigit() or int(validade) < 1:
+                return jsonify({'erro': 'Validade do link deve ser um número inteiro positivo de horas'}), 400
+            config.validade_link_horas = int(validade)
+        
+        # Os outros processos percebem a nova versão e recarregam a configuração
+        config.versao = (config.versao or 0) + 1
         db.session.commit()
+        invalidar_configuracao()
         
         return jsonify({
             'mensagem': 'Configurações atualizadas com sucesso',
@@ -167,12 +203,12 @@ def testar_email():
         if not data or not data.get('email_teste'):
             return jsonify({'erro': 'Email de teste é obrigatório'}), 400
         
-        config = ConfiguracaoLoja.query.first()
-        if not config or not config.email_smtp_host:
+        config = configuracao_loja()
+        if not config.email_smtp_host:
             return jsonify({'erro': 'Configurações de email não encontradas'}), 400
         
-        import smtplib
         from email.mime.text import MIMEText
+        from src.utils.smtp_pool import obter_pool
         
         # Criar mensagem de teste
         msg = MIMEText('Este é um email de teste da sua loja de PDFs.')
@@ -180,12 +216,8 @@ def testar_email():
         msg['From'] = config.email_remetente or config.email_usuario
         msg['To'] = data['email_teste']
         
-        # Tentar enviar
-        server = smtplib.SMTP(config.email_smtp_host, config.email_smtp_port)
-        server.starttls()
-        server.login(config.email_usuario, config.email_senha)
-        server.send_message(msg)
-        server.quit()
+        # Tentar enviar pelo pool de sessões SMTP
+        obter_pool(config).enviar(msg)
         
         return jsonify({'mensagem': 'Email de teste enviado com sucesso'}), 200
         
@@ -197,27 +229,23 @@ def testar_email():
 def dashboard():
     """Obtém dados do dashboard administrativo"""
     try:
-        from src.models.store import Produto, Cliente, Venda
-        from sqlalchemy import func
+        from src.models.store import Produto, Cliente
+        from src.utils.resumos_vendas import totais_vendas, vendas_desde, produtos_mais_vendidos as mais_vendidos
         from datetime import datetime, timedelta
         
         # Contadores gerais
         total_produtos = Produto.query.filter_by(ativo=True).count()
         total_clientes = Cliente.query.filter_by(ativo=True).count()
-        total_vendas = Venda.query.count()
         
-        # Receita total
-        receita_total = db.session.query(func.sum(Venda.preco_total)).scalar() or 0
+        # Totais de vendas e receita, lidos dos resumos
+        total_vendas, receita_total = totais_vendas()
         
         # Vendas dos últimos 30 dias
         data_limite = datetime.utcnow() - timedelta(days=30)
-        vendas_recentes = Venda.query.filter(Venda.data_venda >= data_limite).count()
+        vendas_recentes = vendas_desde(data_limite.date())
         
         # Produtos mais vendidos
-        produtos_mais_vendidos = db.session.query(
-            Produto.nome,
-            func.count(Venda.id).label('total_vendas')
-        ).join(Venda).group_by(Produto.id, Produto.nome).order_by(func.count(Venda.id).desc()).limit(5).all()
+        produtos_mais_vendidos = mais_vendidos(5)
         
         return jsonify({
             'total_produtos': total_produtos,
@@ -225,10 +253,7 @@ def dashboard():
             'total_vendas': total_vendas,
             'receita_total': float(receita_total),
             'vendas_recentes': vendas_recentes,
-            'produtos_mais_vendidos': [
-                {'nome': nome, 'total_vendas': total}
-                for nome, total in produtos_mais_vendidos
-            ]
+            'produtos_mais_vendidos': produtos_mais_vendidos
         }), 200
         
     except Exception as e:
@@ -239,16 +264,70 @@ def dashboard():
 def configuracao_publica():
     """Obtém configurações públicas da loja"""
     try:
-        config = ConfiguracaoLoja.query.first()
-        if not config:
-            config = ConfiguracaoLoja()
-        
-        return jsonify({
-            'nome_loja': config.nome_loja,
-            'cor_primaria': config.cor_primaria,
-            'cor_secundaria': config.cor_secundaria,
-            'logo_path': config.logo_path
-        }), 200
+        # Em memória, com ETag: o cabeçalho da loja pede isto a cada página
+        return responder(
+            configuracao_loja().publica,
+            cache_control=f"public, max-age={current_app.config.get('CONFIGURACAO_PUBLICA_MAX_AGE', 60)}"
+        )
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+COLUNAS_EXPORTACAO_VENDAS = [
+    'id', 'data_venda', 'id_pedido', 'id_cliente', 'cliente_nome', 'id_produto',
+    'produto_nome', 'preco_total', 'status', 'email_enviado'
+]
+COLUNAS_EXPORTACAO_CLIENTES = ['id', 'nome', 'email', 'ativo', 'data_cadastro']
+STATUS_VENDA = ('pendente', 'concluida', 'cancelada')
+
+@admin_bp.route('/admin/vendas/exportar', methods=['GET'])
+@admin_required
+def exportar_vendas():
+    """Exporta as vendas em CSV ou NDJSON, em streaming.
+
+    Filtros: ?inicio=&fim= (data da venda) e ?status=concluida,cancelada.
+    """
+    try:
+        formato, inicio, fim = parametros_exportacao()
+        query = filtrar_periodo(Venda.query, Venda.data_venda, inicio, fim)
+        
+        status = [s.strip() for s in request.args.get('status', '').split(',') if s.strip()]
+        invalidos = [s for s in status if s not in STATUS_VENDA]
+        if invalidos:
+            return jsonify({'erro': f'Status deve ser um dos: {", ".join(STATUS_VENDA)}'}), 400
+        if status:
+            query = query.filter(sem_indice(Venda.status).in_(status))
+        
+        query = Venda.consulta_lista(query).order_by(Venda.data_venda, Venda.id)
+        return responder_exportacao(query, Venda.linha_to_dict, COLUNAS_EXPORTACAO_VENDAS, formato, 'vendas')
+    except ErroExportacao as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+@admin_bp.route('/admin/clientes/exportar', methods=['GET'])
+@admin_required
+def exportar_clientes():
+    """Exporta os clientes em CSV ou NDJSON, em streaming.
+
+    Filtros: ?inicio=&fim= (data de cadastro) e ?ativo=true|false.
+    """
+    try:
+        formato, inicio, fim = parametros_exportacao()
+        query = filtrar_periodo(Cliente.query, Cliente.data_cadastro, inicio, fim)
+        
+        ativo = request.args.get('ativo')
+        if ativo is not None:
+            if ativo not in ('true', 'false'):
+                return jsonify({'erro': 'ativo deve ser true ou false'}), 400
+            query = query.filter(sem_indice(Cliente.ativo) == (ativo == 'true'))
+        
+        query = query.with_entities(
+            *(getattr(Cliente, coluna) for coluna in COLUNAS_EXPORTACAO_CLIENTES)
+        ).order_by(Cliente.data_cadastro, Cliente.id)
+        return responder_exportacao(
+            query, lambda linha: linha._asdict(), COLUNAS_EXPORTACAO_CLIENTES, formato, 'clientes'
+        )
+    except ErroExportacao as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
@@ -0,0 +1,328 @@
+"""Armazenamento dos PDFs e imagens dos produtos.
+
+Os arquivos são identificados por uma chave ('ab/abcdef....pdf', relativa à
+raiz do backend) e acessados só por esta interface, então vários nós do app
+podem compartilhar os mesmos arquivos:
+
+- ArmazenamentoLocal: um diretório do disco (UPLOAD_DIR, que pode ser um
+  volume compartilhado). Caminhos absolutos dentro dele, gravados nos
+  produtos antes das chaves, continuam válidos;
+- ArmazenamentoS3: um bucket S3 ou compatível (MinIO, Ceph, R2), com URLs
+  assinadas para o download sair direto do bucket. Requer o boto3.
+
+Tamanho, ETag e data de cada chave ficam num cache em memória (os arquivos
+são gravados por conteúdo e não mudam), então downloads e anexos não fazem
+stat nem HEAD a cada requisição.
+"""
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from flask import current_app
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as ConfigBotocore
+    from botocore.exceptions import ClientError
+except ImportError:  # opcional: só o backend S3 precisa
+    boto3 = None
+    TransferConfig = None
+
+    class ClientError(Exception):
+        """Mesma interface do erro do botocore, para clientes injetados sem o boto3"""
+
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"{error_response.get('Error', {}).get('Code')} ({operation_name})")
+            self.response = error_response
+            self.operation_name = operation_name
+
+TAMANHO_BLOCO = 64 * 1024
+
+Metadados = namedtuple('Metadados', ['tamanho', 'etag', 'modificado_em', 'mimetype'])
+
+class ErroArmazenamento(Exception):
+    """Backend de armazenamento mal configurado"""
+
+def chave_conteudo(digest, ext):
+    """Chave do arquivo a partir do seu SHA-256"""
+    nome = f'{digest}.{ext}' if ext else digest
+    return f'{digest[:2]}/{nome}'
+
+def nome_arquivo(chave):
+    return os.path.basename(chave)
+
+def nome_para_cliente(titulo, chave):
+    """Nome do arquivo entregue ao cliente: o título do produto com a extensão
+    da chave, já que o nome da chave é o hash do conteúdo. Sem título, usa o
+    nome da chave."""
+    base = re.sub(r'[\x00-\x1f\x7f/\\:*?"<>|]+', ' ', titulo or '')
+    base = ' '.join(base.split()).strip('.')[:150].strip()
+    if not base:
+        return nome_arquivo(chave)
+    return base + os.path.splitext(nome_arquivo(chave))[1]
+
+def _mimetype(chave):
+    return mimetypes.guess_type(nome_arquivo(chave))[0] or 'application/octet-stream'
+
+class CacheMetadados:
+    """Metadados por chave na memória do processo, com TTL e despejo LRU.
+
+    Só arquivos existentes entram no cache. Gravações e remoções feitas pelo
+    processo descartam a chave na hora; o TTL limita por quanto tempo uma
+    substituição feita por outro nó passa despercebida.
+    """
+
+    def __init__(self, ttl=300, max_entradas=10000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # chave -> (expira_em, Metadados)
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._entradas.get(chave)
+            if item and item[0] > agora:
+                self._entradas.move_to_end(chave)
+                return item[1]
+
+        metadados = gerar()
+        if metadados is not None:
+            with self._lock:
+                self._entradas[chave] = (agora + self.ttl, metadados)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return metadados
+
+    def descartar(self, chave):
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+class ArmazenamentoLocal:
+    """Arquivos num diretório do disco"""
+
+    nome = 'local'
+
+    def __init__(self, raiz, cache=None):
+        self.raiz = raiz
+        self._raiz_absoluta = os.path.abspath(raiz)
+        self.cache = cache or CacheMetadados()
+
+    def caminho_local(self, chave):
+        """Caminho no disco da chave. Caminhos absolutos (anteriores às chaves)
+        só são aceitos dentro da raiz; fora dela, e com '..', gera ValueError"""
+        if os.path.isabs(chave):
+            # Sem resolver links simbólicos: nenhum acesso ao disco aqui
+            if not os.path.normpath(chave).startswith(self._raiz_absoluta + os.sep):
+                raise ValueError(f'Caminho fora do armazenamento: {chave}')
+            return chave
+        partes = chave.split('/')
+        if '..' in partes:
+            raise ValueError(f'Chave inválida: {chave}')
+        return os.path.join(self.raiz, *partes)
+
+    def _ler_metadados(self, chave):
+        try:
+            info = os.stat(self.caminho_local(chave))
+        except (OSError, ValueError):
+            return None
+        return Metadados(
+            info.st_size,
+            f'{info.st_size:x}-{info.st_mtime_ns:x}',
+            datetime.fromtimestamp(int(info.st_mtime), tz=timezone.utc),
+            _mimetype(chave)
+        )
+
+    def metadados(self, chave):
+        """Metadados da chave (None se o arquivo não existir)"""
+        return self.cache.obter(chave, lambda: self._ler_metadados(chave))
+
+    def existe(self, chave):
+        return self.metadados(chave) is not None
+
+    def abrir(self, chave):
+        """Stream binário para leitura (FileNotFoundError se não existir)"""
+        return open(self.caminho_local(chave), 'rb')
+
+    def gravar_stream(self, chave, stream, mimetype=None):
+        """Grava o stream na chave, em blocos, substituindo o arquivo atomicamente"""
+        destino = self.caminho_local(chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f'{destino}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(temporario, 'wb') as saida:
+                shutil.copyfileobj(stream, saida, TAMANHO_BLOCO)
+            os.replace(temporario, destino)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        self.cache.descartar(chave)
+        return self.metadados(chave)
+
+    def gravar_arquivo(self, caminho, chave):
+        """Move um arquivo local (já completo) para a chave. Se a chave já
+        existir, o arquivo é descartado e o existente reaproveitado."""
+        destino = self.caminho_local(chave)
+        if os.path.exists(destino):
+            os.remove(caminho)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(caminho, destino)
+        self.cache.descartar(chave)
+
+    def remover(self, chave):
+        try:
+            os.remove(self.caminho_local(chave))
+        except FileNotFoundError:
+            pass
+        self.cache.descartar(chave)
+
+    def url_assinada(self, chave, validade, disposicao=None, mimetype=None):
+        # Sem URLs diretas: o download sai pelo app ou por X-Sendfile/X-Accel-Redirect
+        return None
+
+class ArmazenamentoS3:
+    """Objetos num bucket S3 ou compatível.
+
+    Com `endpoint` (ex.: http://localhost:9000 de um MinIO), usa endereços no
+    formato de caminho (endpoint/bucket/chave). As credenciais vêm da cadeia
+    padrão do boto3 (AWS_ACCESS_KEY_ID e AWS_SECRET_ACCESS_KEY, perfil ou
+    papel da instância). Uploads grandes são enviados em partes, sem passar
+    inteiros pela memória.
+    """
+
+    nome = 's3'
+
+    def __init__(self, bucket, prefixo='', endpoint=None, regiao=None, cache=None, cliente=None):
+        if cliente is None:
+            if boto3 is None:
+                raise ErroArmazenamento('Instale o boto3 para usar ARMAZENAMENTO=s3')
+            if not bucket:
+                raise ErroArmazenamento('Configure ARMAZENAMENTO_S3_BUCKET')
+            cliente = boto3.client(
+                's3',
+                endpoint_url=endpoint,
+                region_name=regiao,
+                config=ConfigBotocore(
+                    signature_version='s3v4',
+                    s3={'addressing_style': 'path' if endpoint else 'auto'}
+                )
+            )
+        self.cliente = cliente
+        self.bucket = bucket
+        self.prefixo = prefixo.strip('/') + '/' if prefixo.strip('/') else ''
+        self.cache = cache or CacheMetadados()
+        self._transferencia = TransferConfig(multipart_chunksize=8 * 1024 ** 2, max_concurrency=4) \
+            if TransferConfig is not None else None
+
+    def _objeto(self, chave):
+        return self.prefixo + chave.lstrip('/')
+
+    def caminho_local(self, chave):
+        return None
+
+    def _ler_metadados(self, chave):
+        try:
+            objeto = self.cliente.head_object(Bucket=self.bucket, Key=self._objeto(chave))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return Metadados(
+            objeto['ContentLength'],
+            objeto['ETag'].strip('"'),
+            objeto['LastModified'],
+            objeto.get('ContentType') or _mimetype(chave)
+        )
+
+    def metadados(self, chave):
+        """Metadados da chave (None se o objeto não existir)"""
+        return self.cache.obter(chave, lambda: self._ler_metadados(chave))
+
+    def existe(self, chave):
+        return self.metadados(chave) is not None
+
+    def abrir(self, chave):
+        """Stream binário do corpo do objeto (FileNotFoundError se não existir)"""
+        try:
+            objeto = self.cliente.get_object(Bucket=self.bucket, Key=self._objeto(chave))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(chave)
+            raise
+        return objeto['Body']
+
+    def gravar_stream(self, chave, stream, mimetype=None):
+        self.cliente.upload_fileobj(
+            stream, self.bucket, self._objeto(chave),
+            ExtraArgs={'ContentType': mimetype or _mimetype(chave)},
+            Config=self._transferencia
+        )
+        self.cache.descartar(chave)
+        return self.metadados(chave)
+
+    def gravar_arquivo(self, caminho, chave):
+        """Envia um arquivo local (já completo) para a chave e o remove do disco.
+        Se a chave já existir, o envio é dispensado."""
+        try:
+            if not self.existe(chave):
+                self.cliente.upload_file(
+                    caminho, self.bucket, self._objeto(chave),
+                    ExtraArgs={'ContentType': _mimetype(chave)},
+                    Config=self._transferencia
+                )
+                self.cache.descartar(chave)
+        finally:
+            os.remove(caminho)
+
+    def remover(self, chave):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._objeto(chave))
+        self.cache.descartar(chave)
+
+    def url_assinada(self, chave, validade, disposicao=None, mimetype=None):
+        """URL de GET assinada, válida por `validade` segundos. O bucket envia
+        o Content-Disposition e o Content-Type informados."""
+        parametros = {'Bucket': self.bucket, 'Key': self._objeto(chave)}
+        if disposicao:
+            parametros['ResponseContentDisposition'] = disposicao
+        if mimetype:
+            parametros['ResponseContentType'] = mimetype
+        return self.cliente.generate_presigned_url('get_object', Params=parametros, ExpiresIn=int(validade))
+
+def criar_armazenamento(config):
+    """Backend configurado em ARMAZENAMENTO ('local' ou 's3')"""
+    cache = CacheMetadados(
+        config.get('ARMAZENAMENTO_CACHE_TTL', 300),
+        config.get('ARMAZENAMENTO_CACHE_MAX_ENTRADAS', 10000)
+    )
+    tipo = config.get('ARMAZENAMENTO', 'local')
+    if tipo == 'local':
+        return ArmazenamentoLocal(config['UPLOAD_DIR'], cache)
+    if tipo == 's3':
+        return ArmazenamentoS3(
+            config.get('ARMAZENAMENTO_S3_BUCKET'),
+            config.get('ARMAZENAMENTO_S3_PREFIXO', ''),
+            config.get('ARMAZENAMENTO_S3_ENDPOINT'),
+            config.get('ARMAZENAMENTO_S3_REGIAO'),
+            cache
+        )
+    raise ErroArmazenamento(f'Armazenamento desconhecido: {tipo} (use local ou s3)')
+
+_armazenamento = None
+_armazenamento_lock = threading.Lock()
+
+def obter_armazenamento():
+    """Retorna o backend de armazenamento do processo"""
+    global _armazenamento
+    with _armazenamento_lock:
+        if _armazenamento is None:
+            _armazenamento = criar_armazenamento(current_app.config)
+        return _armazenamento
@@ -0,0 +1,300 @@
+"""Auditoria dos planos de consulta de todas as rotas da API.
+
+Cria um banco SQLite temporário com dados de exemplo, chama cada rota pelo
+cliente de testes do Flask, captura as consultas executadas e roda
+EXPLAIN QUERY PLAN em cada SELECT. Uma consulta é reprovada quando varre
+inteira uma das tabelas principais (vendas, produtos, clientes). Varreduras
+que apenas percorrem a tabela já na ordem pedida e param no LIMIT (primeira
+página de uma listagem) são aceitas, desde que não descartem linhas demais
+pelo caminho: a consulta é executada de novo contando as instruções da VM
+do SQLite por linha retornada.
+
+Nas listagens paginadas por cursor, a auditoria percorre a listagem até o
+fim e pede também a página das últimas linhas. Cada consulta dessa página
+é comparada com a mesma consulta na segunda página: se o número de
+instruções cresce com a profundidade do cursor (o índice não é usado para
+chegar ao cursor), a consulta é reprovada.
+
+As rotas também passam pelo detector de N+1 (src.utils.diagnostico): uma
+requisição que repete o mesmo SQL além de DIAGNOSTICO_N_MAIS_1_LIMITE vezes
+é reprovada.
+
+Uso: flask --app main auditar-consultas
+"""
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask, request, url_for, has_request_context
+from sqlalchemy import event, insert
+from src.models.store import db, Produto, Cliente, Venda, Administrador, ConfiguracaoLoja
+from src.models.migracoes import aplicar_migracoes
+from src.models.motor_sqlite import opcoes_motor, configurar_sqlite
+from src.utils.resumos_vendas import reconstruir_resumos
+from src.utils.cache_catalogo import invalidar_catalogo
+from src.utils.cache_configuracao import invalidar_configuracao
+from src.utils.diagnostico import instalar_diagnostico, ErroNMais1
+
+TABELAS_AUDITADAS = ('vendas', 'produtos', 'clientes')
+VARREDURA = re.compile(r'^SCAN (%s)\b' % '|'.join(TABELAS_AUDITADAS))
+ORDENACAO_TEMPORARIA = 'USE TEMP B-TREE'
+# Instruções da VM por linha retornada aceitas numa varredura ordenada com LIMIT
+INSTRUCOES_POR_LINHA = 200
+# Instruções da última página aceitas em relação à segunda (mesma consulta)
+CRESCIMENTO_PROFUNDIDADE = 2
+SENHA_EXEMPLO = 'senha-auditoria'
+
+# Parâmetros de query string para rotas que exigem algum
+PARAMETROS_GET = {
+    'produtos.buscar': {'q': 'python'},
+    'admin.exportar_vendas': {'inicio': '2000-01-01', 'fim': '2000-01-31', 'status': 'concluida'},
+    'admin.exportar_clientes': {'inicio': '2000-01-01', 'fim': '2000-01-31'},
+}
+
+# Rotas de escrita exercitadas com um corpo de exemplo: (método, url, json)
+CENARIOS_ESCRITA = [
+    ('POST', '/api/clientes/login', {'email': 'cliente1@exemplo.com', 'senha': SENHA_EXEMPLO}),
+    ('POST', '/api/vendas/comprar', {'produto_id': 1}),
+    ('POST', '/api/vendas/pedido', {'produto_ids': [1, 2, 3]}),
+    ('POST', '/api/vendas/1/reenviar-email', None),
+    ('PUT', '/api/admin/vendas/1/status', {'status': 'cancelada'}),
+    ('POST', '/api/admin/vendas/enviar-pendentes', {}),
+    ('PUT', '/api/produtos/1', {'descricao': 'Descrição atualizada'}),
+    ('PUT', '/api/clientes/perfil', {'nome': 'Cliente Um'}),
+    ('PUT', '/api/admin/clientes/2', {'ativo': False}),
+]
+
+def _inserir_em_lotes(modelo, total, lote, linha):
+    for inicio in range(1, total + 1, lote):
+        db.session.execute(insert(modelo), [linha(i) for i in range(inicio, min(inicio + lote, total + 1))])
+
+def popular_banco(produtos=2000, clientes=2000, vendas=20000, lote=5000, pdfs=None, porta_smtp=9):
+    """Insere dados de exemplo em lotes.
+
+    `pdfs` são caminhos de arquivos reais distribuídos entre os produtos (por
+    padrão, caminhos inexistentes). Com porta_smtp=9 o SMTP é inacessível: o
+    envio em lote percorre as vendas mas não envia nada.
+    """
+    from werkzeug.security import generate_password_hash
+    senha_hash = generate_password_hash(SENHA_EXEMPLO)
+    agora = datetime.utcnow()
+
+    _inserir_em_lotes(Produto, produtos, lote, lambda i: {
+        'nome': f'Produto {i} python' if i % 10 == 0 else f'Produto {i}',
+        'descricao': f'Descrição do produto {i}',
+        'preco': 10.0 + i % 50,
+        'caminho_pdf': pdfs[i % len(pdfs)] if pdfs else f'/tmp/produto-{i}.pdf',
+        'ativo': i % 20 != 0,
+        'data_criacao': agora - timedelta(minutes=i)
+    })
+    _inserir_em_lotes(Cliente, clientes, lote, lambda i: {
+        'nome': f'Cliente {i}',
+        'email': f'cliente{i}@exemplo.com',
+        'senha_hash': senha_hash,
+        'ativo': i % 50 != 0,
+        'data_cadastro': agora - timedelta(minutes=i)
+    })
+    _inserir_em_lotes(Venda, vendas, lote, lambda i: {
+        'id_cliente': 1 + (i * 7) % clientes,
+        'id_produto': 1 + (i * 13) % produtos,
+        'data_venda': agora - timedelta(minutes=i),
+        'preco_total': 10.0 + i % 50,
+        'status': ('concluida', 'pendente', 'cancelada')[i % 3],
+        'email_enviado': i % 4 != 0
+    })
+    administrador = Administrador(usuario='admin', senha_hash=senha_hash)
+    db.session.add(administrador)
+    db.session.add(ConfiguracaoLoja(email_smtp_host='127.0.0.1', email_smtp_port=porta_smtp))
+    db.session.commit()
+    reconstruir_resumos()
+
+def criar_app_auditoria(config_base, caminho_banco):
+    """App isolado, com os mesmos blueprints, apontando para o banco temporário"""
+    from src.routes.produtos import produtos_bp
+    from src.routes.clientes import clientes_bp
+    from src.routes.vendas import vendas_bp
+    from src.routes.admin import admin_bp
+
+    app = Flask(__name__)
+    app.config.update(config_base)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{caminho_banco}'
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_motor(app.config)
+    for blueprint in (produtos_bp, clientes_bp, vendas_bp, admin_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    db.init_app(app)
+    configurar_sqlite(app, db)
+    instalar_diagnostico(app, db)
+    return app
+
+def contar_instrucoes(conexao, sql, parametros, passo=100):
+    """Executa a consulta contando (aproximadamente) as instruções da VM"""
+    bruta = conexao.connection.dbapi_connection
+    contador = {'total': 0, 'linhas': 0}
+
+    def progresso():
+        contador['total'] += passo
+        return 0
+
+    bruta.set_progress_handler(progresso, passo)
+    try:
+        contador['linhas'] = len(bruta.execute(sql, parametros).fetchall())
+    finally:
+        bruta.set_progress_handler(None, passo)
+    return contador
+
+def analisar_plano(conexao, sql, parametros):
+    """Retorna as linhas do plano que reprovam a consulta"""
+    plano = [
+        linha[-1]
+        for linha in conexao.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parametros).fetchall()
+    ]
+    varreduras = [detalhe for detalhe in plano if VARREDURA.match(detalhe)]
+    if not varreduras:
+        return [], plano
+
+    # Percorrer a tabela na ordem do ORDER BY até o LIMIT é aceitável
+    paginada = re.search(r'\bORDER BY\b.*\bLIMIT\b', sql, re.IGNORECASE | re.DOTALL) is not None
+    ordenada = not any(ORDENACAO_TEMPORARIA in detalhe for detalhe in plano)
+    if paginada and ordenada:
+        instrucoes = contar_instrucoes(conexao, sql, parametros)
+        if instrucoes['total'] <= INSTRUCOES_POR_LINHA * (instrucoes['linhas'] + 1):
+            return [], plano
+        plano.append(f"{instrucoes['total']} instruções para {instrucoes['linhas']} linha(s)")
+    return varreduras, plano
+
+def urls_get(app):
+    """Gera (endpoint, url) de todas as rotas GET, preenchendo os parâmetros"""
+    for regra in app.url_map.iter_rules():
+        if 'GET' not in regra.methods or regra.endpoint == 'static':
+            continue
+        valores = {
+            argumento: 1 if conversor == 'int' else 'x'
+            for conversor, argumento in re.findall(r'<(?:(\w+):)?(\w+)>', regra.rule)
+        }
+        with app.test_request_context():
+            url = url_for(regra.endpoint, **valores, **PARAMETROS_GET.get(regra.endpoint, {}))
+        yield regra.endpoint, url
+
+def comparar_profundidade(conexao, rasas, profundas):
+    """Retorna, para cada consulta da página profunda que também roda na
+    página rasa, (sql, parametros, plano) das que custam mais conforme a
+    profundidade do cursor"""
+    parametros_rasos = {sql: parametros for sql, parametros in rasas}
+    reprovadas = []
+    for sql, parametros in profundas:
+        if sql not in parametros_rasos:
+            continue
+        rasa = contar_instrucoes(conexao, sql, parametros_rasos[sql])
+        profunda = contar_instrucoes(conexao, sql, parametros)
+        por_linha_rasa = rasa['total'] / (rasa['linhas'] + 1)
+        por_linha_profunda = profunda['total'] / (profunda['linhas'] + 1)
+        if por_linha_profunda > CRESCIMENTO_PROFUNDIDADE * por_linha_rasa + INSTRUCOES_POR_LINHA:
+            reprovadas.append((sql, parametros, [
+                f"{rasa['total']} instruções para {rasa['linhas']} linha(s) na segunda página",
+                f"{profunda['total']} instruções para {profunda['linhas']} linha(s) na última página"
+            ]))
+    return reprovadas
+
+def auditar(config_base, produtos=2000, clientes=2000, vendas=20000):
+    """Executa a auditoria e retorna a lista de consultas reprovadas"""
+    diretorio = tempfile.mkdtemp(prefix='auditoria-')
+    caminho_banco = os.path.join(diretorio, 'auditoria.db')
+    app = criar_app_auditoria(config_base, caminho_banco)
+
+    capturadas = []
+    paginadas = []  # (url, consultas da segunda página, consultas da última)
+    reprovadas = []
+
+    with app.app_context():
+        aplicar_migracoes(db)
+        popular_banco(produtos, clientes, vendas)
+        invalidar_catalogo()
+        invalidar_configuracao()
+
+        def capturar(conexao, cursor, sql, parametros, contexto, executemany):
+            if not executemany and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                capturadas.append((request.path if has_request_context() else None, sql, parametros))
+
+        event.listen(db.engine, 'before_cursor_execute', capturar)
+        try:
+            cliente = app.test_client()
+            with cliente.session_transaction() as sessao:
+                sessao['cliente_id'] = 1
+                sessao['admin_id'] = 1
+
+            def requisitar(metodo, url, corpo=None):
+                try:
+                    resposta = cliente.open(url, method=metodo, json=corpo)
+                    resposta.get_data()  # respostas em streaming só consultam o banco ao serem lidas
+                    return resposta
+                except ErroNMais1 as e:
+                    reprovadas.append({'rota': f'{metodo} {url}', 'sql': str(e), 'plano': ['N+1']})
+                    return None
+
+            def consultas_get(url):
+                """(corpo JSON, [(sql, parametros)]) de uma requisição GET"""
+                inicio = len(capturadas)
+                resposta = requisitar('GET', url)
+                corpo = resposta.get_json(silent=True) if resposta is not None else None
+                return corpo, [(sql, parametros) for _, sql, parametros in capturadas[inicio:]]
+
+            def ultimo_cursor(url):
+                """Cursor das últimas linhas da listagem, percorrendo-a com o limite máximo"""
+                separador = '&' if '?' in url else '?'
+                limite = app.config.get('PAGINACAO_LIMITE_MAXIMO', 200)
+                cursor = ultimo = None
+                while True:
+                    pagina = f'{url}{separador}limit={limite}' + (f'&cursor={cursor}' if cursor else '')
+                    corpo, _ = consultas_get(pagina)
+                    cursor = corpo.get('next') if isinstance(corpo, dict) else None
+                    if not cursor:
+                        return ultimo
+                    ultimo = cursor
+
+            for endpoint, url in urls_get(app):
+                corpo, _ = consultas_get(url)
+                # Exercita também a página seguinte e a das últimas linhas das listagens paginadas
+                if isinstance(corpo, dict) and corpo.get('next'):
+                    separador = '&' if '?' in url else '?'
+                    _, rasas = consultas_get(f"{url}{separador}cursor={corpo['next']}")
+                    cursor = ultimo_cursor(url)
+                    if cursor and cursor != corpo['next']:
+                        _, profundas = consultas_get(f'{url}{separador}cursor={cursor}')
+                        paginadas.append((url, rasas, profundas))
+
+            for metodo, url, corpo in CENARIOS_ESCRITA:
+                requisitar(metodo, url, corpo)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capturar)
+
+        vistas = set()
+        with db.engine.connect() as conexao:
+            for rota, sql, parametros in capturadas:
+                if (rota, sql) in vistas:
+                    continue
+                vistas.add((rota, sql))
+                varreduras, plano = analisar_plano(conexao, sql, parametros)
+                if varreduras:
+                    reprovadas.append({'rota': rota, 'sql': sql, 'plano': plano})
+            for url, rasas, profundas in paginadas:
+                for sql, parametros in profundas:
+                    varreduras, plano = analisar_plano(conexao, sql, parametros)
+                    if varreduras:
+                        reprovadas.append({'rota': f'{url} (última página)', 'sql': sql, 'plano': plano})
+                for sql, parametros, detalhes in comparar_profundidade(conexao, rasas, profundas):
+                    reprovadas.append({'rota': f'{url} (última página)', 'sql': sql, 'plano': detalhes})
+                vistas.update((f'{url} (última página)', sql) for sql, _ in profundas)
+
+    return reprovadas, len(vistas)
+
+def executar(config_base):
+    """Ponto de entrada do comando: imprime o relatório e retorna o código de saída"""
+    reprovadas, total = auditar(config_base)
+    for item in reprovadas:
+        print(f"REPROVADA {item['rota']}")
+        print(f"  {' '.join(item['sql'].split())}")
+        for detalhe in item['plano']:
+            print(f'    {detalhe}')
+    print(f'{total} consulta(s) auditada(s), {len(reprovadas)} reprovada(s)')
+    return 1 if reprovadas else 0
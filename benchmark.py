@@ -0,0 +1,552 @@
+"""Benchmark de carga das rotas da API.
+
+Cria (ou reaproveita) um banco SQLite com dados gerados em lotes na escala
+pedida, sobe um servidor SMTP local que descarta as mensagens e exercita
+cada rota dos quatro blueprints com concorrência fixa, pelo cliente de
+testes do Flask ou por um servidor HTTP local. As rotas recebem chaves e
+links válidos do banco gerado, e os emails agendados são enviados pelo
+worker de entrega ao SMTP local. Para cada rota mede p50/p95/p99, vazão e
+comandos SQL por requisição (contados até o fim do corpo, incluindo os das
+respostas em streaming, que o Server-Timing não cobre) e grava
+o resultado em JSON, que pode ser comparado com o de uma execução anterior
+(--base). Status diferentes dos esperados e emails que ficaram na fila
+fazem o comando terminar com erro.
+
+Uso: flask --app main benchmark --escala 100k --saida atual.json --base anterior.json
+"""
+import http.client
+import io
+import json
+import os
+import platform
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from flask import url_for, request, has_request_context
+from sqlalchemy import event, func
+from werkzeug.serving import make_server
+from src.models.store import db, ConfiguracaoLoja, Produto, Cliente, Venda, EntregaEmail
+from src.models.migracoes import aplicar_migracoes
+from src.utils.auditoria_consultas import criar_app_auditoria, popular_banco, urls_get, CENARIOS_ESCRITA
+from src.utils.armazenamento import obter_armazenamento
+from src.utils.cache_catalogo import invalidar_catalogo
+from src.utils.cache_configuracao import invalidar_configuracao
+from src.utils.entrega_email import iniciar_entrega, parar_entrega
+from src.utils.estresse_sqlite import percentil
+from src.utils.links_download import gerar_parametros
+from src.utils.uploads import armazenar_stream, obter_uploads
+from src.utils import miniaturas
+
+# Escalas de dados: (produtos, clientes, vendas)
+ESCALAS = {
+    '1k': (200, 500, 1000),
+    '10k': (1000, 2000, 10000),
+    '100k': (5000, 20000, 100000),
+    '1m': (20000, 100000, 1000000)
+}
+
+# Variação aceita em relação à base antes de apontar regressão
+TOLERANCIA_LATENCIA = 0.20  # p95 até 20% mais lento
+TOLERANCIA_VAZAO = 0.20  # vazão até 20% menor
+
+# Tempo máximo de espera, ao final, para o worker enviar os emails agendados
+ESPERA_ENTREGAS = 60  # segundos
+
+# Status aceitos nos cenários de escrita da auditoria (os demais esperam 200)
+STATUS_ESCRITA = {
+    ('POST', '/api/vendas/comprar'): (201,),
+    ('POST', '/api/vendas/pedido'): (201,),
+    ('POST', '/api/vendas/1/reenviar-email'): (202,),
+    # Requisições simultâneas mudando a mesma venda: só uma vence, as outras recebem 409
+    ('PUT', '/api/admin/vendas/1/status'): (200, 409),
+}
+
+# Cabeçalho que identifica cada requisição do benchmark na contagem de SQL
+CABECALHO_REQUISICAO = 'X-Benchmark-Requisicao'
+
+# Corpo enviado como está (multipart, NDJSON), em vez de serializado como JSON
+CorpoBruto = namedtuple('CorpoBruto', ['dados', 'tipo'])
+
+Cenario = namedtuple('Cenario', ['metodo', 'url', 'corpo', 'esperados'])
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    """Diálogo SMTP mínimo: aceita qualquer login e mensagem e descarta o conteúdo"""
+
+    def _responder(self, linha):
+        self.wfile.write(linha.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self._responder('220 benchmark ESMTP')
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha[:4].upper()
+            if comando == b'DATA':
+                self._responder('354 fim com <CRLF>.<CRLF>')
+                for dados in self.rfile:
+                    if dados in (b'.\r\n', b'.\n'):
+                        break
+                self.server.mensagens += 1
+                self._responder('250 aceita')
+            elif comando == b'QUIT':
+                self._responder('221 tchau')
+                return
+            elif comando == b'EHLO':
+                self._responder('250-benchmark')
+                self._responder('250 AUTH PLAIN')
+            elif comando == b'AUTH':
+                self._responder('235 autenticado')
+            elif comando in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self._responder('250 ok')
+            else:
+                self._responder('502 não implementado')
+
+class ServidorSMTPDescarte(socketserver.ThreadingTCPServer):
+    """Servidor SMTP local que conta e descarta as mensagens recebidas"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SessaoSMTP)
+        self.mensagens = 0
+
+    @property
+    def porta(self):
+        return self.server_address[1]
+
+    def iniciar(self):
+        threading.Thread(target=self.serve_forever, name='smtp-descarte', daemon=True).start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
+
+def criar_pdfs(diretorio, quantidade=10, tamanho=256 * 1024):
+    """Arquivos PDF de exemplo para anexar nos emails"""
+    caminhos = []
+    for i in range(quantidade):
+        caminho = os.path.join(diretorio, f'produto-{i}.pdf')
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(b'%PDF-1.4\n' + bytes(range(256)) * (tamanho // 256) + b'\n%%EOF\n')
+        caminhos.append(caminho)
+    return caminhos
+
+def preparar_app(config_base, caminho_banco, escala, porta_smtp):
+    """App do benchmark apontando para o banco da escala (gerado se ainda não existir)"""
+    config = {
+        **config_base,
+        'SMTP_USAR_TLS': False,
+        # Os PDFs de exemplo ficam ao lado do banco, no armazenamento local
+        'ARMAZENAMENTO': 'local',
+        'UPLOAD_DIR': os.path.dirname(os.path.abspath(caminho_banco)),
+        # Mede o custo das rotas, não os limites de tentativas de login
+        'SENHAS_LIMITE_IP': (10 ** 9, 60),
+        'SENHAS_LIMITE_CONTA': (10 ** 9, 60),
+        'DIAGNOSTICO_N_MAIS_1_FALHAR': False,
+        'DIAGNOSTICO_SQL_LENTO_MS': float('inf')
+    }
+    existia = os.path.exists(caminho_banco)
+    app = criar_app_auditoria(config, caminho_banco)
+    with app.app_context():
+        if not existia:
+            aplicar_migracoes(db)
+            produtos, clientes, vendas = ESCALAS[escala]
+            pdfs = criar_pdfs(os.path.dirname(caminho_banco))
+            popular_banco(produtos, clientes, vendas, lote=10000, pdfs=pdfs)
+        # Emails vão para o SMTP local desta execução
+        configuracao = ConfiguracaoLoja.query.first()
+        configuracao.email_smtp_port = porta_smtp
+        configuracao.email_usuario = 'loja@exemplo.com'
+        configuracao.versao = (configuracao.versao or 0) + 1
+        db.session.commit()
+        invalidar_catalogo()
+        invalidar_configuracao()
+    return app
+
+def _formulario_arquivo(campo, nome_arquivo, conteudo, tipo):
+    """Corpo multipart/form-data com um único arquivo"""
+    fronteira = uuid.uuid4().hex
+    cabecalho = (
+        f'--{fronteira}\r\n'
+        f'Content-Disposition: form-data; name="{campo}"; filename="{nome_arquivo}"\r\n'
+        f'Content-Type: {tipo}\r\n\r\n'
+    )
+    dados = cabecalho.encode('ascii') + conteudo + f'\r\n--{fronteira}--\r\n'.encode('ascii')
+    return CorpoBruto(dados, f'multipart/form-data; boundary={fronteira}')
+
+def _importacao_ndjson(linhas=100):
+    """Arquivo NDJSON de produtos para a rota de importação"""
+    dados = ''.join(
+        json.dumps({'nome': f'Produto importado {i}', 'preco': 10 + i % 50, 'descricao': 'Benchmark'}) + '\n'
+        for i in range(linhas)
+    )
+    return CorpoBruto(dados.encode('utf-8'), 'application/x-ndjson')
+
+def _capa_com_miniaturas(app, produto_id):
+    """Grava uma capa para o produto e gera as miniaturas (None sem o Pillow)"""
+    if not miniaturas.disponivel():
+        return None
+    from PIL import Image
+    imagem = io.BytesIO()
+    Image.new('RGB', (800, 1200), (40, 90, 160)).save(imagem, 'PNG')
+    imagem.seek(0)
+    chave, _, _ = armazenar_stream(
+        obter_armazenamento(), os.path.join(app.config['UPLOAD_DIR'], '.parciais'), imagem, 'png'
+    )
+    Produto.query.filter_by(id=produto_id).update({'imagem_capa': chave})
+    db.session.commit()
+    miniaturas.processar_capa(chave, app.config)
+    return chave
+
+def cenarios(app):
+    """Cenários de todas as rotas, com dados reais do banco da escala.
+
+    As rotas GET usam chaves que existem: link de download com assinatura
+    válida, capa com miniaturas, upload em andamento e períodos de exportação
+    que cobrem os dados gerados. Às escritas da auditoria somam-se as de
+    produtos (criação, importação, upload e desativação). Cada cenário traz
+    os status esperados; os demais são apontados no relatório.
+    """
+    with app.app_context():
+        produto_id = 1
+        ultimo_produto = db.session.query(func.max(Produto.id)).scalar()
+        venda_id, venda_produto = (
+            db.session.query(Venda.id, Venda.id_produto)
+            .filter(Venda.id_cliente == 1, Venda.id_pedido.is_(None))
+            .order_by(Venda.id)
+            .first()
+        )
+        caminho_pdf = db.session.get(Produto, produto_id).caminho_pdf
+        vendas_inicio, vendas_fim = db.session.query(func.min(Venda.data_venda), func.max(Venda.data_venda)).one()
+        clientes_inicio, clientes_fim = db.session.query(
+            func.min(Cliente.data_cadastro), func.max(Cliente.data_cadastro)
+        ).one()
+        capa = _capa_com_miniaturas(app, produto_id)
+        id_upload = obter_uploads().iniciar('benchmark.pdf', 1024)['id_upload']
+
+        with app.test_request_context():
+            urls = {
+                'produtos.download_assinado': url_for(
+                    'produtos.download_assinado', produto_id=venda_produto,
+                    **gerar_parametros(venda_produto, venda_id, 24)
+                ),
+                'produtos.capa_produto': url_for(
+                    'produtos.capa_produto', produto_id=produto_id, largura=320
+                ) if capa else None,
+                'produtos.estado_upload': url_for('produtos.estado_upload', id_upload=id_upload),
+                'admin.exportar_vendas': url_for(
+                    'admin.exportar_vendas', inicio=vendas_inicio.date().isoformat(),
+                    fim=vendas_fim.date().isoformat(), status='concluida'
+                ),
+                'admin.exportar_clientes': url_for(
+                    'admin.exportar_clientes', inicio=clientes_inicio.date().isoformat(),
+                    fim=clientes_fim.date().isoformat()
+                ),
+            }
+        with obter_armazenamento().abrir(caminho_pdf) as arquivo:
+            pdf = arquivo.read()
+
+    lista = []
+    for endpoint, url in urls_get(app):
+        url = urls.get(endpoint, url)
+        if url is not None:
+            lista.append(Cenario('GET', url, None, (200,)))
+    for metodo, url, corpo in CENARIOS_ESCRITA:
+        esperados = STATUS_ESCRITA.get((metodo, url), (200,))
+        if url == '/api/vendas/1/reenviar-email':
+            url = f'/api/vendas/{venda_id}/reenviar-email'  # venda do cliente da sessão
+        lista.append(Cenario(metodo, url, corpo, esperados))
+    return lista + [
+        Cenario('POST', '/api/produtos', {'nome': 'Produto benchmark', 'preco': 19.9, 'caminho_pdf': caminho_pdf}, (201,)),
+        Cenario('POST', '/api/produtos/importar?formato=ndjson', _importacao_ndjson(), (200,)),
+        Cenario('POST', '/api/produtos/upload', _formulario_arquivo('arquivo', 'produto.pdf', pdf, 'application/pdf'), (200,)),
+        Cenario('POST', '/api/produtos/uploads', {'nome_arquivo': 'produto.pdf', 'tamanho': len(pdf)}, (201,)),
+        Cenario('DELETE', f'/api/produtos/{ultimo_produto}', None, (200,)),
+    ]
+
+def aguardar_entregas(app, timeout=ESPERA_ENTREGAS):
+    """Espera o worker enviar os emails agendados; retorna quantos ficaram na fila"""
+    limite = time.monotonic() + timeout
+    while True:
+        with app.app_context():
+            pendentes = EntregaEmail.query.filter(EntregaEmail.status.in_(('pendente', 'enviando'))).count()
+        if not pendentes or time.monotonic() >= limite:
+            return pendentes
+        time.sleep(0.2)
+
+class _ContadorSQL:
+    """Comandos SQL e tempo gasto neles por requisição, identificada pelo
+    cabeçalho CABECALHO_REQUISICAO.
+
+    O Server-Timing do diagnóstico é gerado antes do corpo da resposta, então
+    não inclui as consultas das exportações, feitas durante o streaming; aqui
+    a contagem segue até o cliente terminar de ler o corpo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.por_requisicao = {}  # chave -> [consultas, segundos]
+
+    def instalar(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._antes)
+        event.listen(engine, 'after_cursor_execute', self._depois)
+        event.listen(engine, 'handle_error', self._erro)
+
+    def remover(self, engine):
+        event.remove(engine, 'before_cursor_execute', self._antes)
+        event.remove(engine, 'after_cursor_execute', self._depois)
+        event.remove(engine, 'handle_error', self._erro)
+
+    def _antes(self, conexao, cursor, sql, parametros, contexto, executemany):
+        conexao.info.setdefault('benchmark_inicio', []).append(time.perf_counter())
+
+    def _depois(self, conexao, cursor, sql, parametros, contexto, executemany):
+        pilha = conexao.info.get('benchmark_inicio')
+        if not pilha:
+            return
+        duracao = time.perf_counter() - pilha.pop()
+        chave = request.headers.get(CABECALHO_REQUISICAO) if has_request_context() else None
+        if chave is None:
+            return  # worker de entrega, preparação dos dados
+        with self.lock:
+            totais = self.por_requisicao.setdefault(chave, [0, 0.0])
+            totais[0] += 1
+            totais[1] += duracao
+
+    def _erro(self, contexto):
+        if contexto.connection is not None:
+            pilha = contexto.connection.info.get('benchmark_inicio')
+            if pilha:
+                pilha.pop()
+
+    def retirar(self, chave):
+        """(consultas, segundos) da requisição, removendo-a do contador"""
+        with self.lock:
+            return tuple(self.por_requisicao.pop(chave, (0, 0.0)))
+
+class _ClienteTeste:
+    """Executa requisições pelo cliente de testes do Flask, com sessão de cliente e admin"""
+
+    def __init__(self, app, contador=None):
+        self.contador = contador
+        self.cliente = app.test_client()
+        with self.cliente.session_transaction() as sessao:
+            sessao['cliente_id'] = 1
+            sessao['admin_id'] = 1
+
+    def requisitar(self, metodo, url, corpo):
+        """(status, consultas, segundos de SQL) da requisição"""
+        chave = uuid.uuid4().hex
+        cabecalhos = {CABECALHO_REQUISICAO: chave}
+        if isinstance(corpo, CorpoBruto):
+            resposta = self.cliente.open(url, method=metodo, data=corpo.dados, content_type=corpo.tipo, headers=cabecalhos)
+        else:
+            resposta = self.cliente.open(url, method=metodo, json=corpo, headers=cabecalhos)
+        try:
+            resposta.get_data()  # respostas em streaming só fazem o trabalho ao serem lidas
+        finally:
+            # Encerra o contexto do stream, devolvendo a conexão ao pool
+            resposta.close()
+        return (resposta.status_code,) + self.contador.retirar(chave)
+
+class _ClienteHTTP:
+    """Executa requisições HTTP reais no servidor local, com o cookie de sessão"""
+
+    def __init__(self, app, porta, contador):
+        self.porta = porta
+        self.contador = contador
+        cliente = _ClienteTeste(app).cliente
+        self.cookie = f"session={cliente.get_cookie('session').value}"
+
+    def requisitar(self, metodo, url, corpo):
+        """(status, consultas, segundos de SQL) da requisição"""
+        chave = uuid.uuid4().hex
+        conexao = http.client.HTTPConnection('127.0.0.1', self.porta, timeout=60)
+        try:
+            cabecalhos = {'Cookie': self.cookie, CABECALHO_REQUISICAO: chave}
+            dados = None
+            if isinstance(corpo, CorpoBruto):
+                dados = corpo.dados
+                cabecalhos['Content-Type'] = corpo.tipo
+            elif corpo is not None:
+                dados = json.dumps(corpo)
+                cabecalhos['Content-Type'] = 'application/json'
+            conexao.request(metodo, url, body=dados, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+        finally:
+            conexao.close()
+        return (resposta.status,) + self.contador.retirar(chave)
+
+def medir(criar_cliente, metodo, url, corpo, requisicoes, concorrencia, esperados=(200,)):
+    """Executa `requisicoes` chamadas à rota com `concorrencia` threads"""
+    restantes = [requisicoes]
+    lock = threading.Lock()
+    amostras = []  # (latência, status, consultas, tempo de SQL)
+
+    def trabalhar():
+        cliente = criar_cliente()
+        proprias = []
+        while True:
+            with lock:
+                if restantes[0] <= 0:
+                    break
+                restantes[0] -= 1
+            inicio = time.perf_counter()
+            status, consultas, tempo_sql = cliente.requisitar(metodo, url, corpo)
+            proprias.append((time.perf_counter() - inicio, status, consultas, tempo_sql))
+        with lock:
+            amostras.extend(proprias)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias = [a[0] for a in amostras]
+    consultas = [a[2] for a in amostras]
+    tempos_sql = [a[3] for a in amostras]
+    status = {}
+    for amostra in amostras:
+        status[str(amostra[1])] = status.get(str(amostra[1]), 0) + 1
+    return {
+        'requisicoes': len(amostras),
+        'erros': sum(1 for a in amostras if a[1] >= 500),
+        'status': status,
+        'status_esperados': list(esperados),
+        'inesperadas': sum(1 for a in amostras if a[1] not in esperados),
+        'vazao_rps': len(amostras) / duracao if duracao else 0.0,
+        'p50_ms': percentil(latencias, 0.50) * 1000,
+        'p95_ms': percentil(latencias, 0.95) * 1000,
+        'p99_ms': percentil(latencias, 0.99) * 1000,
+        'consultas_media': sum(consultas) / len(consultas) if consultas else None,
+        'consultas_max': max(consultas, default=None),
+        'sql_p50_ms': percentil(tempos_sql, 0.50) * 1000
+    }
+
+def executar_benchmark(config_base, escala='10k', concorrencia=8, requisicoes=200, modo='cliente', banco=None):
+    """Executa o benchmark e retorna o relatório (dict serializável em JSON)"""
+    if escala not in ESCALAS:
+        raise ValueError(f'Escala desconhecida: {escala} (opções: {", ".join(ESCALAS)})')
+    caminho_banco = banco or os.path.join(tempfile.mkdtemp(prefix='benchmark-'), 'benchmark.db')
+
+    smtp = ServidorSMTPDescarte().iniciar()
+    servidor = None
+    try:
+        inicio = time.perf_counter()
+        app = preparar_app(config_base, caminho_banco, escala, smtp.porta)
+        geracao = time.perf_counter() - inicio
+        lista = cenarios(app)
+        contador = _ContadorSQL()
+
+        # Os emails agendados pelas compras são enviados pelo worker, como em produção
+        parar_entrega()
+        iniciar_entrega(app)
+
+        with app.app_context():
+            contador.instalar(db.engine)
+
+        if modo == 'http':
+            servidor = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=servidor.serve_forever, name='benchmark-http', daemon=True).start()
+            criar_cliente = lambda: _ClienteHTTP(app, servidor.server_port, contador)
+        else:
+            criar_cliente = lambda: _ClienteTeste(app, contador)
+
+        rotas = {}
+        for cenario in lista:
+            rotas[f'{cenario.metodo} {cenario.url}'] = medir(
+                criar_cliente, cenario.metodo, cenario.url, cenario.corpo,
+                requisicoes, concorrencia, cenario.esperados
+            )
+        entregas_pendentes = aguardar_entregas(app)
+    finally:
+        parar_entrega()
+        if servidor is not None:
+            servidor.shutdown()
+        smtp.parar()
+
+    return {
+        'data': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'parametros': {
+            'escala': escala,
+            'dados': dict(zip(('produtos', 'clientes', 'vendas'), ESCALAS[escala])),
+            'concorrencia': concorrencia,
+            'requisicoes': requisicoes,
+            'modo': modo,
+            'sqlite_perfil': config_base.get('SQLITE_PERFIL')
+        },
+        'geracao_dados_s': geracao,
+        'emails_recebidos': smtp.mensagens,
+        'entregas_pendentes': entregas_pendentes,
+        'rotas': rotas
+    }
+
+def comparar(atual, base):
+    """Linhas de comparação por rota e a lista de regressões em relação à base"""
+    linhas = []
+    regressoes = []
+    for rota, medida in atual['rotas'].items():
+        anterior = base.get('rotas', {}).get(rota)
+        if anterior is None:
+            linhas.append(f'{rota}: nova')
+            continue
+        variacao_p95 = (medida['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] if anterior['p95_ms'] else 0.0
+        variacao_vazao = (medida['vazao_rps'] - anterior['vazao_rps']) / anterior['vazao_rps'] if anterior['vazao_rps'] else 0.0
+        linhas.append(
+            f"{rota}: p95 {anterior['p95_ms']:.1f} -> {medida['p95_ms']:.1f} ms ({variacao_p95:+.0%}), "
+            f"vazão {anterior['vazao_rps']:.0f} -> {medida['vazao_rps']:.0f} req/s ({variacao_vazao:+.0%}), "
+            f"consultas {anterior['consultas_max']} -> {medida['consultas_max']}"
+        )
+        if variacao_p95 > TOLERANCIA_LATENCIA or variacao_vazao < -TOLERANCIA_VAZAO:
+            regressoes.append(rota)
+        elif (medida['consultas_max'] or 0) > (anterior['consultas_max'] or 0):
+            regressoes.append(rota)
+    return linhas, regressoes
+
+def executar(config_base, escala='10k', concorrencia=8, requisicoes=200, modo='cliente', banco=None, saida=None, base=None):
+    """Ponto de entrada do comando: grava o relatório e retorna o código de saída
+    (1 se alguma rota respondeu com status inesperado, se emails ficaram sem
+    envio ou se houver regressão em relação à base)"""
+    relatorio = executar_benchmark(config_base, escala, concorrencia, requisicoes, modo, banco)
+
+    inesperadas = []
+    for rota, medida in relatorio['rotas'].items():
+        print(
+            f"{rota:60} p50={medida['p50_ms']:.1f}ms p95={medida['p95_ms']:.1f}ms "
+            f"p99={medida['p99_ms']:.1f}ms {medida['vazao_rps']:.0f} req/s "
+            f"consultas={medida['consultas_max']} erros={medida['erros']}"
+        )
+        if medida['inesperadas']:
+            inesperadas.append(f"STATUS INESPERADO {rota}: {medida['status']} (esperado {medida['status_esperados']})")
+    for linha in inesperadas:
+        print(linha)
+    if relatorio['entregas_pendentes']:
+        print(f"EMAILS NÃO ENVIADOS: {relatorio['entregas_pendentes']} entrega(s) ainda na fila")
+    if saida:
+        with open(saida, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    falhou = bool(inesperadas or relatorio['entregas_pendentes'])
+
+    if not base:
+        return 1 if falhou else 0
+    with open(base) as arquivo:
+        anterior = json.load(arquivo)
+    if anterior.get('parametros') != relatorio['parametros']:
+        print(f"AVISO: parâmetros diferentes da base: {anterior.get('parametros')}")
+    linhas, regressoes = comparar(relatorio, anterior)
+    print('\n'.join(linhas))
+    for rota in regressoes:
+        print(f'REGRESSÃO {rota}')
+    return 1 if regressoes or falhou else 0
@@ -0,0 +1,107 @@
+import html
+import re
+from sqlalchemy import text
+from src.models.store import db, Produto
+from src.utils.paginacao import ErroPaginacao, codificar_cursor, decodificar_valores
+
+# Peso do nome em relação à descrição no ranking bm25
+PESO_NOME = 10.0
+PESO_DESCRICAO = 1.0
+
+# Marcadores do snippet() (caracteres de uso privado, que não aparecem no
+# texto): o trecho é escapado para HTML e só então eles viram <mark>
+INICIO_DESTAQUE = '\ue000'
+FIM_DESTAQUE = '\ue001'
+
+def montar_consulta_fts(termos):
+    """Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada palavra vira um termo entre aspas com busca por prefixo, e todas
+    precisam aparecer (AND implícito). Operadores e aspas digitados pelo
+    usuário são descartados. Retorna None se não houver palavras.
+    """
+    palavras = re.findall(r'\w+', termos or '')
+    if not palavras:
+        return None
+    return ' '.join(f'"{palavra}"*' for palavra in palavras[:16])
+
+SQL_BUSCA = f"""
+    SELECT id, relevancia, trecho FROM (
+        SELECT produtos.id AS id,
+               bm25(produtos_fts, {PESO_NOME}, {PESO_DESCRICAO}) AS relevancia,
+               snippet(produtos_fts, -1, '{INICIO_DESTAQUE}', '{FIM_DESTAQUE}', '…', 16) AS trecho
+        FROM produtos_fts
+        JOIN produtos ON produtos.id = produtos_fts.rowid
+        WHERE produtos_fts MATCH :consulta AND produtos.ativo = :ativo
+    )
+    WHERE :sem_cursor OR relevancia > :relevancia OR (relevancia = :relevancia AND id > :ultimo_id)
+    ORDER BY relevancia, id
+    LIMIT :limite
+"""
+
+SQL_TOTAL = """
+    SELECT count(*) FROM produtos_fts
+    JOIN produtos ON produtos.id = produtos_fts.rowid
+    WHERE produtos_fts MATCH :consulta AND produtos.ativo = :ativo
+"""
+
+def destacar(trecho):
+    """Trecho do snippet() como HTML: texto escapado, termos entre <mark>"""
+    if trecho is None:
+        return None
+    return html.escape(trecho).replace(INICIO_DESTAQUE, '<mark>').replace(FIM_DESTAQUE, '</mark>')
+
+def _decodificar_cursor(cursor):
+    """O cursor da busca guarda (relevância, id) do último resultado"""
+    relevancia, ultimo_id = decodificar_valores(cursor, 2)
+    if not isinstance(relevancia, (int, float)) or not isinstance(ultimo_id, int):
+        raise ErroPaginacao('Cursor inválido')
+    return relevancia, ultimo_id
+
+def buscar_produtos(termos, limite=50, cursor=None, total=False, ativo=True):
+    """Busca produtos por nome e descrição, ordenados por relevância (bm25).
+
+    Retorna uma página no mesmo formato de paginar(), com o trecho encontrado
+    ('trecho', HTML com o texto escapado e os termos entre <mark>) e a
+    'relevancia' em cada item. Produtos inativos (ativo=False) são só para
+    o painel administrativo; a rota confere a sessão.
+    """
+    consulta = montar_consulta_fts(termos)
+    if consulta is None:
+        return {'itens': [], 'next': None, **({'total': 0} if total else {})}
+
+    parametros = {
+        'consulta': consulta,
+        'ativo': bool(ativo),
+        'sem_cursor': cursor is None,
+        'relevancia': 0.0,
+        'ultimo_id': 0,
+        'limite': limite + 1
+    }
+    if cursor:
+        parametros['relevancia'], parametros['ultimo_id'] = _decodificar_cursor(cursor)
+
+    resultado = {}
+    if total:
+        resultado['total'] = db.session.execute(text(SQL_TOTAL), parametros).scalar()
+
+    linhas = db.session.execute(text(SQL_BUSCA), parametros).all()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor([linhas[-1].relevancia, linhas[-1].id])
+
+    produtos = {p.id: p for p in Produto.query.filter(Produto.id.in_([l.id for l in linhas]))}
+    itens = []
+    for linha in linhas:
+        produto = produtos.get(linha.id)
+        if produto is None:
+            continue
+        item = produto.to_dict()
+        item['trecho'] = destacar(linha.trecho)
+        item['relevancia'] = linha.relevancia
+        itens.append(item)
+
+    resultado['itens'] = itens
+    resultado['next'] = proximo
+    return resultado
@@ -0,0 +1,267 @@
+import base64
+import hashlib
+import os
+import re
+import threading
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from email.mime.base import MIMEBase
+from flask import current_app
+from werkzeug.http import dump_options_header
+from src.utils.armazenamento import obter_armazenamento, nome_arquivo
+from src.utils.envio_arquivos import parametros_nome
+
+# 57 bytes de entrada geram exatamente uma linha base64 de 76 caracteres
+BYTES_POR_LINHA = 57
+LINHAS_POR_BLOCO = 1024
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+
+class CacheAnexos:
+    """Cache em disco dos anexos já codificados em base64, com despejo LRU.
+
+    Cada arquivo é identificado pela chave e pelo ETag e tamanho no
+    armazenamento (metadados em cache, sem stat), de modo que uma nova versão
+    do PDF gera uma nova entrada automaticamente. A codificação é feita em
+    blocos, lendo o arquivo como stream, sem carregá-lo inteiro na memória.
+
+    `obter` devolve a entrada já aberta: como o diretório pode ser
+    compartilhado por vários processos (workers do gunicorn), outro processo
+    pode despejar o arquivo a qualquer momento, e o arquivo aberto continua
+    legível depois de removido. No próprio processo, a entrada fica fixada
+    até `liberar`, para o despejo não descartar o que ainda será enviado.
+    """
+
+    def __init__(self, diretorio, tamanho_maximo, armazenamento):
+        self.diretorio = diretorio
+        self.armazenamento = armazenamento
+        self.tamanho_maximo = tamanho_maximo
+        self._entradas = OrderedDict()  # chave -> tamanho em bytes
+        self._total = 0
+        self._lock = threading.Lock()
+        self._codificando = {}
+        self._fixadas = Counter()  # chave -> mensagens que ainda vão ler a entrada
+        os.makedirs(diretorio, exist_ok=True)
+        self._carregar_existentes()
+
+    def _carregar_existentes(self):
+        """Reconstrói o índice LRU a partir dos arquivos já presentes no disco"""
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.b64'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((info.st_mtime, nome[:-4], info.st_size))
+        for _, chave, tamanho in sorted(arquivos):
+            self._entradas[chave] = tamanho
+            self._total += tamanho
+
+    def _chave(self, caminho, info):
+        identificador = f'{self.armazenamento.nome}:{caminho}:{info.etag}:{info.tamanho}'
+        return hashlib.sha256(identificador.encode('utf-8')).hexdigest()
+
+    def _caminho_entrada(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.b64')
+
+    def obter(self, caminho):
+        """Retorna o anexo codificado aberto para leitura binária, gerando-o
+        se necessário, e o fixa no cache até `liberar(arquivo)`.
+
+        Retorna None se o arquivo original não existir.
+        """
+        info = self.armazenamento.metadados(caminho)
+        if info is None:
+            return None
+
+        chave = self._chave(caminho, info)
+        destino = self._caminho_entrada(chave)
+
+        while True:
+            with self._lock:
+                if chave in self._entradas:
+                    try:
+                        arquivo = open(destino, 'rb')
+                    except FileNotFoundError:
+                        # Despejado por outro processo: codifica de novo
+                        self._total -= self._entradas.pop(chave)
+                    else:
+                        self._entradas.move_to_end(chave)
+                        self._fixadas[chave] += 1
+                        return arquivo
+                evento = self._codificando.get(chave)
+                if evento is None:
+                    evento = self._codificando[chave] = threading.Event()
+                    break
+            # Outra thread já está codificando este arquivo
+            evento.wait()
+
+        try:
+            arquivo = self._codificar(caminho, destino)
+            with self._lock:
+                self._total -= self._entradas.pop(chave, 0)
+                self._entradas[chave] = os.fstat(arquivo.fileno()).st_size
+                self._total += self._entradas[chave]
+                self._fixadas[chave] += 1
+                self._despejar()
+            return arquivo
+        finally:
+            with self._lock:
+                self._codificando.pop(chave, None)
+            evento.set()
+
+    def _codificar(self, origem, destino):
+        """Codifica o arquivo em base64 (linhas de 76 caracteres com CRLF) e
+        retorna o resultado aberto para leitura"""
+        temporario = f'{destino}.{uuid.uuid4().hex}.tmp'
+        try:
+            with self.armazenamento.abrir(origem) as entrada, open(temporario, 'wb') as saida:
+                while True:
+                    bloco = entrada.read(BYTES_POR_LINHA * LINHAS_POR_BLOCO)
+                    if not bloco:
+                        break
+                    linhas = [
+                        base64.b64encode(bloco[i:i + BYTES_POR_LINHA])
+                        for i in range(0, len(bloco), BYTES_POR_LINHA)
+                    ]
+                    saida.write(b'\r\n'.join(linhas) + b'\r\n')
+            # Aberto antes de publicar, para não depender do arquivo continuar lá
+            arquivo = open(temporario, 'rb')
+            try:
+                os.replace(temporario, destino)
+            except Exception:
+                arquivo.close()
+                raise
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return arquivo
+
+    def liberar(self, arquivo):
+        """Fecha um anexo devolvido por `obter` e desfaz a fixação"""
+        arquivo.close()
+        # O nome é '<chave>.b64' ou, se acabou de ser codificado, o temporário '<chave>.b64.<id>.tmp'
+        chave = os.path.basename(arquivo.name).partition('.')[0]
+        with self._lock:
+            self._fixadas[chave] -= 1
+            if self._fixadas[chave] <= 0:
+                del self._fixadas[chave]
+                self._despejar()
+
+    def _despejar(self):
+        """Remove as entradas menos usadas e não fixadas até o cache caber no limite"""
+        for chave in list(self._entradas):
+            if self._total <= self.tamanho_maximo:
+                break
+            if chave in self._fixadas:
+                continue
+            self._total -= self._entradas.pop(chave)
+            try:
+                os.remove(self._caminho_entrada(chave))
+            except OSError:
+                pass
+
+class MensagemPDF:
+    """Mensagem com os PDFs anexados, gerada em blocos a partir do cache.
+
+    O cabeçalho e o corpo em texto são montados pelo pacote email; cada anexo
+    é lido do arquivo já codificado, sem passar inteiro pela memória.
+    `anexos` é uma lista de (anexo codificado aberto, nome do anexo),
+    fixados no `cache` até `fechar` (ou até a mensagem ser descartada).
+    """
+
+    def __init__(self, mensagem, anexos, cache):
+        self.mensagem = mensagem
+        self.anexos = anexos
+        self._liberar = weakref.finalize(self, _liberar_anexos, cache, [codificado for codificado, _ in anexos])
+
+    def fechar(self):
+        """Libera os anexos no cache (a mensagem não pode mais ser enviada)"""
+        self._liberar()
+
+    def gerar_bytes(self):
+        """Gera a mensagem pronta para o comando DATA (CRLF e dot-stuffing)"""
+        fronteira = self.mensagem.get_boundary()
+        fechamento = f'--{fronteira}--\r\n'.encode('ascii')
+
+        # Mesma serialização usada por smtplib.send_message
+        inicio = self.mensagem.as_bytes(policy=self.mensagem.policy.clone(linesep='\r\n'))
+        if inicio.endswith(fechamento):
+            inicio = inicio[:-len(fechamento)]
+        yield re.sub(rb'(?m)^\.', b'..', inicio)
+
+        for codificado, nome_anexo in self.anexos:
+            parte = MIMEBase('application', 'pdf')
+            parte['Content-Transfer-Encoding'] = 'base64'
+            # Nome ASCII e, se preciso, o original em filename* (como nos downloads)
+            parte['Content-Disposition'] = dump_options_header('attachment', parametros_nome(nome_anexo))
+            cabecalho_parte = b''.join(
+                f'{nome}: {valor}\r\n'.encode('utf-8') for nome, valor in parte.items()
+            )
+            yield f'--{fronteira}\r\n'.encode('ascii') + cabecalho_parte + b'\r\n'
+
+            # Linhas base64 nunca começam com '.', então não precisam de dot-stuffing.
+            # Do início, pois a mensagem pode ser gerada de novo numa nova tentativa
+            codificado.seek(0)
+            while True:
+                bloco = codificado.read(TAMANHO_BLOCO_LEITURA)
+                if not bloco:
+                    break
+                yield bloco
+
+        yield fechamento
+
+def _liberar_anexos(cache, codificados):
+    for codificado in codificados:
+        cache.liberar(codificado)
+
+def fechar_mensagem(mensagem):
+    """Libera os anexos de uma mensagem montada por montar_mensagem_pdfs
+    (mensagens sem anexos do cache são ignoradas)"""
+    if isinstance(mensagem, MensagemPDF):
+        mensagem.fechar()
+
+def montar_mensagem_pdfs(mensagem, caminhos_pdf, nomes=None):
+    """Associa os PDFs (via cache) a uma mensagem multipart já montada.
+
+    `nomes` são os nomes dos anexos, na ordem dos caminhos (padrão: o nome
+    de cada chave). Retorna None se algum dos arquivos não existir.
+    """
+    cache = obter_cache_anexos()
+    anexos = []
+    try:
+        for caminho_pdf, nome in zip(caminhos_pdf, nomes or [None] * len(caminhos_pdf)):
+            codificado = cache.obter(caminho_pdf)
+            if codificado is None:
+                _liberar_anexos(cache, [codificado for codificado, _ in anexos])
+                return None
+            anexos.append((codificado, nome or nome_arquivo(caminho_pdf)))
+    except Exception:
+        _liberar_anexos(cache, [codificado for codificado, _ in anexos])
+        raise
+    if mensagem.get_boundary() is None:
+        mensagem.set_boundary(f'=============={uuid.uuid4().hex}==')
+    return MensagemPDF(mensagem, anexos, cache)
+
+def montar_mensagem_pdf(mensagem, caminho_pdf, nome=None):
+    """Associa o PDF (via cache) a uma mensagem multipart já montada"""
+    return montar_mensagem_pdfs(mensagem, [caminho_pdf], [nome])
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_cache_anexos():
+    """Retorna o cache de anexos compartilhado pelo processo"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheAnexos(
+                current_app.config['ANEXOS_CACHE_DIR'],
+                current_app.config.get('ANEXOS_CACHE_TAMANHO_MAXIMO', 2 * 1024 ** 3),
+                obter_armazenamento()
+            )
+        return _cache
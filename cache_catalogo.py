@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, request, json, Response
+from src.models.store import db, Produto
+
+Entrada = namedtuple('Entrada', ['dados', 'corpo', 'etag'])
+
+class CacheRespostas:
+    """Cache em memória de respostas JSON já serializadas.
+
+    Cada entrada guarda o objeto, os bytes prontos para a resposta e um ETag
+    calculado uma vez a partir do conteúdo. Gravações no catálogo chamam
+    invalidar(), que incrementa a versão e descarta tudo; o TTL limita por
+    quanto tempo outros processos podem servir uma versão antiga.
+    """
+
+    def __init__(self, ttl=60, max_entradas=1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.versao = 0
+        self._entradas = OrderedDict()  # chave -> (versao, expira_em, Entrada)
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar):
+        """Retorna a Entrada da chave, chamando gerar() em caso de falta.
+
+        Se gerar() retornar None (ex.: produto inexistente), nada é guardado e
+        o retorno é None.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            item = self._entradas.get(chave)
+            if item and item[0] == self.versao and item[1] > agora:
+                self._entradas.move_to_end(chave)
+                return item[2]
+            versao = self.versao
+
+        dados = gerar()
+        if dados is None:
+            return None
+
+        corpo = json.dumps(dados).encode('utf-8')
+        etag = hashlib.blake2b(corpo, digest_size=12).hexdigest()
+        entrada = Entrada(dados, corpo, etag)
+
+        with self._lock:
+            # Uma invalidação durante gerar() torna o resultado obsoleto
+            if versao == self.versao:
+                self._entradas[chave] = (versao, agora + self.ttl, entrada)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return entrada
+
+    def invalidar(self):
+        with self._lock:
+            self.versao += 1
+            self._entradas.clear()
+
+def responder(entrada, status=200, cache_control='no-cache'):
+    """Resposta JSON com ETag; responde 304 se o If-None-Match bater"""
+    if request.if_none_match.contains_weak(entrada.etag):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(entrada.corpo, status=status, mimetype='application/json')
+    resposta.set_etag(entrada.etag)
+    resposta.headers['Cache-Control'] = cache_control
+    return resposta
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_cache_catalogo():
+    """Retorna o cache do catálogo compartilhado pelo processo"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheRespostas(
+                current_app.config.get('CATALOGO_CACHE_TTL', 60),
+                current_app.config.get('CATALOGO_CACHE_MAX_ENTRADAS', 1024)
+            )
+        return _cache
+
+def produto_ativo(produto_id):
+    """Entrada em cache de um produto ativo (None se não existir ou estiver inativo)"""
+    def gerar():
+        produto = db.session.get(Produto, produto_id)
+        if not produto or not produto.ativo:
+            return None
+        return produto.to_dict()
+    return obter_cache_catalogo().obter(('produto', produto_id), gerar)
+
+def invalidar_catalogo():
+    """Descarta o catálogo em cache (chamar após gravar produtos)"""
+    obter_cache_catalogo().invalidar()
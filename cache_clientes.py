@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from src.models.store import db, Cliente
+
+class CacheClientes:
+    """Cache em memória (TTL + LRU) dos dados de clientes, por id.
+
+    Guarda o to_dict() do cliente, que inclui o flag 'ativo'. Gravações no
+    cliente chamam descartar(); o TTL limita por quanto tempo outros
+    processos podem usar dados antigos (ex.: um cliente recém-desativado).
+    """
+
+    def __init__(self, ttl=30, max_entradas=10000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # id -> (expira_em, dados)
+        self._descartes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, cliente_id):
+        """Dados do cliente (None se não existir)"""
+        agora = time.monotonic()
+        with self._lock:
+            item = self._entradas.get(cliente_id)
+            if item and item[0] > agora:
+                self._entradas.move_to_end(cliente_id)
+                return item[1]
+            descartes = self._descartes
+
+        cliente = db.session.get(Cliente, cliente_id)
+        if cliente is None:
+            return None
+        dados = cliente.to_dict()
+
+        with self._lock:
+            # Um descarte durante a consulta pode ter tornado os dados obsoletos
+            if descartes == self._descartes:
+                self._entradas[cliente_id] = (agora + self.ttl, dados)
+                self._entradas.move_to_end(cliente_id)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return dados
+
+    def descartar(self, cliente_id):
+        with self._lock:
+            self._descartes += 1
+            self._entradas.pop(cliente_id, None)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_cache_clientes():
+    """Retorna o cache de clientes compartilhado pelo processo"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheClientes(
+                current_app.config.get('CLIENTES_CACHE_TTL', 30),
+                current_app.config.get('CLIENTES_CACHE_MAX_ENTRADAS', 10000)
+            )
+        return _cache
+
+def cliente_em_cache(cliente_id):
+    """Dados do cliente (None se não existir)"""
+    return obter_cache_clientes().obter(cliente_id)
+
+def cliente_ativo(cliente_id):
+    """Dados do cliente se ele existir e estiver ativo, senão None"""
+    dados = cliente_em_cache(cliente_id)
+    if not dados or not dados['ativo']:
+        return None
+    return dados
+
+def descartar_cliente(cliente_id):
+    """Remove o cliente do cache (chamar após gravar o cliente)"""
+    obter_cache_clientes().descartar(cliente_id)
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+from flask import current_app, json
+from src.models.store import db, ConfiguracaoLoja
+from src.utils.cache_catalogo import Entrada
+
+class Configuracao:
+    """Cópia somente leitura da configuração da loja, com os mesmos atributos
+    do modelo. Sem linha no banco, usa os valores padrão das colunas."""
+
+    def __init__(self, config=None):
+        for coluna in ConfiguracaoLoja.__table__.columns:
+            if config is not None:
+                valor = getattr(config, coluna.key)
+            elif coluna.default is not None and coluna.default.is_scalar:
+                valor = coluna.default.arg
+            else:
+                valor = None
+            object.__setattr__(self, coluna.key, valor)
+
+        publica = {
+            'nome_loja': self.nome_loja,
+            'cor_primaria': self.cor_primaria,
+            'cor_secundaria': self.cor_secundaria,
+            'logo_path': self.logo_path
+        }
+        corpo = json.dumps(publica).encode('utf-8')
+        object.__setattr__(self, 'publica', Entrada(
+            publica, corpo, hashlib.blake2b(corpo, digest_size=12).hexdigest()
+        ))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError('Configuração em cache é somente leitura')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome_loja': self.nome_loja,
+            'cor_primaria': self.cor_primaria,
+            'cor_secundaria': self.cor_secundaria,
+            'logo_path': self.logo_path,
+            'email_smtp_host': self.email_smtp_host,
+            'email_smtp_port': self.email_smtp_port,
+            'email_usuario': self.email_usuario,
+            'email_remetente': self.email_remetente,
+            'modo_entrega': self.modo_entrega,
+            'validade_link_horas': self.validade_link_horas
+        }
+
+class CacheConfiguracao:
+    """Configuração da loja mantida em memória pelo processo.
+
+    Cada gravação incrementa ConfiguracaoLoja.versao. A cada `intervalo`
+    segundos o cache lê só a versão (uma consulta mínima) e recarrega a
+    linha se ela mudou, de modo que os outros processos percebem a mudança
+    sem consultar a configuração a cada requisição.
+    """
+
+    def __init__(self, intervalo=5):
+        self.intervalo = intervalo
+        self._atual = None
+        self._versao = None
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+
+    def obter(self):
+        agora = time.monotonic()
+        with self._lock:
+            atual = self._atual
+            if atual is not None and agora - self._verificado_em < self.intervalo:
+                return atual
+            versao_atual = self._versao
+
+        versao = db.session.query(ConfiguracaoLoja.versao).order_by(ConfiguracaoLoja.id).limit(1).scalar()
+        if atual is None or versao != versao_atual:
+            atual = Configuracao(ConfiguracaoLoja.query.order_by(ConfiguracaoLoja.id).first())
+
+        with self._lock:
+            self._atual = atual
+            self._versao = versao
+            self._verificado_em = agora
+        return atual
+
+    def invalidar(self):
+        with self._lock:
+            self._atual = None
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_cache_configuracao():
+    """Retorna o cache de configuração compartilhado pelo processo"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheConfiguracao(current_app.config.get('CONFIGURACAO_VERIFICAR_INTERVALO', 5))
+        return _cache
+
+def configuracao_loja():
+    """Configuração atual da loja (somente leitura)"""
+    return obter_cache_configuracao().obter()
+
+def invalidar_configuracao():
+    """Descarta a configuração em cache (chamar após gravar a configuração)"""
+    obter_cache_configuracao().invalidar()
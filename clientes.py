@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.store import db, Cliente
+from src.utils.paginacao import paginar, parametros_paginacao, ErroPaginacao
+from src.utils.cache_clientes import cliente_em_cache, cliente_ativo, descartar_cliente
+from src.utils.senhas import (
+    ErroSenhas, responder_erro, verificar_limites, registrar_falha, limpar_falhas, atualizar_hash
+)
 from functools import wraps
 import re
 
@@ -11,11 +16,15 @@ def validar_email(email):
     return re.match(pattern, email) is not None
 
 def login_required(f):
-    """Decorator para verificar se o cliente está logado"""
+    """Decorator para verificar se o cliente está logado (e ativo, pelo cache)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'cliente_id' not in session:
             return jsonify({'erro': 'Login necessário'}), 401
+        if not cliente_ativo(session['cliente_id']):
+            session.pop('cliente_id', None)
+            session.pop('cliente_nome', None)
+            return jsonify({'erro': 'Login necessário'}), 401
         return f(*args, **kwargs)
     return decorated_function
 
@@ -42,6 +51,9 @@ def cadastrar_cliente():
         if len(data['senha']) < 6:
             return jsonify({'erro': 'Senha deve ter pelo menos 6 caracteres'}), 400
         
+        # Limite por IP antes de gastar CPU com o hash
+        verificar_limites()
+        
         cliente = Cliente(
             nome=data['nome'],
             email=data['email']
@@ -59,6 +71,9 @@ def cadastrar_cliente():
             'mensagem': 'Cliente cadastrado com sucesso',
             'cliente': cliente.to_dict()
         }), 201
+    except ErroSenhas as e:
+        db.session.rollback()
+        return responder_erro(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -72,10 +87,19 @@ def login_cliente():
         if not data or not data.get('email') or not data.get('senha'):
             return jsonify({'erro': 'Email e senha são obrigatórios'}), 400
         
+        conta = f"cliente:{data['email'].lower()}"
+        verificar_limites(conta)
+        
         cliente = Cliente.query.filter_by(email=data['email'], ativo=True).first()
         
         if not cliente or not cliente.check_senha(data['senha']):
+            registrar_falha(conta)
             return jsonify({'erro': 'Email ou senha incorretos'}), 401
+        limpar_falhas(conta)
+        
+        # Hashes antigos passam para o método e custo configurados
+        if atualizar_hash(cliente, data['senha']):
+            db.session.commit()
         
         # Criar sessão
         session['cliente_id'] = cliente.id
@@ -85,6 +109,8 @@ def login_cliente():
             'mensagem': 'Login realizado com sucesso',
             'cliente': cliente.to_dict()
         }), 200
+    except ErroSenhas as e:
+        return responder_erro(e)
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -103,8 +129,10 @@ def logout_cliente():
 def obter_perfil():
     """Obtém o perfil do cliente logado"""
     try:
-        cliente = Cliente.query.get_or_404(session['cliente_id'])
-        return jsonify(cliente.to_dict()), 200
+        cliente = cliente_em_cache(session['cliente_id'])
+        if not cliente:
+            return jsonify({'erro': 'Cliente não encontrado'}), 404
+        return jsonify(cliente), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -147,11 +175,15 @@ def atualizar_perfil():
             cliente.set_senha(data['senha'])
         
         db.session.commit()
+        descartar_cliente(cliente.id)
         
         return jsonify({
             'mensagem': 'Perfil atualizado com sucesso',
             'cliente': cliente.to_dict()
         }), 200
+    except ErroSenhas as e:
+        db.session.rollback()
+        return responder_erro(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
@@ -161,11 +193,11 @@ def verificar_status():
     """Verifica se o cliente está logado"""
     try:
         if 'cliente_id' in session:
-            cliente = Cliente.query.get(session['cliente_id'])
-            if cliente and cliente.ativo:
+            cliente = cliente_ativo(session['cliente_id'])
+            if cliente:
                 return jsonify({
                     'logado': True,
-                    'cliente': cliente.to_dict()
+                    'cliente': cliente
                 }), 200
         
         return jsonify({'logado': False}), 200
@@ -175,11 +207,18 @@ def verificar_status():
 # Rotas administrativas para gerenciar clientes
 @clientes_bp.route('/admin/clientes', methods=['GET'])
 def listar_clientes():
-    """Lista todos os clientes (rota administrativa)"""
+    """Lista os clientes, paginados por cursor (rota administrativa)"""
     try:
         # TODO: Adicionar verificação de autenticação de admin
-        clientes = Cliente.query.all()
-        return jsonify([cliente.to_dict() for cliente in clientes]), 200
+        pagina = paginar(
+            Cliente.query,
+            [Cliente.id],
+            lambda clientes: [cliente.to_dict() for cliente in clientes],
+            **parametros_paginacao()
+        )
+        return jsonify(pagina), 200
+    except ErroPaginacao as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -198,6 +237,7 @@ def admin_atualizar_cliente(cliente_id):
             cliente.ativo = data['ativo']
         
         db.session.commit()
+        descartar_cliente(cliente.id)
         
         return jsonify({
             'mensagem': 'Cliente atualizado com sucesso',
@@ -0,0 +1,133 @@
+"""Diagnóstico de desempenho por requisição (opcional, DIAGNOSTICO_HABILITADO).
+
+- Cabeçalho Server-Timing em toda resposta: db (comandos SQL), serialize
+  (to_dict/jsonify, sem o SQL disparado durante a serialização) e total;
+- log dos comandos SQL mais lentos que DIAGNOSTICO_SQL_LENTO_MS, com os
+  parâmetros e a rota;
+- detector de N+1: o mesmo formato de SQL executado mais de
+  DIAGNOSTICO_N_MAIS_1_LIMITE vezes na requisição é registrado no log e, com
+  DIAGNOSTICO_N_MAIS_1_FALHAR (padrão: app.testing), faz a requisição falhar.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Listas de parâmetros de IN (?, ?, ...) têm o mesmo formato seja qual for o tamanho
+_LISTA_PARAMETROS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACOS = re.compile(r'\s+')
+
+class ErroNMais1(AssertionError):
+    """Requisição repetiu o mesmo SQL além do limite (levantado só no modo de teste)"""
+
+def formato_sql(sql):
+    """SQL normalizado, usado para agrupar execuções do mesmo comando"""
+    return _LISTA_PARAMETROS.sub('(?)', _ESPACOS.sub(' ', sql).strip())
+
+def _ativo():
+    return has_request_context() and 'diagnostico' in g
+
+@contextmanager
+def etapa(nome):
+    """Soma a duração do bloco à etapa `nome` do Server-Timing, descontando o
+    tempo de SQL executado dentro dele (que já entra em 'db').
+
+    Sem o diagnóstico habilitado, não faz nada.
+    """
+    if not _ativo():
+        yield
+        return
+    diagnostico = g.diagnostico
+    inicio = time.perf_counter()
+    db_inicio = diagnostico['db']
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio - (diagnostico['db'] - db_inicio)
+        diagnostico['etapas'][nome] = diagnostico['etapas'].get(nome, 0.0) + duracao
+
+class JSONMedido(DefaultJSONProvider):
+    """Provider JSON do Flask que mede a serialização na etapa 'serialize'"""
+
+    def dumps(self, obj, **kwargs):
+        with etapa('serialize'):
+            return super().dumps(obj, **kwargs)
+
+def _rota():
+    return f'{request.method} {request.path} ({request.endpoint})'
+
+def _antes_requisicao():
+    g.diagnostico = {
+        'inicio': time.perf_counter(),
+        'db': 0.0,
+        'consultas': 0,
+        'formatos': Counter(),
+        'etapas': {'serialize': 0.0}
+    }
+
+def _depois_requisicao(resposta):
+    diagnostico = g.pop('diagnostico', None)
+    if diagnostico is None:
+        return resposta
+    config = current_app.config
+
+    total = time.perf_counter() - diagnostico['inicio']
+    partes = [f'db;dur={diagnostico["db"] * 1000:.1f};desc="{diagnostico["consultas"]} consulta(s)"']
+    partes += [f'{nome};dur={duracao * 1000:.1f}' for nome, duracao in diagnostico['etapas'].items()]
+    partes.append(f'total;dur={total * 1000:.1f}')
+    resposta.headers['Server-Timing'] = ', '.join(partes)
+
+    limite = config.get('DIAGNOSTICO_N_MAIS_1_LIMITE', 10)
+    repetidos = [(sql, vezes) for sql, vezes in diagnostico['formatos'].items() if vezes > limite]
+    for sql, vezes in repetidos:
+        logger.warning('Possível N+1 em %s: %d execuções de %s', _rota(), vezes, sql)
+    if repetidos and config.get('DIAGNOSTICO_N_MAIS_1_FALHAR', current_app.testing):
+        sql, vezes = repetidos[0]
+        raise ErroNMais1(f'{_rota()} executou {vezes} vezes (limite {limite}): {sql}')
+    return resposta
+
+def _antes_sql(conexao, cursor, sql, parametros, contexto, executemany):
+    conexao.info.setdefault('diagnostico_inicio', []).append(time.perf_counter())
+
+def _depois_sql(conexao, cursor, sql, parametros, contexto, executemany):
+    pilha = conexao.info.get('diagnostico_inicio')
+    if not pilha:
+        return
+    duracao = time.perf_counter() - pilha.pop()
+    if not _ativo():
+        return
+
+    diagnostico = g.diagnostico
+    diagnostico['db'] += duracao
+    diagnostico['consultas'] += 1
+    diagnostico['formatos'][formato_sql(sql)] += 1
+
+    if duracao * 1000 >= current_app.config.get('DIAGNOSTICO_SQL_LENTO_MS', 100):
+        logger.warning(
+            'SQL lento (%.1f ms) em %s: %s | parâmetros: %.500r',
+            duracao * 1000, _rota(), _ESPACOS.sub(' ', sql).strip(), parametros
+        )
+
+def _erro_sql(contexto):
+    # O after_cursor_execute não é chamado quando o comando falha
+    if contexto.connection is not None:
+        pilha = contexto.connection.info.get('diagnostico_inicio')
+        if pilha:
+            pilha.pop()
+
+def instalar_diagnostico(app, db):
+    """Registra os hooks de requisição, os eventos SQL e o provider JSON
+    medido (chamar após db.init_app)"""
+    app.json = JSONMedido(app)
+    app.before_request(_antes_requisicao)
+    app.after_request(_depois_requisicao)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_sql)
+        event.listen(db.engine, 'after_cursor_execute', _depois_sql)
+        event.listen(db.engine, 'handle_error', _erro_sql)
@@ -0,0 +1,197 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, update, or_
+from sqlalchemy.orm import joinedload
+from src.models.store import db, EntregaEmail, Venda
+
+logger = logging.getLogger(__name__)
+
+# Evento usado para acordar os workers assim que uma entrega é enfileirada
+_despertar = threading.Event()
+_parar = threading.Event()
+_workers = []
+
+def enfileirar_email(venda):
+    """Adiciona a venda à fila de entrega (o commit fica a cargo de quem chama)"""
+    entrega = EntregaEmail(venda=venda)
+    db.session.add(entrega)
+    return entrega
+
+def enfileirar_email_pedido(id_pedido, id_venda):
+    """Adiciona à fila uma única entrega para todas as vendas do pedido
+    (id_venda é a primeira venda do pedido)"""
+    entrega = EntregaEmail(id_venda=id_venda, id_pedido=id_pedido)
+    db.session.add(entrega)
+    return entrega
+
+def notificar_entrega():
+    """Acorda os workers para processar as entregas recém-enfileiradas"""
+    _despertar.set()
+
+def calcular_espera(tentativas, espera_base, espera_maxima):
+    """Calcula o intervalo (em segundos) até a próxima tentativa, com backoff exponencial"""
+    return min(espera_base * (2 ** max(tentativas - 1, 0)), espera_maxima)
+
+def reservar_proxima_entrega(tempo_reserva, max_tentativas=None):
+    """Reserva a próxima entrega disponível para este worker.
+
+    A reserva é feita com um UPDATE condicional, de modo que apenas um worker
+    (mesmo entre processos diferentes) consegue ficar com cada entrega. Entregas
+    presas em 'enviando' voltam a ficar disponíveis quando a reserva expira; a
+    tentativa interrompida conta em `tentativas`, e a entrega que esgotar
+    `max_tentativas` assim passa a 'falhou' em vez de ser enviada de novo.
+    """
+    agora = datetime.utcnow()
+    disponivel = or_(EntregaEmail.status == 'pendente', EntregaEmail.status == 'enviando')
+
+    candidato = db.session.query(EntregaEmail.id).filter(
+        disponivel,
+        EntregaEmail.proxima_tentativa <= agora
+    ).order_by(EntregaEmail.proxima_tentativa, EntregaEmail.id).first()
+
+    if not candidato:
+        return None
+
+    # No SET, status ainda tem o valor anterior: 'enviando' é uma reserva expirada
+    retomada = EntregaEmail.status == 'enviando'
+    resultado = db.session.execute(
+        update(EntregaEmail)
+        .where(
+            EntregaEmail.id == candidato.id,
+            disponivel,
+            EntregaEmail.proxima_tentativa <= agora
+        )
+        .values(
+            status='enviando',
+            proxima_tentativa=agora + timedelta(seconds=tempo_reserva),
+            tentativas=case(
+                (retomada, func.coalesce(EntregaEmail.tentativas, 0) + 1),
+                else_=EntregaEmail.tentativas
+            ),
+            ultimo_erro=case(
+                (retomada, 'Envio interrompido (reserva expirada)'),
+                else_=EntregaEmail.ultimo_erro
+            )
+        )
+    )
+    db.session.commit()
+
+    if resultado.rowcount != 1:
+        # Outro worker reservou a entrega antes
+        return False
+
+    entrega = db.session.get(EntregaEmail, candidato.id)
+    if max_tentativas and (entrega.tentativas or 0) >= max_tentativas:
+        entrega.status = 'falhou'
+        db.session.commit()
+        return False
+    return entrega
+
+def _enviar_pedido(entrega):
+    """Envia um email com todos os produtos do pedido ainda não entregues"""
+    from src.routes.vendas import enviar_email_pedido
+
+    vendas = Venda.query.options(
+        joinedload(Venda.cliente),
+        joinedload(Venda.produto)
+    ).filter_by(id_pedido=entrega.id_pedido, email_enviado=False).order_by(Venda.id).all()
+    if not vendas:
+        # Já entregues por outro caminho (ex.: envio em lote do admin)
+        return True, None, []
+    cliente = vendas[0].cliente
+    sucesso, mensagem = enviar_email_pedido(cliente.email, cliente.nome, vendas)
+    return sucesso, mensagem, vendas
+
+def processar_entrega(entrega, config):
+    """Envia o email de uma entrega reservada e registra o resultado"""
+    from src.routes.vendas import enviar_email_pdf
+
+    if entrega.id_pedido:
+        sucesso, mensagem, vendas = _enviar_pedido(entrega)
+    else:
+        venda = entrega.venda
+        cliente = venda.cliente
+        produto = venda.produto
+
+        sucesso, mensagem = enviar_email_pdf(
+            cliente.email,
+            cliente.nome,
+            produto.nome,
+            produto.caminho_pdf,
+            produto_id=produto.id,
+            venda_id=venda.id
+        )
+        vendas = [venda]
+
+    agora = datetime.utcnow()
+    entrega.tentativas = (entrega.tentativas or 0) + 1
+
+    if sucesso:
+        entrega.status = 'enviado'
+        entrega.data_envio = agora
+        entrega.ultimo_erro = None
+        for venda in vendas:
+            venda.email_enviado = True
+    else:
+        entrega.ultimo_erro = mensagem
+        if entrega.tentativas >= config.get('ENTREGA_EMAIL_MAX_TENTATIVAS', 5):
+            entrega.status = 'falhou'
+        else:
+            espera = calcular_espera(
+                entrega.tentativas,
+                config.get('ENTREGA_EMAIL_ESPERA_BASE', 30),
+                config.get('ENTREGA_EMAIL_ESPERA_MAXIMA', 3600)
+            )
+            entrega.status = 'pendente'
+            entrega.proxima_tentativa = agora + timedelta(seconds=espera)
+
+    db.session.commit()
+    return sucesso
+
+def _executar_worker(app):
+    """Laço principal de um worker de entrega"""
+    intervalo = app.config.get('ENTREGA_EMAIL_INTERVALO', 5)
+    tempo_reserva = app.config.get('ENTREGA_EMAIL_TEMPO_RESERVA', 300)
+    max_tentativas = app.config.get('ENTREGA_EMAIL_MAX_TENTATIVAS', 5)
+
+    while not _parar.is_set():
+        encontrou = False
+        with app.app_context():
+            try:
+                entrega = reservar_proxima_entrega(tempo_reserva, max_tentativas)
+                if entrega is not None:
+                    encontrou = True
+                    if entrega:
+                        processar_entrega(entrega, app.config)
+            except Exception:
+                logger.exception('Erro ao processar entrega de email')
+                db.session.rollback()
+
+        if not encontrou:
+            _despertar.wait(intervalo)
+            _despertar.clear()
+
+def iniciar_entrega(app):
+    """Inicia o pool de workers de entrega de emails"""
+    if _workers:
+        return
+
+    _parar.clear()
+    for i in range(app.config.get('ENTREGA_EMAIL_WORKERS', 2)):
+        worker = threading.Thread(
+            target=_executar_worker,
+            args=(app,),
+            name=f'entrega-email-{i}',
+            daemon=True
+        )
+        worker.start()
+        _workers.append(worker)
+
+def parar_entrega(timeout=None):
+    """Sinaliza aos workers que devem encerrar e aguarda o término"""
+    _parar.set()
+    _despertar.set()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers.clear()
@@ -0,0 +1,110 @@
+import os
+import unicodedata
+from flask import current_app, redirect, request, Response
+from urllib.parse import quote
+from werkzeug.http import dump_options_header, is_resource_modified
+from werkzeug.wsgi import wrap_file
+from src.utils.armazenamento import obter_armazenamento, nome_arquivo
+
+def _caminho_interno(caminho, raiz, prefixo):
+    """Traduz o caminho no disco para a location interna do servidor web"""
+    relativo = os.path.relpath(os.path.abspath(caminho), os.path.abspath(raiz))
+    if relativo.startswith('..'):
+        return None
+    return prefixo.rstrip('/') + '/' + relativo.replace(os.sep, '/')
+
+def parametros_nome(nome):
+    """Parâmetros de nome para Content-Disposition (RFC 6266 para não-ASCII)"""
+    try:
+        nome.encode('ascii')
+    except UnicodeEncodeError:
+        simples = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simples, 'filename*': f"UTF-8''{quote(nome, safe='')}"}
+    return {'filename': nome}
+
+def responder_conteudo(armazenamento, chave, info, mimetype=None, etag=None):
+    """Resposta que transmite a chave pelo app, com ETag, Last-Modified e
+    suporte a Range/If-Range e requisições condicionais.
+
+    Usa os metadados já conhecidos (`info`), sem stat nem HEAD; o arquivo só é
+    aberto quando o conteúdo vai ser enviado.
+    """
+    etag = etag or info.etag
+    if not is_resource_modified(request.environ, etag=etag, last_modified=info.modificado_em):
+        resposta = Response(status=304)
+        resposta.set_etag(etag)
+        resposta.last_modified = info.modificado_em
+        return resposta
+
+    resposta = Response(
+        wrap_file(request.environ, armazenamento.abrir(chave)),
+        mimetype=mimetype or info.mimetype,
+        direct_passthrough=True
+    )
+    resposta.content_length = info.tamanho
+    resposta.set_etag(etag)
+    resposta.last_modified = info.modificado_em
+    return resposta.make_conditional(request.environ, accept_ranges=True, complete_length=info.tamanho)
+
+def enviar_arquivo(chave, as_attachment=True, mimetype=None, nome=None):
+    """Envia um arquivo do armazenamento com suporte a Range/If-Range, ETag e
+    requisições condicionais (If-None-Match/If-Modified-Since). `nome` vai no
+    Content-Disposition (padrão: o nome da chave).
+
+    No armazenamento S3, responde com um redirecionamento para uma URL
+    assinada (ARMAZENAMENTO_URL_VALIDADE segundos) e o download sai direto do
+    bucket. No disco, com DOWNLOAD_OFFLOAD = 'x-sendfile' ou
+    'x-accel-redirect', a resposta só carrega os cabeçalhos e o servidor web
+    (Apache/nginx) transmite o arquivo. Retorna None se o arquivo não existir.
+    """
+    armazenamento = obter_armazenamento()
+    info = armazenamento.metadados(chave)
+    if info is None:
+        return None
+
+    config = current_app.config
+    disposicao = ('attachment' if as_attachment else 'inline', parametros_nome(nome or nome_arquivo(chave)))
+    caminho = armazenamento.caminho_local(chave)
+
+    if caminho is None:
+        url = armazenamento.url_assinada(
+            chave,
+            config.get('ARMAZENAMENTO_URL_VALIDADE', 300),
+            dump_options_header(*disposicao),
+            mimetype
+        )
+        resposta = redirect(url)
+        # A URL assinada expira: o redirecionamento não pode ser reaproveitado
+        resposta.headers['Cache-Control'] = 'private, no-store'
+        return resposta
+
+    offload = config.get('DOWNLOAD_OFFLOAD')
+
+    if not offload:
+        resposta = responder_conteudo(armazenamento, chave, info, mimetype)
+        resposta.headers.set('Content-Disposition', disposicao[0], **disposicao[1])
+        resposta.headers['Cache-Control'] = 'private, no-transform'
+        return resposta
+
+    if not is_resource_modified(request.environ, etag=info.etag, last_modified=info.modificado_em):
+        resposta = Response(status=304)
+    else:
+        # Os bytes (e os intervalos pedidos em Range) ficam a cargo do servidor web
+        resposta = Response(mimetype=mimetype or info.mimetype)
+        resposta.headers.set('Content-Disposition', disposicao[0], **disposicao[1])
+        if offload == 'x-accel-redirect':
+            interno = _caminho_interno(
+                caminho,
+                config['DOWNLOAD_RAIZ'],
+                config.get('DOWNLOAD_ACCEL_PREFIXO', '/protegido')
+            )
+            if interno is None:
+                raise ValueError('Arquivo fora do diretório configurado em DOWNLOAD_RAIZ')
+            resposta.headers['X-Accel-Redirect'] = interno
+        else:
+            resposta.headers['X-Sendfile'] = os.path.abspath(caminho)
+
+    resposta.set_etag(info.etag)
+    resposta.last_modified = info.modificado_em
+    resposta.headers['Cache-Control'] = 'private, no-transform'
+    return resposta
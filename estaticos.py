@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from flask import request, Response
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+# Tipos que valem a pena comprimir (imagens, fontes woff2 etc. já são comprimidos)
+TIPOS_COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json',
+                      'application/xml', 'image/svg+xml', 'application/manifest+json')
+
+# Nomes gerados pelo build do Vite: assets/index-4f3a9c1b.js
+PADRAO_FINGERPRINT = r'(^|/)assets/.+[-.][A-Za-z0-9_-]{8,}\.\w+$'
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+# Uma forma de servir o arquivo: conteúdo em memória (corpo) ou caminho no disco
+Variante = namedtuple('Variante', ['corpo', 'caminho', 'tamanho', 'etag', 'codificacao'])
+
+Arquivo = namedtuple('Arquivo', ['mimetype', 'cache_control', 'variantes'])  # codificação -> Variante
+
+def _comprimivel(mimetype):
+    return mimetype.startswith(TIPOS_COMPRIMIVEIS)
+
+def _ler(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read()
+
+def _comprimir(conteudo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(conteudo, quality=11)
+    return gzip.compress(conteudo, compresslevel=9, mtime=0)
+
+class ManifestoEstaticos:
+    """Índice dos arquivos da pasta static montado na inicialização.
+
+    Para cada arquivo guarda o tipo, a política de cache e as variantes
+    (identity, gzip e br). Variantes .gz/.br geradas pelo build ao lado do
+    arquivo são aproveitadas; as que faltarem são comprimidas aqui, uma vez.
+    Arquivos até `max_memoria` bytes ficam em memória; os maiores são lidos
+    do disco com o tamanho já conhecido. Assim uma requisição não faz stat
+    nem compressão.
+    """
+
+    def __init__(self, pasta, max_memoria=1024 ** 2, padrao_fingerprint=PADRAO_FINGERPRINT):
+        self.pasta = pasta
+        self.max_memoria = max_memoria
+        self._fingerprint = re.compile(padrao_fingerprint)
+        self.arquivos = {}  # caminho relativo (com /) -> Arquivo
+        if pasta and os.path.isdir(pasta):
+            self._carregar()
+
+    def _carregar(self):
+        for raiz, _, nomes in os.walk(self.pasta):
+            for nome in nomes:
+                if nome.endswith(('.gz', '.br')) and os.path.exists(os.path.join(raiz, nome[:-3])):
+                    continue  # variante de outro arquivo
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                self.arquivos[relativo] = self._indexar(relativo, caminho)
+
+    def _indexar(self, relativo, caminho):
+        mimetype = mimetypes.guess_type(relativo)[0] or 'application/octet-stream'
+        if self._fingerprint.search(relativo):
+            cache_control = CACHE_IMUTAVEL
+        else:
+            cache_control = CACHE_REVALIDAR
+
+        conteudo = _ler(caminho)
+        etag = hashlib.blake2b(conteudo, digest_size=12).hexdigest()
+        variantes = {'identity': self._variante(conteudo, caminho, etag, 'identity')}
+
+        if _comprimivel(mimetype):
+            for codificacao, extensao in (('br', '.br'), ('gzip', '.gz')):
+                if os.path.exists(caminho + extensao):
+                    comprimido = _ler(caminho + extensao)
+                elif codificacao == 'br' and brotli is None:
+                    continue
+                else:
+                    comprimido = _comprimir(conteudo, codificacao)
+                if len(comprimido) >= len(conteudo):
+                    continue
+                variantes[codificacao] = self._variante(
+                    comprimido, caminho + extensao, f'{etag}-{codificacao}', codificacao
+                )
+        return Arquivo(mimetype, cache_control, variantes)
+
+    def _variante(self, conteudo, caminho, etag, codificacao):
+        if len(conteudo) <= self.max_memoria:
+            return Variante(conteudo, None, len(conteudo), etag, codificacao)
+        if not os.path.exists(caminho):
+            # Comprimido aqui e grande demais para a memória: grava ao lado do original
+            with open(caminho, 'wb') as arquivo:
+                arquivo.write(conteudo)
+        return Variante(None, caminho, len(conteudo), etag, codificacao)
+
+    def obter(self, caminho):
+        return self.arquivos.get(caminho)
+
+def _escolher_variante(arquivo):
+    """Variante preferida pelo Accept-Encoding do cliente (br > gzip > identity)"""
+    aceitas = request.accept_encodings
+    for codificacao in ('br', 'gzip'):
+        variante = arquivo.variantes.get(codificacao)
+        if variante and aceitas[codificacao]:
+            return variante
+    return arquivo.variantes['identity']
+
+def servir_estatico(arquivo):
+    """Resposta para um arquivo do manifesto, com ETag, Cache-Control e Vary"""
+    variante = _escolher_variante(arquivo)
+    if request.if_none_match.contains_weak(variante.etag):
+        resposta = Response(status=304)
+    elif variante.corpo is not None:
+        resposta = Response(variante.corpo, mimetype=arquivo.mimetype)
+    else:
+        resposta = Response(
+            wrap_file(request.environ, open(variante.caminho, 'rb')),
+            mimetype=arquivo.mimetype,
+            direct_passthrough=True
+        )
+        resposta.content_length = variante.tamanho
+
+    resposta.set_etag(variante.etag)
+    resposta.headers['Cache-Control'] = arquivo.cache_control
+    if len(arquivo.variantes) > 1:
+        resposta.vary.add('Accept-Encoding')
+    if variante.codificacao != 'identity' and resposta.status_code == 200:
+        resposta.content_encoding = variante.codificacao
+    return resposta
+
+def carregar_manifesto(app):
+    """Monta o manifesto da pasta static do app (chamar na inicialização)"""
+    manifesto = ManifestoEstaticos(
+        app.static_folder,
+        app.config.get('ESTATICOS_MAX_MEMORIA', 1024 ** 2),
+        app.config.get('ESTATICOS_PADRAO_FINGERPRINT', PADRAO_FINGERPRINT)
+    )
+    app.extensions['manifesto_estaticos'] = manifesto
+    return manifesto
@@ -0,0 +1,194 @@
+"""Teste de estresse de concorrência do SQLite.
+
+Para cada perfil do motor, cria um banco temporário e executa ao mesmo tempo
+processos de compra (transação de escrita com a venda e o resumo, mantida
+aberta por alguns milissegundos como no checkout) e processos de leitura (a
+listagem de vendas do admin), como fariam vários workers do gunicorn.
+
+Os leitores usam busy_timeout=0: toda leitura que teria de esperar por um
+escritor falha na hora com "database is locked" e é contada como bloqueio
+(e repetida). Assim o resultado não depende do tempo de CPU da máquina.
+
+Uso: flask --app main estresse-sqlite
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from src.models.store import db, Produto, Cliente, Venda, ResumoVendasStatus
+from src.models.motor_sqlite import PERFIS_SQLITE, perfil_sqlite, opcoes_motor, registrar_pragmas
+
+def criar_motor(config, perfil, caminho_banco):
+    """Motor com as mesmas opções e pragmas que o app usaria no perfil"""
+    config = {**config, 'SQLITE_PERFIL': perfil, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{caminho_banco}'}
+    motor = create_engine(config['SQLALCHEMY_DATABASE_URI'], **opcoes_motor(config))
+    registrar_pragmas(motor, perfil_sqlite(config)[0])
+    return motor
+
+def popular(motor, produtos=200, clientes=200, vendas=5000):
+    db.metadata.create_all(motor)
+    agora = datetime.utcnow()
+    with motor.begin() as conexao:
+        conexao.execute(insert(Produto), [
+            {'nome': f'Produto {i}', 'preco': 10.0, 'caminho_pdf': f'/tmp/produto-{i}.pdf'}
+            for i in range(1, produtos + 1)
+        ])
+        conexao.execute(insert(Cliente), [
+            {'nome': f'Cliente {i}', 'email': f'cliente{i}@exemplo.com', 'senha_hash': 'x'}
+            for i in range(1, clientes + 1)
+        ])
+        conexao.execute(insert(Venda), [
+            {
+                'id_cliente': 1 + i % clientes,
+                'id_produto': 1 + i % produtos,
+                'data_venda': agora - timedelta(minutes=i),
+                'preco_total': 10.0,
+                'status': 'concluida'
+            }
+            for i in range(vendas)
+        ])
+        conexao.execute(insert(ResumoVendasStatus), [
+            {'status': 'concluida', 'total_vendas': vendas, 'receita': 10.0 * vendas}
+        ])
+
+def _comprar(motor, numero, pausa):
+    """Transação de escrita no formato do checkout"""
+    with motor.begin() as conexao:
+        preco = conexao.execute(select(Produto.preco).where(Produto.id == 1 + numero % 200)).scalar()
+        conexao.execute(insert(Venda).values(
+            id_cliente=1 + numero % 200,
+            id_produto=1 + numero % 200,
+            data_venda=datetime.utcnow(),
+            preco_total=preco,
+            status='concluida'
+        ))
+        conexao.execute(
+            ResumoVendasStatus.__table__.update()
+            .where(ResumoVendasStatus.status == 'concluida')
+            .values(total_vendas=ResumoVendasStatus.total_vendas + 1,
+                    receita=ResumoVendasStatus.receita + preco)
+        )
+        # Trabalho do checkout com a transação aberta (fila de email, etc.)
+        time.sleep(pausa)
+
+def _ler(motor):
+    """Primeira página da listagem de vendas do admin e o total"""
+    with motor.connect() as conexao:
+        conexao.execute(
+            select(Venda.id, Venda.data_venda, Cliente.nome, Produto.nome)
+            .outerjoin(Cliente, Cliente.id == Venda.id_cliente)
+            .outerjoin(Produto, Produto.id == Venda.id_produto)
+            .order_by(Venda.data_venda.desc(), Venda.id.desc())
+            .limit(50)
+        ).all()
+        conexao.execute(select(func.count(Venda.id))).scalar()
+
+def _escritor(config, perfil, caminho_banco, indice, passo, segundos, pausa, fila):
+    motor = criar_motor(config, perfil, caminho_banco)
+    fim = time.monotonic() + segundos
+    compras = erros = 0
+    numero = indice
+    while time.monotonic() < fim:
+        try:
+            _comprar(motor, numero, pausa)
+            compras += 1
+        except OperationalError:
+            erros += 1
+        numero += passo
+    motor.dispose()
+    fila.put({'compras': compras, 'erros_compra': erros})
+
+def _leitor(config, perfil, caminho_banco, segundos, fila):
+    pragmas = {**(config.get('SQLITE_PRAGMAS') or {}), 'busy_timeout': 0}
+    motor = criar_motor({**config, 'SQLITE_PRAGMAS': pragmas}, perfil, caminho_banco)
+    fim = time.monotonic() + segundos
+    leituras = []
+    bloqueios = 0
+    while time.monotonic() < fim:
+        inicio = time.monotonic()
+        try:
+            _ler(motor)
+        except OperationalError:
+            bloqueios += 1
+            time.sleep(0.001)
+            continue
+        leituras.append(time.monotonic() - inicio)
+    motor.dispose()
+    fila.put({'leituras': leituras, 'bloqueios_leitura': bloqueios})
+
+def estressar(config, perfil, caminho_banco, segundos=5, escritores=4, leitores=8, pausa=0.02):
+    """Executa compras e leituras simultâneas em processos separados e
+    retorna as métricas somadas"""
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processos = [
+        contexto.Process(target=_escritor, args=(config, perfil, caminho_banco, i, escritores, segundos, pausa, fila))
+        for i in range(escritores)
+    ]
+    processos += [
+        contexto.Process(target=_leitor, args=(config, perfil, caminho_banco, segundos, fila))
+        for _ in range(leitores)
+    ]
+    for processo in processos:
+        processo.start()
+
+    metricas = {'compras': 0, 'erros_compra': 0, 'leituras': [], 'bloqueios_leitura': 0}
+    for _ in processos:
+        parcial = fila.get()
+        for chave, valor in parcial.items():
+            metricas[chave] += valor
+    for processo in processos:
+        processo.join()
+    return metricas
+
+def percentil(valores, fracao):
+    """Percentil por posição (fracao entre 0 e 1) de uma lista de valores"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))]
+
+def resumir(metricas):
+    leituras = metricas['leituras']
+    return {
+        'compras': metricas['compras'],
+        'erros_compra': metricas['erros_compra'],
+        'leituras': len(leituras),
+        'bloqueios_leitura': metricas['bloqueios_leitura'],
+        'p50_ms': percentil(leituras, 0.5) * 1000,
+        'p99_ms': percentil(leituras, 0.99) * 1000,
+        'max_ms': max(leituras, default=0.0) * 1000
+    }
+
+def executar(config_base, segundos=5):
+    """Ponto de entrada do comando: compara os perfis e retorna o código de saída.
+
+    Falha se, no perfil 'concorrente', alguma compra der erro ou alguma
+    leitura precisar esperar por uma compra.
+    """
+    # Só os ajustes do SQLite seguem para os processos
+    config = {chave: config_base.get(chave) for chave in ('SQLITE_PRAGMAS', 'SQLITE_POOL')}
+    resultados = {}
+    for perfil in PERFIS_SQLITE:
+        diretorio = tempfile.mkdtemp(prefix='estresse-')
+        caminho_banco = os.path.join(diretorio, 'estresse.db')
+        motor = criar_motor(config, perfil, caminho_banco)
+        try:
+            popular(motor)
+        finally:
+            motor.dispose()
+        resultados[perfil] = resumir(estressar(config, perfil, caminho_banco, segundos))
+
+    for perfil, r in resultados.items():
+        print(
+            f"{perfil:12} compras={r['compras']} erros={r['erros_compra']} | "
+            f"leituras={r['leituras']} bloqueadas={r['bloqueios_leitura']} "
+            f"p50={r['p50_ms']:.1f}ms p99={r['p99_ms']:.1f}ms max={r['max_ms']:.1f}ms"
+        )
+
+    concorrente = resultados['concorrente']
+    falhou = concorrente['erros_compra'] or concorrente['bloqueios_leitura']
+    return 1 if falhou else 0
@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from flask import Response, request, stream_with_context
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+from src.models.store import db
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8'
+}
+
+# Linhas lidas do banco por vez (yield_per) e linhas por bloco enviado
+LINHAS_POR_LOTE = 1000
+LINHAS_POR_BLOCO = 200
+
+# Planilhas interpretam como fórmula células que começam com estes caracteres
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+class ErroExportacao(ValueError):
+    """Parâmetros de exportação inválidos"""
+
+def _data(valor, nome, fim=False):
+    """Converte 'AAAA-MM-DD' ou data/hora ISO. Uma data sem hora como fim do
+    intervalo inclui o dia inteiro."""
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ErroExportacao(f'Data inválida em {nome}: {valor} (use AAAA-MM-DD)')
+    if data.tzinfo is not None:
+        data = data.replace(tzinfo=None) - (data.utcoffset() or timedelta())
+    if fim and len(valor) == 10:
+        data += timedelta(days=1)
+    return data
+
+def parametros_exportacao():
+    """Formato e intervalo (inicio, fim) da query string: ?formato=csv|ndjson&inicio=&fim=.
+
+    fim é exclusivo quando tem hora e inclusivo quando é só a data.
+    """
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        raise ErroExportacao('Formato deve ser csv ou ndjson')
+    inicio = request.args.get('inicio')
+    fim = request.args.get('fim')
+    inicio = _data(inicio, 'inicio') if inicio else None
+    fim = _data(fim, 'fim', fim=True) if fim else None
+    if inicio and fim and inicio >= fim:
+        raise ErroExportacao('O início deve ser anterior ao fim')
+    return formato, inicio, fim
+
+def filtrar_periodo(query, coluna, inicio, fim):
+    if inicio:
+        query = query.filter(coluna >= inicio)
+    if fim:
+        query = query.filter(coluna < fim)
+    return query
+
+def sem_indice(coluna):
+    """`+coluna`: o SQLite não usa índices da coluna para filtrá-la.
+
+    Num filtro de exportação, evita que o planejador troque o índice da
+    ordenação por um índice do filtro (ex.: status), o que obrigaria a ordenar
+    todo o resultado (USE TEMP B-TREE) antes de enviar a primeira linha.
+    """
+    return UnaryExpression(coluna, operator=operators.custom_op('+'), type_=coluna.type)
+
+def _celula(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+def _json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+def gerar_csv(linhas, colunas):
+    """Gera o CSV em blocos: o cabeçalho sai antes da primeira consulta ao banco"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(colunas)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    pendentes = 0
+    for linha in linhas:
+        escritor.writerow([_celula(linha[coluna]) for coluna in colunas])
+        pendentes += 1
+        if pendentes >= LINHAS_POR_BLOCO:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendentes = 0
+    if pendentes:
+        yield buffer.getvalue()
+
+def gerar_ndjson(linhas):
+    """Gera um objeto JSON por linha, em blocos de LINHAS_POR_BLOCO"""
+    bloco = []
+    for linha in linhas:
+        bloco.append(json.dumps(linha, default=_json, ensure_ascii=False))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield '\n'.join(bloco) + '\n'
+            bloco = []
+    if bloco:
+        yield '\n'.join(bloco) + '\n'
+
+def responder_exportacao(query, serializar, colunas, formato, nome):
+    """Resposta em streaming com as linhas da consulta.
+
+    A consulta é percorrida com yield_per (LINHAS_POR_LOTE linhas por vez), e
+    cada linha é convertida por `serializar` em um dict com as `colunas`. Só
+    um lote fica na memória, seja qual for o tamanho do resultado.
+    """
+    def ler_linhas():
+        # O stream roda depois do fim da view, quando a sessão em que a consulta
+        # foi montada já saiu do registro: a consulta vai para a sessão atual,
+        # que o teardown do contexto do stream fecha, devolvendo a conexão
+        for linha in query.with_session(db.session()).yield_per(LINHAS_POR_LOTE):
+            yield serializar(linha)
+
+    linhas = ler_linhas()
+    if formato == 'csv':
+        corpo = gerar_csv(linhas, colunas)
+    else:
+        corpo = gerar_ndjson(linhas)
+
+    resposta = Response(stream_with_context(corpo), content_type=FORMATOS[formato])
+    carimbo = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}-{carimbo}.{formato}"'
+    resposta.headers['Cache-Control'] = 'no-store'
+    # Proxies como o nginx não devem acumular a resposta antes de repassá-la
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
@@ -0,0 +1,206 @@
+import codecs
+import csv
+import io
+import itertools
+import json
+import math
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.store import db, Produto
+from src.utils.cache_catalogo import invalidar_catalogo
+
+FORMATOS = ('csv', 'ndjson')
+
+# Erros listados no resultado; além disso só são contados, para a memória
+# não crescer com o tamanho do arquivo
+MAXIMO_ERROS_RELATADOS = 1000
+
+VERDADEIRO = {'1', 'true', 'sim', 's', 'yes', 'y', 'ativo'}
+FALSO = {'0', 'false', 'nao', 'não', 'n', 'no', 'inativo'}
+
+class ErroImportacao(ValueError):
+    """Arquivo de importação inválido como um todo (formato, cabeçalho).
+
+    Se a leitura falhar no meio do arquivo, `resultado` traz o que já foi gravado.
+    """
+
+    def __init__(self, mensagem, resultado=None):
+        super().__init__(mensagem)
+        self.resultado = resultado
+
+def formato_por_tipo(mimetype, nome_arquivo=''):
+    """Formato ('csv' ou 'ndjson') a partir do Content-Type ou da extensão"""
+    nome_arquivo = (nome_arquivo or '').lower()
+    if mimetype in ('text/csv', 'application/csv') or nome_arquivo.endswith('.csv'):
+        return 'csv'
+    if mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq') \
+            or nome_arquivo.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+def _texto(stream):
+    """Lê o stream binário como texto UTF-8 (com ou sem BOM), sem carregá-lo inteiro"""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return codecs.getreader('utf-8-sig')(stream)
+
+def ler_csv(stream):
+    """Gera (número da linha, dict) do CSV. O separador (',' ou ';') é
+    detectado pelo cabeçalho."""
+    texto = _texto(stream)
+    cabecalho = texto.readline()
+    if not cabecalho.strip():
+        raise ErroImportacao('Arquivo CSV vazio')
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    leitor = csv.DictReader(itertools.chain([cabecalho], texto), delimiter=delimitador)
+    leitor.fieldnames = [campo.strip().lower() for campo in leitor.fieldnames]
+    if 'nome' not in leitor.fieldnames or 'preco' not in leitor.fieldnames:
+        raise ErroImportacao('O cabeçalho do CSV deve ter as colunas nome e preco')
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+def ler_ndjson(stream):
+    """Gera (número da linha, dict ou ValueError) de um arquivo com um objeto JSON por linha"""
+    for numero, linha in enumerate(_texto(stream), start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            yield numero, ValueError(f'JSON inválido: {e}')
+            continue
+        if not isinstance(registro, dict):
+            yield numero, ValueError('Cada linha deve ser um objeto JSON')
+            continue
+        yield numero, registro
+
+def _preco(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+        if ',' in valor and '.' not in valor:
+            valor = valor.replace(',', '.')  # 19,90
+    preco = float(valor)
+    if not math.isfinite(preco) or preco < 0:
+        raise ValueError
+    return preco
+
+def _booleano(valor):
+    if valor is None or valor == '':
+        return True
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor).strip().lower()
+    if texto in VERDADEIRO:
+        return True
+    if texto in FALSO:
+        return False
+    raise ValueError(f'Valor inválido para ativo: {valor}')
+
+def validar_produto(registro):
+    """Converte um registro do arquivo nas colunas de Produto (ValueError se inválido)"""
+    nome = str(registro.get('nome') or '').strip()
+    if not nome:
+        raise ValueError('Nome é obrigatório')
+    if len(nome) > 200:
+        raise ValueError('Nome com mais de 200 caracteres')
+
+    if registro.get('preco') in (None, ''):
+        raise ValueError('Preço é obrigatório')
+    try:
+        preco = _preco(registro['preco'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Preço inválido: {registro['preco']}")
+
+    caminho_pdf = str(registro.get('caminho_pdf') or '').strip()
+    imagem_capa = str(registro.get('imagem_capa') or '').strip()
+    if len(caminho_pdf) > 500 or len(imagem_capa) > 500:
+        raise ValueError('Caminho com mais de 500 caracteres')
+
+    return {
+        'nome': nome,
+        'descricao': str(registro.get('descricao') or ''),
+        'preco': preco,
+        'caminho_pdf': caminho_pdf,
+        'imagem_capa': imagem_capa,
+        'ativo': _booleano(registro.get('ativo'))
+    }
+
+class ResultadoImportacao:
+    """Contagens e erros por linha (os primeiros MAXIMO_ERROS_RELATADOS)"""
+
+    def __init__(self):
+        self.linhas = 0
+        self.importados = 0
+        self.total_erros = 0
+        self.erros = []
+
+    def erro(self, numero, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAXIMO_ERROS_RELATADOS:
+            self.erros.append({'linha': numero, 'erro': mensagem})
+
+    def to_dict(self):
+        return {
+            'linhas': self.linhas,
+            'importados': self.importados,
+            'total_erros': self.total_erros,
+            'erros': self.erros,
+            'erros_omitidos': self.total_erros - len(self.erros)
+        }
+
+def _gravar_lote(lote, resultado):
+    """Insere o lote numa transação. Se o banco recusar o lote, insere linha a
+    linha (cada uma num savepoint) para apontar só as linhas com problema."""
+    try:
+        db.session.execute(insert(Produto), [linha for _, linha in lote])
+        db.session.commit()
+        resultado.importados += len(lote)
+        return
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    for numero, linha in lote:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Produto), [linha])
+            resultado.importados += 1
+        except SQLAlchemyError as e:
+            resultado.erro(numero, f'Erro ao gravar: {e.orig if hasattr(e, "orig") else e}')
+    db.session.commit()
+
+def importar_produtos(stream, formato, tamanho_lote=500):
+    """Importa produtos de um stream CSV ou NDJSON em lotes.
+
+    Cada lote de `tamanho_lote` linhas válidas é gravado com um único INSERT
+    (executemany) e um commit. Linhas inválidas entram nos erros com o número
+    da linha e não interrompem a importação. Só um lote fica na memória.
+    """
+    if formato not in FORMATOS:
+        raise ErroImportacao(f'Formato desconhecido: {formato} (use csv ou ndjson)')
+    registros = ler_csv(stream) if formato == 'csv' else ler_ndjson(stream)
+
+    resultado = ResultadoImportacao()
+    lote = []
+    try:
+        for numero, registro in registros:
+            resultado.linhas += 1
+            try:
+                if isinstance(registro, Exception):
+                    raise registro
+                lote.append((numero, validar_produto(registro)))
+            except ValueError as e:
+                resultado.erro(numero, str(e))
+                continue
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(lote, resultado)
+                lote = []
+        if lote:
+            _gravar_lote(lote, resultado)
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Arquivo corrompido: o que já foi gravado permanece
+        db.session.rollback()
+        raise ErroImportacao(f'Arquivo ilegível após a linha {resultado.linhas}: {e}', resultado)
+    finally:
+        if resultado.importados:
+            invalidar_catalogo()
+    return resultado
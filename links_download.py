@@ -0,0 +1,46 @@
+import hashlib
+import hmac
+import time
+from urllib.parse import urlencode
+from flask import current_app
+
+def _segredo():
+    segredo = current_app.config.get('LINK_DOWNLOAD_SEGREDO') or current_app.config['SECRET_KEY']
+    return segredo.encode('utf-8')
+
+def _assinar(produto_id, venda_id, expira):
+    dados = f'{produto_id}:{venda_id}:{expira}'.encode('ascii')
+    return hmac.new(_segredo(), dados, hashlib.sha256).hexdigest()
+
+def gerar_parametros(produto_id, venda_id, validade_horas):
+    """Gera os parâmetros assinados de um link de download com validade"""
+    expira = int(time.time()) + int(validade_horas * 3600)
+    return {
+        'venda': venda_id,
+        'expira': expira,
+        'assinatura': _assinar(produto_id, venda_id, expira)
+    }
+
+def gerar_link(produto_id, venda_id, validade_horas):
+    """Monta a URL absoluta de download assinado para uso fora de requisições"""
+    base = current_app.config.get('URL_PUBLICA', 'http://localhost:5000').rstrip('/')
+    parametros = urlencode(gerar_parametros(produto_id, venda_id, validade_horas))
+    return f'{base}/api/produtos/{produto_id}/download-assinado?{parametros}'
+
+def verificar_assinatura(produto_id, venda_id, expira, assinatura):
+    """Valida assinatura e validade do link, sem consultar o banco.
+
+    Retorna (valido, motivo).
+    """
+    try:
+        venda_id = int(venda_id)
+        expira = int(expira)
+    except (TypeError, ValueError):
+        return False, 'Link de download inválido'
+
+    esperado = _assinar(produto_id, venda_id, expira)
+    if not assinatura or not hmac.compare_digest(esperado, assinatura):
+        return False, 'Link de download inválido'
+    if expira < time.time():
+        return False, 'Link de download expirado'
+    return True, None
@@ -3,13 +3,25 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import click
+from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.store import db
+from src.models.migracoes import aplicar_migracoes
+from src.models.motor_sqlite import opcoes_motor, configurar_sqlite
+from src.utils.resumos_vendas import reconstruir_resumos, resumos_vazios
 from src.routes.produtos import produtos_bp
 from src.routes.clientes import clientes_bp
 from src.routes.vendas import vendas_bp
 from src.routes.admin import admin_bp
+from src.utils.entrega_email import iniciar_entrega
+from src.utils.senhas import iniciar_pool_senhas
+from src.utils.armazenamento import criar_armazenamento
+from src.utils.uploads import caminhos_absolutos_inacessiveis
+from src.utils.estaticos import carregar_manifesto, servir_estatico
+from src.utils.metricas import instalar_metricas
+from src.utils.diagnostico import instalar_diagnostico
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -26,31 +38,270 @@ app.register_blueprint(admin_bp, url_prefix='/api')
 # Configuração do banco de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Perfil do SQLite: 'concorrente' (WAL, busy timeout, pool) para vários workers
+# ou 'padrao' (journal de rollback, sem ajustes)
+app.config['SQLITE_PERFIL'] = os.environ.get('SQLITE_PERFIL', 'concorrente')
+app.config['SQLITE_PRAGMAS'] = {}  # sobrescreve pragmas do perfil
+app.config['SQLITE_POOL'] = {}  # sobrescreve opções do pool do perfil
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_motor(app.config)
 db.init_app(app)
+configurar_sqlite(app, db)
+
+# Métricas no formato do Prometheus em /metrics (cada processo expõe as suas)
+instalar_metricas(app, db)
+
+# Diagnóstico por requisição: Server-Timing, log de SQL lento e detector de N+1
+app.config['DIAGNOSTICO_HABILITADO'] = os.environ.get('DIAGNOSTICO') == '1'
+app.config['DIAGNOSTICO_SQL_LENTO_MS'] = 100  # comandos mais lentos vão para o log com os parâmetros
+app.config['DIAGNOSTICO_N_MAIS_1_LIMITE'] = 10  # execuções do mesmo SQL por requisição (com TESTING, a requisição falha)
+if app.config['DIAGNOSTICO_HABILITADO']:
+    instalar_diagnostico(app, db)
+
+# Configuração da fila de entrega de emails
+app.config['ENTREGA_EMAIL_WORKERS'] = 2
+app.config['ENTREGA_EMAIL_MAX_TENTATIVAS'] = 5
+app.config['ENTREGA_EMAIL_ESPERA_BASE'] = 30  # segundos, dobra a cada tentativa
+app.config['ENTREGA_EMAIL_ESPERA_MAXIMA'] = 3600
+app.config['ENTREGA_EMAIL_INTERVALO'] = 5  # segundos entre verificações da fila
+app.config['ENTREGA_EMAIL_TEMPO_RESERVA'] = 300  # segundos até uma entrega travada ser retomada
+
+# Pool de sessões SMTP
+app.config['SMTP_USAR_TLS'] = True
+app.config['SMTP_POOL_TAMANHO'] = 4
+app.config['SMTP_MAX_MENSAGENS_SESSAO'] = 100
+
+# Cache de anexos PDF já codificados em base64
+app.config['ANEXOS_CACHE_DIR'] = os.path.join(os.path.dirname(__file__), '..', '..', 'cache', 'anexos')
+app.config['ANEXOS_CACHE_TAMANHO_MAXIMO'] = 2 * 1024 ** 3  # bytes
+
+# Links de download assinados (usados no modo de entrega por link)
+app.config['URL_PUBLICA'] = os.environ.get('URL_PUBLICA', 'http://localhost:5000')
+app.config['LINK_DOWNLOAD_SEGREDO'] = os.environ.get('LINK_DOWNLOAD_SEGREDO')  # usa SECRET_KEY se vazio
+
+# Uploads (armazenados pelo SHA-256 do conteúdo; as partes recebidas ficam em UPLOAD_DIR/.parciais)
+# O mesmo diretório em que as versões anteriores gravavam (caminhos absolutos
+# antigos de produtos só são servidos se estiverem dentro dele)
+app.config['UPLOAD_DIR'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
+app.config['UPLOAD_TAMANHO_MAXIMO'] = 1024 ** 3  # bytes por arquivo
+app.config['UPLOAD_VALIDADE_HORAS'] = 24  # uploads em partes abandonados são descartados
+app.config['UPLOAD_PARCIAIS_MAXIMO'] = 10 * 1024 ** 3  # bytes declarados pelos uploads em partes em andamento
+
+# Armazenamento dos PDFs e imagens: 'local' (em UPLOAD_DIR, que pode ser um volume
+# compartilhado entre os nós) ou 's3' (S3 ou compatível, como o MinIO; requer o boto3).
+# Credenciais do S3 pelas variáveis AWS_ACCESS_KEY_ID e AWS_SECRET_ACCESS_KEY
+app.config['ARMAZENAMENTO'] = os.environ.get('ARMAZENAMENTO', 'local')
+app.config['ARMAZENAMENTO_S3_BUCKET'] = os.environ.get('ARMAZENAMENTO_S3_BUCKET')
+app.config['ARMAZENAMENTO_S3_PREFIXO'] = os.environ.get('ARMAZENAMENTO_S3_PREFIXO', '')
+app.config['ARMAZENAMENTO_S3_ENDPOINT'] = os.environ.get('ARMAZENAMENTO_S3_ENDPOINT')  # ex.: http://minio:9000
+app.config['ARMAZENAMENTO_S3_REGIAO'] = os.environ.get('ARMAZENAMENTO_S3_REGIAO')
+app.config['ARMAZENAMENTO_URL_VALIDADE'] = 300  # segundos das URLs assinadas de download (S3)
+app.config['ARMAZENAMENTO_CACHE_TTL'] = 300  # segundos dos metadados (tamanho, ETag) em memória
+app.config['ARMAZENAMENTO_CACHE_MAX_ENTRADAS'] = 10000
+
+# Downloads de PDFs: None (Flask envia o arquivo), 'x-sendfile' (Apache/lighttpd)
+# ou 'x-accel-redirect' (nginx, com uma location internal apontando para DOWNLOAD_RAIZ)
+app.config['DOWNLOAD_OFFLOAD'] = os.environ.get('DOWNLOAD_OFFLOAD') or None
+app.config['DOWNLOAD_RAIZ'] = app.config['UPLOAD_DIR']
+app.config['DOWNLOAD_ACCEL_PREFIXO'] = '/protegido'
+
+# Miniaturas das capas (WebP/JPEG ao lado da imagem original; requer o Pillow)
+app.config['MINIATURAS_LARGURAS'] = (160, 320, 640)  # pixels; a original nunca é ampliada
+app.config['MINIATURAS_FORMATOS'] = ('webp', 'jpeg')  # o JPEG atende navegadores sem WebP
+app.config['MINIATURAS_QUALIDADE'] = 80
+app.config['MINIATURAS_WORKERS'] = 2  # threads que redimensionam fora das requisições
+app.config['MINIATURAS_FILA_MAXIMA'] = 256  # capas pendentes; além disso, use flask gerar-miniaturas
+
+# Importação de produtos em massa (CSV/NDJSON): linhas por INSERT e commit
+app.config['PRODUTOS_IMPORTACAO_LOTE'] = 500
+app.config['PRODUTOS_IMPORTACAO_LOTE_MAXIMO'] = 5000
+
+# Paginação por cursor das listagens
+app.config['PAGINACAO_LIMITE_PADRAO'] = 50
+app.config['PAGINACAO_LIMITE_MAXIMO'] = 200
+
+# Cache do catálogo de produtos (invalidado a cada gravação de produto)
+app.config['CATALOGO_CACHE_TTL'] = 60  # segundos; limita a defasagem entre processos
+app.config['CATALOGO_CACHE_MAX_ENTRADAS'] = 1024
+
+# Cache dos dados de clientes logados (descartado a cada gravação do cliente)
+app.config['CLIENTES_CACHE_TTL'] = 30  # segundos; limita a defasagem entre processos
+app.config['CLIENTES_CACHE_MAX_ENTRADAS'] = 10000
+
+# Configuração da loja em memória (cada processo confere a versão no banco a cada intervalo)
+app.config['CONFIGURACAO_VERIFICAR_INTERVALO'] = 5  # segundos
+app.config['CONFIGURACAO_PUBLICA_MAX_AGE'] = 60  # segundos de cache no navegador para /configuracao-publica
+
+# Hash de senhas (em processos separados das requisições)
+app.config['SENHAS_METODO'] = 'pbkdf2:sha256:600000'  # hashes antigos são regravados no login
+app.config['SENHAS_PROCESSOS'] = max(1, (os.cpu_count() or 2) // 2)  # 0 calcula na própria thread
+app.config['SENHAS_FILA_MAXIMA'] = 32  # além disso, tentativas são recusadas com 503
+app.config['SENHAS_TIMEOUT'] = 10  # segundos
+app.config['SENHAS_LIMITE_IP'] = (20, 60)  # tentativas de login/cadastro por IP por janela (segundos)
+app.config['SENHAS_LIMITE_CONTA'] = (5, 900)  # senhas erradas por conta e IP por janela (segundos)
+
+# Proxies reversos à frente do app (ex.: 1 com o nginx). Com 0, o IP do cliente é
+# o da conexão: atrás de um proxy, todos os clientes teriam o IP dele e dividiriam
+# o mesmo limite de tentativas. Só ative com o app inacessível sem o proxy, senão
+# qualquer um forja o X-Forwarded-For
+app.config['PROXY_CONFIAVEL'] = int(os.environ.get('PROXY_CONFIAVEL', 0))
+if app.config['PROXY_CONFIAVEL']:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app,
+        x_for=app.config['PROXY_CONFIAVEL'],
+        x_proto=app.config['PROXY_CONFIAVEL'],
+        x_host=app.config['PROXY_CONFIAVEL']
+    )
+
+# Arquivos do frontend (pasta static), indexados e comprimidos na inicialização
+app.config['ESTATICOS_MAX_MEMORIA'] = 1024 ** 2  # bytes; arquivos maiores são lidos do disco
 
 # Criar tabelas
 with app.app_context():
-    db.create_all()
+    aplicar_migracoes(db)
+    
+    # Construir os resumos de vendas na primeira execução com vendas existentes
+    if resumos_vazios():
+        reconstruir_resumos()
     
     # Criar diretórios necessários
-    uploads_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'uploads')
-    os.makedirs(uploads_dir, exist_ok=True)
+    os.makedirs(app.config['UPLOAD_DIR'], exist_ok=True)
+    
+    # Produtos anteriores às chaves que o armazenamento não alcança ficariam
+    # sem download e sem email: avisar já na inicialização
+    inacessiveis = caminhos_absolutos_inacessiveis(criar_armazenamento(app.config))
+    if inacessiveis:
+        app.logger.warning(
+            '%d arquivo(s) de produtos com caminho absoluto fora do armazenamento (ex.: %s); '
+            'rode flask migrar-arquivos', len(inacessiveis), inacessiveis[0]
+        )
+
+# Indexar os arquivos estáticos (reiniciar o app após um novo build do frontend)
+manifesto_estaticos = carregar_manifesto(app)
+
+# Processos de hashing de senhas: criados com fork, antes de qualquer thread
+iniciar_pool_senhas(app)
+
+# Iniciar workers de entrega de emails
+iniciar_entrega(app)
+
+@app.cli.command('reconstruir-resumos')
+def reconstruir_resumos_comando():
+    """Recalcula os resumos de vendas do dashboard a partir da tabela de vendas"""
+    reconstruir_resumos()
+    print('Resumos de vendas reconstruídos')
+
+@app.cli.command('auditar-consultas')
+def auditar_consultas_comando():
+    """Audita os planos de consulta de todas as rotas em um banco de exemplo"""
+    from src.utils.auditoria_consultas import executar
+    sys.exit(executar(dict(app.config)))
+
+@app.cli.command('estresse-sqlite')
+def estresse_sqlite_comando():
+    """Compara leituras concorrentes com compras em andamento nos perfis do SQLite"""
+    from src.utils.estresse_sqlite import executar
+    sys.exit(executar(dict(app.config)))
+
+@app.cli.command('importar-produtos')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Padrão: pela extensão do arquivo')
+@click.option('--lote', default=None, type=int, help='Linhas por INSERT e commit')
+def importar_produtos_comando(arquivo, formato, lote):
+    """Importa produtos de um arquivo CSV ou NDJSON"""
+    from src.utils.importacao_produtos import importar_produtos, formato_por_tipo, ErroImportacao
+    formato = formato or formato_por_tipo(None, arquivo)
+    if not formato:
+        raise click.UsageError('Não foi possível deduzir o formato; use --formato')
+    try:
+        with open(arquivo, 'rb') as entrada:
+            resultado = importar_produtos(entrada, formato, lote or app.config['PRODUTOS_IMPORTACAO_LOTE'])
+    except ErroImportacao as e:
+        print(f'Erro: {e}')
+        resultado = e.resultado
+        if resultado is None:
+            sys.exit(1)
+    for erro in resultado.erros:
+        print(f"Linha {erro['linha']}: {erro['erro']}")
+    if resultado.total_erros > len(resultado.erros):
+        print(f'... e mais {resultado.total_erros - len(resultado.erros)} erro(s)')
+    print(f'{resultado.importados} produto(s) importado(s) de {resultado.linhas} linha(s), {resultado.total_erros} erro(s)')
+    sys.exit(1 if resultado.total_erros else 0)
+
+@app.cli.command('gerar-miniaturas')
+@click.option('--todas', is_flag=True, help='Inclui as capas que já têm miniaturas registradas')
+def gerar_miniaturas_comando(todas):
+    """Gera as miniaturas das capas enviadas ao servidor (ex.: após importar produtos)"""
+    from src.models.store import Produto
+    from src.utils.miniaturas import disponivel, capa_armazenada, processar_capa
+    if not disponivel():
+        raise click.ClickException('Instale o Pillow para gerar miniaturas')
+    consulta = db.session.query(Produto.imagem_capa).filter(Produto.imagem_capa != '').distinct()
+    if not todas:
+        consulta = consulta.filter(Produto.miniaturas.is_(None))
+    capas = [capa for capa, in consulta if capa_armazenada(capa)]
+    erros = 0
+    for capa in capas:
+        try:
+            processar_capa(capa, app.config)
+        except Exception as e:
+            db.session.rollback()
+            erros += 1
+            print(f'{capa}: {e}')
+    print(f'{len(capas) - erros} capa(s) processada(s), {erros} erro(s)')
+    sys.exit(1 if erros else 0)
+
+@app.cli.command('migrar-arquivos')
+def migrar_arquivos_comando():
+    """Leva ao armazenamento configurado os arquivos de produtos gravados com caminho absoluto"""
+    from src.utils.armazenamento import obter_armazenamento
+    from src.utils.uploads import migrar_caminhos_absolutos
+    resultados = migrar_caminhos_absolutos(
+        obter_armazenamento(),
+        os.path.join(app.config['UPLOAD_DIR'], '.parciais')
+    )
+    for caminho, destino, sucesso in resultados:
+        print(f'{caminho} -> {destino}' if sucesso else f'{caminho}: {destino}')
+    erros = sum(1 for _, _, sucesso in resultados if not sucesso)
+    print(f'{len(resultados) - erros} arquivo(s) migrado(s), {erros} erro(s)')
+    if len(resultados) > erros:
+        print('Se alguma capa foi migrada, rode flask gerar-miniaturas para refazer as miniaturas')
+    sys.exit(1 if erros else 0)
+
+@app.cli.command('verificar-armazenamento')
+@click.option('--memoria', is_flag=True, help='Backend S3 com um cliente em memória, em vez do configurado')
+def verificar_armazenamento_comando(memoria):
+    """Grava, lê e remove um arquivo de teste no armazenamento (ex.: num MinIO local)"""
+    from src.utils.verificacao_armazenamento import executar
+    sys.exit(executar(dict(app.config), memoria))
+
+@app.cli.command('benchmark')
+@click.option('--escala', default='10k', help='1k, 10k, 100k ou 1m vendas')
+@click.option('--concorrencia', default=8, help='Requisições simultâneas por rota')
+@click.option('--requisicoes', default=200, help='Requisições por rota')
+@click.option('--modo', type=click.Choice(['cliente', 'http']), default='cliente',
+              help='Cliente de testes do Flask ou servidor HTTP local')
+@click.option('--banco', default=None, help='Banco gerado (reaproveitado se já existir)')
+@click.option('--saida', default=None, help='Arquivo JSON com o relatório')
+@click.option('--base', default=None, help='Relatório anterior para comparação')
+def benchmark_comando(escala, concorrencia, requisicoes, modo, banco, saida, base):
+    """Mede latência, vazão e consultas de todas as rotas num banco gerado"""
+    from src.utils.benchmark import executar
+    sys.exit(executar(dict(app.config), escala, concorrencia, requisicoes, modo, banco, saida, base))
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    # Caminhos fora do manifesto são rotas do SPA: entregam o index.html
+    arquivo = manifesto_estaticos.obter(path) if path != "" else None
+    if arquivo is None:
+        arquivo = manifesto_estaticos.obter('index.html')
+        if arquivo is None:
             return "index.html not found", 404
+    return servir_estatico(arquivo)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,211 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+
+BUCKETS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BUCKETS_EMAIL = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _rotulos(nomes, valores, extra=''):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Contador:
+    """Contador monotônico por combinação de rótulos (tipo counter do Prometheus)"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valores=(), quantidade=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def linhas(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        for valores, total in itens:
+            yield f'{self.nome}{_rotulos(self.rotulos, valores)} {_numero(total)}'
+
+class Histograma:
+    """Histograma com buckets fixos por combinação de rótulos (tipo histogram).
+
+    Cada observação custa uma busca binária e um incremento sob o lock; os
+    valores acumulados de cada bucket só são calculados na exposição.
+    """
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_DURACAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.buckets = tuple(buckets)
+        self._series = {}  # valores -> [contagens por bucket (+Inf no fim), soma]
+        self._lock = threading.Lock()
+
+    def observar(self, valores, valor):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def linhas(self):
+        with self._lock:
+            itens = [(valores, list(contagens), soma) for valores, (contagens, soma) in self._series.items()]
+        for valores, contagens, soma in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                rotulos = _rotulos(self.rotulos, valores, f'le="{_numero(limite)}"')
+                yield f'{self.nome}_bucket{rotulos} {acumulado}'
+            rotulos = _rotulos(self.rotulos, valores)
+            yield f'{self.nome}_sum{rotulos} {_numero(soma)}'
+            yield f'{self.nome}_count{rotulos} {acumulado}'
+
+class RegistroMetricas:
+    """Conjunto de métricas do processo, exposto no formato texto do Prometheus"""
+
+    def __init__(self):
+        self.metricas = []
+
+    def registrar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def expor(self):
+        linhas = []
+        for metrica in self.metricas:
+            linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+            linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+            linhas.extend(metrica.linhas())
+        return '\n'.join(linhas) + '\n'
+
+registro = RegistroMetricas()
+
+requisicoes = registro.registrar(Histograma(
+    'http_requisicao_duracao_segundos',
+    'Duração das requisições HTTP por endpoint, método e status (o _count é o total de requisições)',
+    ('endpoint', 'metodo', 'status')
+))
+consultas_requisicao = registro.registrar(Histograma(
+    'sql_consultas_por_requisicao',
+    'Comandos SQL executados em cada requisição, por endpoint',
+    ('endpoint',), BUCKETS_CONSULTAS
+))
+tempo_sql_requisicao = registro.registrar(Histograma(
+    'sql_duracao_por_requisicao_segundos',
+    'Tempo gasto em comandos SQL em cada requisição, por endpoint',
+    ('endpoint',)
+))
+consultas_total = registro.registrar(Contador(
+    'sql_consultas_total',
+    'Comandos SQL executados pelo processo (requisições e workers)'
+))
+tempo_sql_total = registro.registrar(Contador(
+    'sql_duracao_segundos_total',
+    'Tempo total gasto em comandos SQL pelo processo'
+))
+envios_email = registro.registrar(Contador(
+    'email_envios_total',
+    'Emails de entrega enviados, por tipo e resultado',
+    ('tipo', 'resultado')
+))
+duracao_email = registro.registrar(Histograma(
+    'email_envio_duracao_segundos',
+    'Duração da montagem e envio dos emails de entrega, por tipo',
+    ('tipo',), BUCKETS_EMAIL
+))
+
+def _endpoint():
+    # Endpoint (ex.: 'vendas.processar_compra') em vez do caminho, para não
+    # criar uma série por id ou por URL inexistente
+    return request.endpoint or 'nao_encontrado'
+
+def _antes_requisicao():
+    g.metricas_inicio = time.perf_counter()
+    g.metricas_consultas = 0
+    g.metricas_tempo_sql = 0.0
+
+def _depois_requisicao(resposta):
+    inicio = g.pop('metricas_inicio', None)
+    if inicio is None:
+        return resposta
+    endpoint = _endpoint()
+    requisicoes.observar(
+        (endpoint, request.method, str(resposta.status_code)),
+        time.perf_counter() - inicio
+    )
+    consultas_requisicao.observar((endpoint,), g.metricas_consultas)
+    tempo_sql_requisicao.observar((endpoint,), g.metricas_tempo_sql)
+    return resposta
+
+def _antes_sql(conexao, cursor, sql, parametros, contexto, executemany):
+    conexao.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+def _depois_sql(conexao, cursor, sql, parametros, contexto, executemany):
+    pilha = conexao.info.get('metricas_inicio')
+    if not pilha:
+        return
+    duracao = time.perf_counter() - pilha.pop()
+    consultas_total.inc()
+    tempo_sql_total.inc(quantidade=duracao)
+    if has_request_context() and 'metricas_inicio' in g:
+        g.metricas_consultas += 1
+        g.metricas_tempo_sql += duracao
+
+def _erro_sql(contexto):
+    # O after_cursor_execute não é chamado quando o comando falha
+    if contexto.connection is not None:
+        pilha = contexto.connection.info.get('metricas_inicio')
+        if pilha:
+            pilha.pop()
+
+def medir_envio_email(tipo):
+    """Mede a duração e conta o resultado de uma função de envio que retorna
+    (sucesso, mensagem)"""
+    def decorador(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            sucesso, mensagem = funcao(*args, **kwargs)
+            duracao_email.observar((tipo,), time.perf_counter() - inicio)
+            envios_email.inc((tipo, 'sucesso' if sucesso else 'falha'))
+            return sucesso, mensagem
+        return medida
+    return decorador
+
+def expor_metricas():
+    return Response(registro.expor(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def instalar_metricas(app, db):
+    """Registra os hooks de requisição, os eventos SQL do motor e a rota
+    /metrics (chamar após db.init_app)"""
+    app.before_request(_antes_requisicao)
+    app.after_request(_depois_requisicao)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_sql)
+        event.listen(db.engine, 'after_cursor_execute', _depois_sql)
+        event.listen(db.engine, 'handle_error', _erro_sql)
+    app.add_url_rule('/metrics', 'metricas', expor_metricas)
@@ -0,0 +1,87 @@
+from sqlalchemy import inspect, text
+
+def _valor_padrao(coluna):
+    """Converte o default escalar da coluna para SQL (None se não houver)"""
+    padrao = coluna.default
+    if padrao is None or not padrao.is_scalar:
+        return None
+    valor = padrao.arg
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    if isinstance(valor, (int, float)):
+        return str(valor)
+    return "'" + str(valor).replace("'", "''") + "'"
+
+def adicionar_colunas_novas(db):
+    """Adiciona às tabelas existentes as colunas declaradas nos modelos que ainda
+    não existem no banco (db.create_all só cria tabelas novas).
+
+    Linhas já existentes recebem o valor padrão escalar da coluna, quando houver.
+    """
+    engine = db.engine
+    inspetor = inspect(engine)
+    tabelas_existentes = set(inspetor.get_table_names())
+
+    with engine.begin() as conexao:
+        for tabela in db.metadata.sorted_tables:
+            if tabela.name not in tabelas_existentes:
+                continue
+            colunas_existentes = {c['name'] for c in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name in colunas_existentes:
+                    continue
+                tipo = coluna.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}'
+                padrao = _valor_padrao(coluna)
+                if padrao is not None:
+                    ddl += f' DEFAULT {padrao}'
+                conexao.execute(text(ddl))
+
+# Índice de busca textual dos produtos (FTS5 com conteúdo externo), mantido
+# em sincronia com a tabela produtos por triggers
+DDL_BUSCA_PRODUTOS = [
+    """CREATE VIRTUAL TABLE produtos_fts USING fts5(
+        nome, descricao,
+        content='produtos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER produtos_fts_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO produtos_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+    """CREATE TRIGGER produtos_fts_ad AFTER DELETE ON produtos BEGIN
+        INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+    END""",
+    """CREATE TRIGGER produtos_fts_au AFTER UPDATE OF nome, descricao ON produtos BEGIN
+        INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+        VALUES ('delete', old.id, old.nome, old.descricao);
+        INSERT INTO produtos_fts(rowid, nome, descricao) VALUES (new.id, new.nome, new.descricao);
+    END""",
+    "INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')"
+]
+
+def criar_indice_busca_produtos(db):
+    """Cria o índice FTS5 dos produtos (apenas SQLite) e indexa os já existentes"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    if 'produtos_fts' in inspect(engine).get_table_names():
+        return
+    with engine.begin() as conexao:
+        for ddl in DDL_BUSCA_PRODUTOS:
+            conexao.execute(text(ddl))
+
+def criar_indices_faltantes(db):
+    """Cria nas tabelas existentes os índices declarados nos modelos"""
+    engine = db.engine
+    with engine.begin() as conexao:
+        for tabela in db.metadata.sorted_tables:
+            for indice in tabela.indexes:
+                indice.create(bind=conexao, checkfirst=True)
+
+def aplicar_migracoes(db):
+    """Cria tabelas novas e atualiza as existentes sem perda de dados"""
+    db.create_all()
+    adicionar_colunas_novas(db)
+    criar_indices_faltantes(db)
+    criar_indice_busca_produtos(db)
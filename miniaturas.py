@@ -0,0 +1,291 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context, request
+from sqlalchemy import update
+from src.models.store import db, Produto
+from src.utils.armazenamento import obter_armazenamento
+from src.utils.cache_catalogo import invalidar_catalogo
+from src.utils.envio_arquivos import responder_conteudo
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # opcional: sem o Pillow, as capas ficam só no tamanho original
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+LARGURAS_PADRAO = (160, 320, 640)
+FORMATOS_PADRAO = ('webp', 'jpeg')
+
+EXTENSOES_IMAGEM = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+EXTENSOES = {'webp': 'webp', 'jpeg': 'jpg'}
+MIMETYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# As URLs das miniaturas levam a versão da capa (?v=), então podem ficar em cache
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+# Orientações EXIF em que a imagem é girada 90° (largura e altura trocam)
+ORIENTACOES_GIRADAS = (5, 6, 7, 8)
+
+# Capas já processadas pelo processo: (chave, etag) -> registro. Evita baixar
+# de novo do bucket uma capa cujas miniaturas acabaram de ser geradas
+MAXIMO_PROCESSADAS = 1024
+_processadas = OrderedDict()
+_processadas_lock = threading.Lock()
+
+def _config(chave, padrao):
+    if has_app_context():
+        return current_app.config.get(chave, padrao)
+    return padrao
+
+def disponivel():
+    return Image is not None
+
+def _formatos(formatos):
+    return [formato for formato in formatos if formato != 'webp' or features.check('webp')]
+
+def capa_armazenada(chave):
+    """Indica se a capa é uma imagem do armazenamento (URLs externas são ignoradas)"""
+    if not chave or '://' in chave or chave.rsplit('.', 1)[-1].lower() not in EXTENSOES_IMAGEM:
+        return False
+    # Caminhos absolutos fora do armazenamento local não existem para ele
+    return obter_armazenamento().existe(chave)
+
+def caminho_miniatura(original, largura, formato):
+    """Chave da miniatura, ao lado do original: <nome>-320w.webp"""
+    return f'{os.path.splitext(original)[0]}-{largura}w.{EXTENSOES[formato]}'
+
+def versao_capa(chave, info):
+    """Identifica o conteúdo da capa (muda se o arquivo for substituído)"""
+    return hashlib.blake2b(f'{chave}:{info.etag}'.encode(), digest_size=6).hexdigest()
+
+def _larguras_alvo(largura_original, larguras):
+    """Larguras menores que a original; uma imagem pequena gera uma só, no próprio tamanho"""
+    alvo = [largura for largura in sorted(set(larguras)) if largura < largura_original]
+    return alvo or [largura_original]
+
+def _rgb(imagem):
+    """Converte para RGB; transparência vira fundo branco (o JPEG não tem alfa)"""
+    if imagem.mode in ('RGBA', 'LA') or (imagem.mode == 'P' and 'transparency' in imagem.info):
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB') if imagem.mode != 'RGB' else imagem
+
+def _gravar(armazenamento, imagem, destino, formato, qualidade):
+    buffer = io.BytesIO()
+    if formato == 'webp':
+        imagem.save(buffer, 'WEBP', quality=qualidade, method=4)
+    else:
+        imagem.save(buffer, 'JPEG', quality=qualidade, optimize=True, progressive=True)
+    buffer.seek(0)
+    armazenamento.gravar_stream(destino, buffer, MIMETYPES[formato])
+
+def _atualizada(armazenamento, chave, info_original):
+    info = armazenamento.metadados(chave)
+    return info is not None and info.modificado_em >= info_original.modificado_em
+
+def gerar_miniaturas(armazenamento, original, larguras=LARGURAS_PADRAO, formatos=FORMATOS_PADRAO, qualidade=80):
+    """Gera as variantes redimensionadas da imagem e retorna o registro gravado
+    no produto: {'versao', 'larguras', 'formatos'}.
+
+    Variantes já existentes e mais novas que o original são mantidas, então
+    chamar de novo para a mesma imagem só lê o cabeçalho dela (ou nada, se o
+    processo acabou de processá-la).
+    """
+    info = armazenamento.metadados(original)
+    if info is None:
+        raise FileNotFoundError(original)
+    with _processadas_lock:
+        registro = _processadas.get((original, info.etag))
+    if registro is not None:
+        return registro
+
+    formatos = _formatos(formatos)
+    with armazenamento.abrir(original) as entrada:
+        # O Pillow precisa de seek; o corpo de um objeto remoto vai para a memória
+        registro = _gerar(armazenamento, original, entrada if entrada.seekable() else io.BytesIO(entrada.read()),
+                          info, larguras, formatos, qualidade)
+    with _processadas_lock:
+        _processadas[(original, info.etag)] = registro
+        while len(_processadas) > MAXIMO_PROCESSADAS:
+            _processadas.popitem(last=False)
+    return registro
+
+def _gerar(armazenamento, original, entrada, info, larguras, formatos, qualidade):
+    with Image.open(entrada) as imagem:
+        largura, altura = imagem.size
+        if imagem.getexif().get(0x0112) in ORIENTACOES_GIRADAS:
+            largura, altura = altura, largura
+        alvo = _larguras_alvo(largura, larguras)
+
+        faltantes = [
+            (largura_alvo, formato)
+            for largura_alvo in alvo
+            for formato in formatos
+            if not _atualizada(armazenamento, caminho_miniatura(original, largura_alvo, formato), info)
+        ]
+        if faltantes:
+            # No JPEG, decodifica já reduzido (fator 1/2 a 1/8) quando a maior
+            # miniatura cabe; o draft nunca reduz abaixo do tamanho pedido
+            imagem.draft('RGB', (max(alvo), max(alvo)))
+            fonte = _rgb(ImageOps.exif_transpose(imagem))
+            for largura_alvo in alvo:
+                formatos_faltantes = [formato for largura_faltante, formato in faltantes if largura_faltante == largura_alvo]
+                if not formatos_faltantes:
+                    continue
+                altura_alvo = max(1, round(fonte.height * largura_alvo / fonte.width))
+                reduzida = fonte.resize((largura_alvo, altura_alvo), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                for formato in formatos_faltantes:
+                    _gravar(armazenamento, reduzida, caminho_miniatura(original, largura_alvo, formato), formato, qualidade)
+
+    return {'versao': versao_capa(original, info), 'larguras': alvo, 'formatos': formatos}
+
+def registrar_miniaturas(caminho, miniaturas):
+    """Grava as miniaturas em todos os produtos com esta capa"""
+    resultado = db.session.execute(
+        update(Produto).where(Produto.imagem_capa == caminho).values(miniaturas=miniaturas)
+    )
+    db.session.commit()
+    if resultado.rowcount:
+        invalidar_catalogo()
+    return resultado.rowcount
+
+def processar_capa(caminho, config):
+    """Gera as miniaturas da capa e as registra nos produtos (requer app context)"""
+    miniaturas = gerar_miniaturas(
+        obter_armazenamento(),
+        caminho,
+        config.get('MINIATURAS_LARGURAS', LARGURAS_PADRAO),
+        config.get('MINIATURAS_FORMATOS', FORMATOS_PADRAO),
+        config.get('MINIATURAS_QUALIDADE', 80)
+    )
+    return registrar_miniaturas(caminho, miniaturas)
+
+class PoolMiniaturas:
+    """Threads que geram as miniaturas fora das requisições.
+
+    O Pillow libera o GIL ao decodificar, redimensionar e codificar, então as
+    threads aproveitam mais de um núcleo. Cada capa é processada por uma
+    tarefa de cada vez: um pedido para uma capa já em andamento só repete o
+    registro nos produtos ao final (os arquivos já existirão). Além de
+    `fila_maxima` capas pendentes, novos pedidos são descartados com um aviso
+    no log; o comando `flask gerar-miniaturas` completa as que faltarem.
+    """
+
+    def __init__(self, workers=2, fila_maxima=256):
+        self.workers = workers
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+        self._executor = None
+        self._andamento = set()
+        self._repetir = set()
+        self._lock = threading.Lock()
+
+    def agendar(self, app, caminho):
+        with self._lock:
+            if caminho in self._andamento:
+                self._repetir.add(caminho)
+                return True
+            if not self._vagas.acquire(blocking=False):
+                logger.warning('Fila de miniaturas cheia, capa ignorada: %s', caminho)
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='miniaturas')
+            executor = self._executor
+            self._andamento.add(caminho)
+        executor.submit(self._executar, app, caminho)
+        return True
+
+    def _executar(self, app, caminho):
+        try:
+            while True:
+                with app.app_context():
+                    try:
+                        processar_capa(caminho, app.config)
+                    except Exception:
+                        logger.exception('Erro ao gerar as miniaturas de %s', caminho)
+                        db.session.rollback()
+                with self._lock:
+                    if caminho not in self._repetir:
+                        self._andamento.discard(caminho)
+                        return
+                    self._repetir.discard(caminho)
+        finally:
+            self._vagas.release()
+
+    def fechar(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def obter_pool_miniaturas():
+    """Retorna o pool de miniaturas compartilhado pelo processo"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolMiniaturas(
+                _config('MINIATURAS_WORKERS', 2),
+                _config('MINIATURAS_FILA_MAXIMA', 256)
+            )
+        return _pool
+
+def agendar_miniaturas(caminho):
+    """Agenda a geração das miniaturas de uma capa enviada ao servidor.
+
+    Retorna sem esperar o redimensionamento. Capas que não são imagens do
+    armazenamento e instalações sem o Pillow são ignoradas (retorna False).
+    """
+    if not disponivel() or not capa_armazenada(caminho):
+        return False
+    return obter_pool_miniaturas().agendar(current_app._get_current_object(), caminho)
+
+def _escolher_largura(larguras, pedida):
+    """A menor largura gerada que cobre a pedida (ou a maior de todas)"""
+    for largura in larguras:
+        if largura >= pedida:
+            return largura
+    return larguras[-1]
+
+def servir_miniatura(original, miniaturas, largura):
+    """Resposta com a variante mais adequada: largura pela URL e formato pelo
+    Accept (WebP quando o navegador aceita). Retorna None se o arquivo não existir.
+
+    Com ?v= igual à versão atual da capa, a resposta é cacheável por um ano.
+    """
+    formatos = miniaturas['formatos']
+    # Só quando o navegador cita image/webp: image/* e */* vêm também de quem não o decodifica
+    aceita_webp = any(tipo == 'image/webp' and qualidade > 0 for tipo, qualidade in request.accept_mimetypes)
+    if 'webp' in formatos and aceita_webp:
+        formato = 'webp'
+    else:
+        formato = next((formato for formato in formatos if formato != 'webp'), formatos[0])
+    largura = _escolher_largura(miniaturas['larguras'], largura)
+    chave = caminho_miniatura(original, largura, formato)
+    armazenamento = obter_armazenamento()
+    info = armazenamento.metadados(chave)
+    if info is None:
+        return None
+
+    # Mesmo no S3 a miniatura passa pelo app: é pequena e a resposta imutável
+    # pode ficar num CDN, o que uma URL assinada com validade não permite
+    resposta = responder_conteudo(
+        armazenamento, chave, info, MIMETYPES[formato],
+        etag=f"{miniaturas['versao']}-{largura}-{formato}"
+    )
+    if request.args.get('v') == miniaturas['versao']:
+        resposta.headers['Cache-Control'] = CACHE_IMUTAVEL
+    else:
+        resposta.headers['Cache-Control'] = CACHE_REVALIDAR
+    resposta.vary.add('Accept')
+    return resposta
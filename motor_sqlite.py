@@ -0,0 +1,81 @@
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Perfis do motor SQLite: pragmas aplicados a cada conexão nova e opções do pool
+PERFIS_SQLITE = {
+    # Comportamento original do SQLite (journal de rollback)
+    'padrao': {
+        'pragmas': {},
+        'pool': {}
+    },
+    # Vários workers/threads: com WAL os leitores não esperam os escritores e
+    # os escritores aguardam a vez (busy_timeout) em vez de falhar com
+    # "database is locked"
+    'concorrente': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',  # seguro com WAL; o fsync fica no checkpoint
+            'busy_timeout': 5000,  # ms
+            'cache_size': -64 * 1024,  # negativo = KiB (64 MiB)
+            'mmap_size': 256 * 1024 ** 2,  # bytes
+            'temp_store': 'MEMORY'
+        },
+        'pool': {
+            'poolclass': QueuePool,
+            'pool_size': 8,
+            'max_overflow': 8,
+            'pool_timeout': 30
+        }
+    }
+}
+
+def _banco_em_memoria(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+def perfil_sqlite(config):
+    """Pragmas e opções de pool do perfil configurado em SQLITE_PERFIL.
+
+    SQLITE_PRAGMAS e SQLITE_POOL (dicts) sobrescrevem itens do perfil.
+    """
+    nome = config.get('SQLITE_PERFIL') or 'padrao'
+    if nome not in PERFIS_SQLITE:
+        raise ValueError(f'Perfil SQLite desconhecido: {nome}')
+    perfil = PERFIS_SQLITE[nome]
+    pragmas = {**perfil['pragmas'], **(config.get('SQLITE_PRAGMAS') or {})}
+    pool = {**perfil['pool'], **(config.get('SQLITE_POOL') or {})}
+    return pragmas, pool
+
+def opcoes_motor(config):
+    """SQLALCHEMY_ENGINE_OPTIONS para o perfil (definir antes de db.init_app)"""
+    uri = config.get('SQLALCHEMY_DATABASE_URI', '')
+    if not uri.startswith('sqlite') or _banco_em_memoria(uri):
+        return {}
+    pragmas, pool = perfil_sqlite(config)
+    if not pool:
+        return {}
+    opcoes = dict(pool)
+    # Conexões do pool circulam entre threads (requisições e workers de email)
+    opcoes['connect_args'] = {'check_same_thread': False}
+    if 'busy_timeout' in pragmas:
+        opcoes['connect_args']['timeout'] = pragmas['busy_timeout'] / 1000
+    return opcoes
+
+def registrar_pragmas(motor, pragmas):
+    """Executa os pragmas em cada conexão DBAPI aberta pelo motor"""
+    if motor.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(motor, 'connect')
+    def aplicar_pragmas(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        try:
+            for nome, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nome}={valor}')
+        finally:
+            cursor.close()
+
+def configurar_sqlite(app, db):
+    """Aplica os pragmas do perfil ao motor do app (chamar após db.init_app)"""
+    pragmas, _ = perfil_sqlite(app.config)
+    with app.app_context():
+        registrar_pragmas(db.engine, pragmas)
@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, current_app
+from sqlalchemy import literal, tuple_, DateTime
+from src.utils.diagnostico import etapa
+
+class ErroPaginacao(ValueError):
+    """Parâmetros de paginação inválidos"""
+
+def codificar_cursor(valores):
+    """Gera o cursor opaco a partir dos valores de ordenação do último item"""
+    bruto = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in valores])
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_valores(cursor, quantidade):
+    """Lê os valores brutos (JSON) de um cursor com `quantidade` campos"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except ValueError:
+        raise ErroPaginacao('Cursor inválido')
+    if not isinstance(valores, list) or len(valores) != quantidade:
+        raise ErroPaginacao('Cursor inválido')
+    return valores
+
+def decodificar_cursor(cursor, colunas):
+    valores = decodificar_valores(cursor, len(colunas))
+    try:
+        return [
+            datetime.fromisoformat(valor) if isinstance(coluna.type, DateTime) else valor
+            for coluna, valor in zip(colunas, valores)
+        ]
+    except (TypeError, ValueError):
+        raise ErroPaginacao('Cursor inválido')
+
+def _apos_cursor(colunas, valores, descendente):
+    """Condição "vem depois do cursor" para a ordenação (c1, c2, ...).
+
+    Usa a comparação de tuplas (c1, c2) < (v1, v2): o SQLite a transforma
+    numa busca pelo índice da ordenação, enquanto a forma equivalente com OR
+    (c1 < v1 OR (c1 = v1 AND c2 < v2)) percorre o índice desde o início.
+    """
+    chave = tuple_(*colunas)
+    valores = tuple_(*[literal(valor, coluna.type) for coluna, valor in zip(colunas, valores)])
+    return chave < valores if descendente else chave > valores
+
+def parametros_paginacao():
+    """Lê limit, cursor e total da query string"""
+    padrao = current_app.config.get('PAGINACAO_LIMITE_PADRAO', 50)
+    maximo = current_app.config.get('PAGINACAO_LIMITE_MAXIMO', 200)
+    try:
+        limite = int(request.args.get('limit', padrao))
+    except ValueError:
+        raise ErroPaginacao('Parâmetro limit inválido')
+    if limite < 1:
+        raise ErroPaginacao('Parâmetro limit inválido')
+    return {
+        'limite': min(limite, maximo),
+        'cursor': request.args.get('cursor') or None,
+        'total': request.args.get('total', '').lower() in ('1', 'true', 'sim')
+    }
+
+def paginar(query, colunas, serializar, descendente=False, limite=50, cursor=None, total=False):
+    """Pagina a consulta por chave (keyset) sobre as colunas de ordenação.
+
+    A última coluna deve ser única (normalmente o id), para que a ordem seja
+    total. Cada página custa o mesmo, seja qual for a profundidade. Retorna
+    {'itens', 'next', 'total'?}; `serializar` recebe a lista de resultados e
+    retorna a lista de dicts.
+    """
+    resultado = {}
+    if total:
+        resultado['total'] = query.order_by(None).count()
+
+    if cursor:
+        query = query.filter(_apos_cursor(colunas, decodificar_cursor(cursor, colunas), descendente))
+
+    ordem = [coluna.desc() if descendente else coluna.asc() for coluna in colunas]
+    linhas = query.order_by(*ordem).limit(limite + 1).all()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultimo = linhas[-1]
+        proximo = codificar_cursor([getattr(ultimo, coluna.key) for coluna in colunas])
+
+    with etapa('serialize'):
+        resultado['itens'] = serializar(linhas)
+    resultado['next'] = proximo
+    return resultado
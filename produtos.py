@@ -1,12 +1,21 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, current_app, session
 from src.models.store import db, Produto
+from src.routes.admin import admin_required
+from src.utils.links_download import verificar_assinatura
+from src.utils.envio_arquivos import enviar_arquivo
+from src.utils.cache_catalogo import obter_cache_catalogo, produto_ativo, invalidar_catalogo, responder
+from src.utils.busca import buscar_produtos
+from src.utils.paginacao import paginar, parametros_paginacao, ErroPaginacao
+from src.utils.uploads import armazenar_stream, extensao, obter_uploads, ErroUpload
+from src.utils.armazenamento import obter_armazenamento, nome_para_cliente
+from src.utils.importacao_produtos import importar_produtos, formato_por_tipo, ErroImportacao
+from src.utils.miniaturas import agendar_miniaturas, servir_miniatura
 import os
 from werkzeug.utils import secure_filename
 
 produtos_bp = Blueprint('produtos', __name__)
 
 # Configuração para upload de arquivos
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
@@ -14,10 +23,38 @@ def allowed_file(filename):
 
 @produtos_bp.route('/produtos', methods=['GET'])
 def listar_produtos():
-    """Lista todos os produtos ativos"""
+    """Lista os produtos ativos (paginado por cursor)"""
     try:
-        produtos = Produto.query.filter_by(ativo=True).all()
-        return jsonify([produto.to_dict() for produto in produtos]), 200
+        parametros = parametros_paginacao()
+        chave = ('lista', parametros['limite'], parametros['cursor'], parametros['total'])
+        pagina = obter_cache_catalogo().obter(chave, lambda: paginar(
+            Produto.query.filter_by(ativo=True),
+            [Produto.id],
+            lambda produtos: [produto.to_dict() for produto in produtos],
+            **parametros
+        ))
+        return responder(pagina)
+    except ErroPaginacao as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@produtos_bp.route('/produtos/busca', methods=['GET'])
+def buscar():
+    """Busca textual de produtos por nome e descrição (ordenada por relevância)"""
+    try:
+        termos = request.args.get('q', '').strip()
+        if not termos:
+            return jsonify({'erro': 'Parâmetro q é obrigatório'}), 400
+        
+        ativo = request.args.get('ativo', 'true').lower() not in ('0', 'false', 'nao')
+        # Produtos desativados só aparecem para o administrador
+        if not ativo and 'admin_id' not in session:
+            return jsonify({'erro': 'Acesso administrativo necessário'}), 401
+        pagina = buscar_produtos(termos, ativo=ativo, **parametros_paginacao())
+        return jsonify(pagina), 200
+    except ErroPaginacao as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -25,10 +62,10 @@ def listar_produtos():
 def obter_produto(produto_id):
     """Obtém um produto específico"""
     try:
-        produto = Produto.query.get_or_404(produto_id)
-        if not produto.ativo:
+        produto = produto_ativo(produto_id)
+        if not produto:
             return jsonify({'erro': 'Produto não encontrado'}), 404
-        return jsonify(produto.to_dict()), 200
+        return responder(produto)
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -52,12 +89,52 @@ def criar_produto():
         
         db.session.add(produto)
         db.session.commit()
+        invalidar_catalogo()
+        agendar_miniaturas(produto.imagem_capa)
         
         return jsonify(produto.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
+@produtos_bp.route('/produtos/importar', methods=['POST'])
+@admin_required
+def importar():
+    """Importa produtos em massa de um CSV ou NDJSON.
+
+    O arquivo vem no corpo da requisição (Content-Type text/csv ou
+    application/x-ndjson) ou no campo 'arquivo' de um formulário, e é lido
+    como stream. O formato também pode ser indicado em ?formato=csv|ndjson e
+    o tamanho dos lotes em ?lote=.
+    """
+    try:
+        arquivo = request.files.get('arquivo')
+        if arquivo:
+            stream = arquivo.stream
+            formato = formato_por_tipo(arquivo.mimetype, arquivo.filename)
+        else:
+            stream = request.stream
+            formato = formato_por_tipo(request.mimetype)
+        formato = request.args.get('formato') or formato
+        if not formato:
+            return jsonify({'erro': 'Informe o formato (csv ou ndjson)'}), 400
+        
+        maximo = current_app.config.get('PRODUTOS_IMPORTACAO_LOTE_MAXIMO', 5000)
+        lote = request.args.get('lote', current_app.config.get('PRODUTOS_IMPORTACAO_LOTE', 500), type=int)
+        if not lote or lote < 1 or lote > maximo:
+            return jsonify({'erro': f'O lote deve ficar entre 1 e {maximo}'}), 400
+        
+        resultado = importar_produtos(stream, formato, lote)
+        return jsonify(resultado.to_dict()), 200
+    except ErroImportacao as e:
+        corpo = {'erro': str(e)}
+        if e.resultado is not None:
+            corpo.update(e.resultado.to_dict())
+        return jsonify(corpo), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
 @produtos_bp.route('/produtos/<int:produto_id>', methods=['PUT'])
 def atualizar_produto(produto_id):
     """Atualiza um produto existente"""
@@ -77,12 +154,17 @@ def atualizar_produto(produto_id):
             produto.preco = float(data['preco'])
         if 'caminho_pdf' in data:
             produto.caminho_pdf = data['caminho_pdf']
-        if 'imagem_capa' in data:
+        nova_capa = 'imagem_capa' in data and data['imagem_capa'] != produto.imagem_capa
+        if nova_capa:
             produto.imagem_capa = data['imagem_capa']
+            produto.miniaturas = None
         if 'ativo' in data:
             produto.ativo = data['ativo']
         
         db.session.commit()
+        invalidar_catalogo()
+        if nova_capa:
+            agendar_miniaturas(produto.imagem_capa)
         
         return jsonify(produto.to_dict()), 200
     except Exception as e:
@@ -96,29 +178,73 @@ def deletar_produto(produto_id):
         produto = Produto.query.get_or_404(produto_id)
         produto.ativo = False
         db.session.commit()
+        invalidar_catalogo()
         
         return jsonify({'mensagem': 'Produto desativado com sucesso'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
+@produtos_bp.route('/produtos/<int:produto_id>/capa/<int:largura>', methods=['GET'])
+def capa_produto(produto_id, largura):
+    """Miniatura da capa na menor largura gerada que cubra a pedida, em WebP
+    quando o navegador aceita (cacheável por um ano com ?v=<versão>)"""
+    try:
+        produto = produto_ativo(produto_id)
+        miniaturas = produto.dados['miniaturas'] if produto else None
+        resposta = servir_miniatura(produto.dados['imagem_capa'], miniaturas, largura) if miniaturas else None
+        if resposta is None:
+            return jsonify({'erro': 'Miniatura não encontrada'}), 404
+        
+        return resposta
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
 @produtos_bp.route('/produtos/<int:produto_id>/download', methods=['GET'])
 def download_produto(produto_id):
     """Download do PDF do produto (apenas para vendas confirmadas)"""
     try:
         produto = Produto.query.get_or_404(produto_id)
         
-        # Verificar se o arquivo existe
-        if not produto.caminho_pdf or not os.path.exists(produto.caminho_pdf):
+        # Envia com suporte a Range e ETag (ou delega ao servidor web)
+        caminho = produto.caminho_pdf
+        resposta = enviar_arquivo(caminho, nome=nome_para_cliente(produto.nome, caminho)) if caminho else None
+        if resposta is None:
+            return jsonify({'erro': 'Arquivo não encontrado'}), 404
+        
+        return resposta
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@produtos_bp.route('/produtos/<int:produto_id>/download-assinado', methods=['GET'])
+def download_assinado(produto_id):
+    """Download do PDF por link assinado e com validade (enviado por email)"""
+    try:
+        # A assinatura é conferida antes de qualquer consulta ao banco
+        valido, motivo = verificar_assinatura(
+            produto_id,
+            request.args.get('venda'),
+            request.args.get('expira'),
+            request.args.get('assinatura')
+        )
+        if not valido:
+            return jsonify({'erro': motivo}), 403
+        
+        produto = Produto.query.get_or_404(produto_id)
+        
+        caminho = produto.caminho_pdf
+        resposta = enviar_arquivo(caminho, nome=nome_para_cliente(produto.nome, caminho)) if caminho else None
+        if resposta is None:
             return jsonify({'erro': 'Arquivo não encontrado'}), 404
         
-        return send_file(produto.caminho_pdf, as_attachment=True)
+        return resposta
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @produtos_bp.route('/produtos/upload', methods=['POST'])
+@admin_required
 def upload_arquivo():
-    """Upload de arquivos PDF e imagens"""
+    """Upload de arquivos PDF e imagens (em uma única requisição)"""
     try:
         if 'arquivo' not in request.files:
             return jsonify({'erro': 'Nenhum arquivo fornecido'}), 400
@@ -131,21 +257,110 @@ def upload_arquivo():
         if arquivo and allowed_file(arquivo.filename):
             filename = secure_filename(arquivo.filename)
             
-            # Criar diretório de upload se não existir
-            upload_path = os.path.join(os.path.dirname(__file__), '..', '..', UPLOAD_FOLDER)
-            os.makedirs(upload_path, exist_ok=True)
-            
-            filepath = os.path.join(upload_path, filename)
-            arquivo.save(filepath)
+            # Arquivos são armazenados pelo SHA-256 do conteúdo, então nomes
+            # iguais não se sobrescrevem e arquivos idênticos são gravados uma vez
+            filepath, digest, tamanho = armazenar_stream(
+                obter_armazenamento(),
+                os.path.join(current_app.config['UPLOAD_DIR'], '.parciais'),
+                arquivo.stream,
+                extensao(filename),
+                current_app.config.get('UPLOAD_TAMANHO_MAXIMO', 1024 ** 3)
+            )
+            # Miniaturas das imagens são geradas em segundo plano
+            agendar_miniaturas(filepath)
             
             return jsonify({
                 'mensagem': 'Arquivo enviado com sucesso',
                 'caminho': filepath,
-                'nome_arquivo': filename
+                'nome_arquivo': filename,
+                'sha256': digest,
+                'tamanho': tamanho
             }), 200
         else:
             return jsonify({'erro': 'Tipo de arquivo não permitido'}), 400
             
+    except ErroUpload as e:
+        return _erro_upload(e)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+def _erro_upload(e):
+    return jsonify({'erro': str(e), **e.detalhes}), e.status
+
+def _posicao_inicial():
+    """Obtém a posição da parte pelos cabeçalhos Upload-Offset ou Content-Range"""
+    if 'Upload-Offset' in request.headers:
+        return int(request.headers['Upload-Offset'])
+    intervalo = request.headers.get('Content-Range', '')
+    if intervalo.startswith('bytes ') and '-' in intervalo:
+        return int(intervalo[6:].split('-', 1)[0])
+    return 0
+
+@produtos_bp.route('/produtos/uploads', methods=['POST'])
+@admin_required
+def iniciar_upload():
+    """Inicia um upload em partes (retomável)"""
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('nome_arquivo') or data.get('tamanho') is None:
+            return jsonify({'erro': 'Nome do arquivo e tamanho são obrigatórios'}), 400
+        
+        if not allowed_file(data['nome_arquivo']):
+            return jsonify({'erro': 'Tipo de arquivo não permitido'}), 400
+        
+        tamanho = int(data['tamanho'])
+        if tamanho < 0 or tamanho > current_app.config.get('UPLOAD_TAMANHO_MAXIMO', 1024 ** 3):
+            return jsonify({'erro': 'Tamanho de arquivo não permitido'}), 413
+        
+        estado = obter_uploads().iniciar(secure_filename(data['nome_arquivo']), tamanho)
+        return jsonify(estado), 201
+    except ErroUpload as e:
+        return _erro_upload(e)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@produtos_bp.route('/produtos/uploads/<id_upload>', methods=['GET'])
+@admin_required
+def estado_upload(id_upload):
+    """Informa quantos bytes já foram recebidos, para retomar o upload"""
+    try:
+        return jsonify(obter_uploads().estado(id_upload)), 200
+    except ErroUpload as e:
+        return _erro_upload(e)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@produtos_bp.route('/produtos/uploads/<id_upload>', methods=['PUT', 'PATCH'])
+@admin_required
+def enviar_parte_upload(id_upload):
+    """Recebe uma parte do arquivo no corpo da requisição.
+
+    A parte começa na posição indicada por Upload-Offset (ou Content-Range) e é
+    gravada direto no disco. Ao receber o último byte, a resposta inclui o
+    caminho definitivo do arquivo.
+    """
+    try:
+        estado = obter_uploads().receber(id_upload, _posicao_inicial(), request.stream)
+        estado['completo'] = 'caminho' in estado
+        if estado['completo']:
+            agendar_miniaturas(estado['caminho'])
+        return jsonify(estado), 200
+    except ErroUpload as e:
+        return _erro_upload(e)
+    except ValueError:
+        return jsonify({'erro': 'Posição da parte inválida'}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+@produtos_bp.route('/produtos/uploads/<id_upload>', methods=['DELETE'])
+@admin_required
+def cancelar_upload(id_upload):
+    """Cancela um upload em partes e descarta os bytes recebidos"""
+    try:
+        obter_uploads().cancelar(id_upload)
+        return jsonify({'mensagem': 'Upload cancelado'}), 200
+    except ErroUpload as e:
+        return _erro_upload(e)
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
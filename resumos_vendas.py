@@ -0,0 +1,172 @@
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.store import (
+    db, Venda, Produto, ResumoVendasDia, ResumoVendasProduto, ResumoVendasStatus
+)
+
+def _upsert_soma(modelo, coluna):
+    """INSERT que, se a linha de resumo já existir, soma os contadores a ela,
+    no dialeto do banco configurado"""
+    dialeto = db.engine.dialect.name
+    if dialeto in ('sqlite', 'postgresql'):
+        stmt = (sqlite_insert if dialeto == 'sqlite' else postgresql_insert)(modelo)
+        return stmt.on_conflict_do_update(
+            index_elements=[coluna],
+            set_={
+                'total_vendas': modelo.total_vendas + stmt.excluded.total_vendas,
+                'receita': modelo.receita + stmt.excluded.receita
+            }
+        )
+    if dialeto in ('mysql', 'mariadb'):
+        stmt = mysql_insert(modelo)
+        return stmt.on_duplicate_key_update(
+            total_vendas=modelo.total_vendas + stmt.inserted.total_vendas,
+            receita=modelo.receita + stmt.inserted.receita
+        )
+    raise RuntimeError(f'Resumos de vendas não suportam o banco {dialeto}')
+
+def _incrementar_varios(modelo, coluna, linhas):
+    """Soma aos contadores das linhas de resumo, criando as que não existirem.
+
+    `linhas` são dicts com a chave (`coluna`), total_vendas e receita; todas
+    vão no mesmo executemany.
+    """
+    db.session.execute(_upsert_soma(modelo, coluna), linhas)
+
+def _incrementar(modelo, chave, total_vendas, receita):
+    """Soma aos contadores da linha de resumo, criando-a se não existir"""
+    (coluna, valor), = chave.items()
+    _incrementar_varios(modelo, coluna, [{coluna: valor, 'total_vendas': total_vendas, 'receita': receita}])
+
+def registrar_vendas(vendas):
+    """Atualiza os resumos para vendas novas (o commit fica a cargo de quem
+    chama, na mesma transação das vendas).
+
+    As vendas são somadas por chave antes, então um pedido com vários itens
+    faz um único executemany por tabela de resumo.
+    """
+    somas = {}
+    for venda in vendas:
+        if venda.data_venda is None:
+            venda.data_venda = datetime.utcnow()
+        if venda.status is None:
+            venda.status = 'pendente'
+        for modelo, chave in (
+            (ResumoVendasDia, ('dia', venda.data_venda.date())),
+            (ResumoVendasProduto, ('id_produto', venda.id_produto)),
+            (ResumoVendasStatus, ('status', venda.status))
+        ):
+            total, receita = somas.get((modelo, chave), (0, 0))
+            somas[(modelo, chave)] = (total + 1, receita + venda.preco_total)
+
+    linhas = {}
+    for (modelo, (coluna, valor)), (total, receita) in somas.items():
+        linhas.setdefault((modelo, coluna), []).append(
+            {coluna: valor, 'total_vendas': total, 'receita': receita}
+        )
+    for (modelo, coluna), itens in linhas.items():
+        _incrementar_varios(modelo, coluna, itens)
+
+def registrar_venda(venda):
+    """Atualiza os resumos para uma venda nova (mesma transação da venda)"""
+    registrar_vendas([venda])
+
+def registrar_mudanca_status(venda, novo_status):
+    """Muda o status da venda e a move entre os resumos por status (o commit
+    fica a cargo de quem chama).
+
+    A troca é um UPDATE condicionado ao status lido e os contadores mudam com
+    SET n = n ± 1 no próprio banco, sem ler os valores antes: duas mudanças
+    concorrentes da mesma venda não descontam o status anterior duas vezes.
+    Retorna False (sem alterar nada) se outra transação mudou o status antes.
+    """
+    status_anterior = venda.status
+    if status_anterior == novo_status:
+        return True
+    alteradas = db.session.execute(
+        update(Venda)
+        .where(Venda.id == venda.id, Venda.status == status_anterior)
+        .values(status=novo_status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not alteradas:
+        return False
+    set_committed_value(venda, 'status', novo_status)
+
+    db.session.execute(
+        update(ResumoVendasStatus)
+        .where(ResumoVendasStatus.status == status_anterior)
+        .values(
+            total_vendas=ResumoVendasStatus.total_vendas - 1,
+            receita=ResumoVendasStatus.receita - venda.preco_total
+        )
+    )
+    _incrementar(ResumoVendasStatus, {'status': novo_status}, 1, venda.preco_total)
+    return True
+
+def reconstruir_resumos():
+    """Recalcula todos os resumos a partir da tabela de vendas"""
+    ResumoVendasDia.query.delete()
+    ResumoVendasProduto.query.delete()
+    ResumoVendasStatus.query.delete()
+
+    contagem = func.count(Venda.id)
+    receita = func.coalesce(func.sum(Venda.preco_total), 0)
+    dia = func.date(Venda.data_venda)
+
+    db.session.execute(insert(ResumoVendasDia).from_select(
+        ['dia', 'total_vendas', 'receita'],
+        select(dia, contagem, receita).where(Venda.data_venda.isnot(None)).group_by(dia)
+    ))
+    db.session.execute(insert(ResumoVendasProduto).from_select(
+        ['id_produto', 'total_vendas', 'receita'],
+        select(Venda.id_produto, contagem, receita).group_by(Venda.id_produto)
+    ))
+    db.session.execute(insert(ResumoVendasStatus).from_select(
+        ['status', 'total_vendas', 'receita'],
+        select(Venda.status, contagem, receita).group_by(Venda.status)
+    ))
+    db.session.commit()
+
+def resumos_vazios():
+    """Indica se os resumos precisam ser construídos (há vendas mas nenhum resumo)"""
+    return (
+        db.session.query(ResumoVendasStatus.status).first() is None
+        and db.session.query(Venda.id).first() is not None
+    )
+
+def totais_vendas():
+    """Total de vendas e receita de todo o histórico"""
+    total, receita = db.session.query(
+        func.coalesce(func.sum(ResumoVendasStatus.total_vendas), 0),
+        func.coalesce(func.sum(ResumoVendasStatus.receita), 0)
+    ).one()
+    return int(total), float(receita)
+
+def vendas_por_status():
+    return dict(
+        db.session.query(ResumoVendasStatus.status, ResumoVendasStatus.total_vendas)
+        .filter(ResumoVendasStatus.total_vendas > 0)
+        .all()
+    )
+
+def vendas_desde(dia):
+    """Quantidade de vendas a partir do dia informado (inclusive)"""
+    total = db.session.query(func.coalesce(func.sum(ResumoVendasDia.total_vendas), 0)).filter(
+        ResumoVendasDia.dia >= dia
+    ).scalar()
+    return int(total)
+
+def produtos_mais_vendidos(limite=5):
+    return [
+        {'nome': nome, 'total_vendas': total}
+        for nome, total in db.session.query(Produto.nome, ResumoVendasProduto.total_vendas)
+        .join(Produto, Produto.id == ResumoVendasProduto.id_produto)
+        .order_by(ResumoVendasProduto.total_vendas.desc())
+        .limit(limite)
+        .all()
+    ]
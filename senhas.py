@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context, jsonify, request
+from werkzeug.security import generate_password_hash, check_password_hash
+
+METODO_PADRAO = 'pbkdf2:sha256:600000'
+
+class ErroSenhas(Exception):
+    """Tentativa recusada sem calcular o hash (a mensagem é devolvida ao cliente)"""
+
+    def __init__(self, mensagem, status=503, espera=1):
+        super().__init__(mensagem)
+        self.status = status
+        self.espera = espera
+
+def responder_erro(erro):
+    """Resposta JSON do erro, com Retry-After"""
+    resposta = jsonify({'erro': str(erro)})
+    resposta.status_code = erro.status
+    resposta.headers['Retry-After'] = str(erro.espera)
+    return resposta
+
+def _config(chave, padrao):
+    if has_app_context():
+        return current_app.config.get(chave, padrao)
+    return padrao
+
+class PoolSenhas:
+    """Processos dedicados a gerar e verificar hashes de senha.
+
+    O PBKDF2/scrypt ocupa a CPU por centenas de milissegundos; fora das
+    threads de requisição, uma rajada de logins não trava o catálogo. No
+    máximo `fila_maxima` operações ficam em andamento ou aguardando um
+    processo; além disso a chamada é recusada na hora com ErroSenhas (503).
+    """
+
+    def __init__(self, processos=2, fila_maxima=32, timeout=10):
+        self.processos = processos
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _obter_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # fork: com spawn/forkserver os filhos reimportariam o módulo
+                # principal, subindo o app (e os workers de email) de novo.
+                # Com fork, todos os processos nascem no primeiro submit; por
+                # isso iniciar() roda antes de o app criar qualquer thread (só
+                # a recriação após um BrokenProcessPool faz fork mais tarde).
+                self._executor = ProcessPoolExecutor(
+                    self.processos,
+                    mp_context=multiprocessing.get_context('fork')
+                )
+            return self._executor
+
+    def iniciar(self):
+        """Cria os processos agora, com o processo ainda sem outras threads.
+
+        Um fork feito enquanto outra thread segura um lock (do logging, do
+        OpenSSL em um envio de email...) deixa esse lock travado no filho, que
+        pode nunca mais responder.
+        """
+        self._obter_executor().submit(os.getpid).result()
+
+    def executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            raise ErroSenhas('Muitas tentativas simultâneas, tente novamente em instantes')
+        try:
+            futuro = self._obter_executor().submit(funcao, *args)
+        except BrokenProcessPool:
+            self._vagas.release()
+            self.fechar()
+            raise ErroSenhas('Serviço de senhas reiniciando, tente novamente')
+        except Exception:
+            self._vagas.release()
+            raise
+        # A vaga só é liberada quando o processo termina, mesmo após um timeout
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            raise ErroSenhas('Tempo esgotado ao verificar a senha, tente novamente')
+        except BrokenProcessPool:
+            self.fechar()
+            raise ErroSenhas('Serviço de senhas reiniciando, tente novamente')
+
+    def fechar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+class LimitadorTentativas:
+    """Janela deslizante de tentativas por chave (IP ou conta), na memória do processo"""
+
+    MAXIMO_CHAVES = 100000
+
+    def __init__(self, maximo, janela):
+        self.maximo = maximo
+        self.janela = janela
+        self._tentativas = {}  # chave -> deque com os instantes das tentativas
+        self._lock = threading.Lock()
+
+    def _descartar_antigas(self, fila, agora):
+        while fila and fila[0] <= agora - self.janela:
+            fila.popleft()
+
+    def espera(self, chave):
+        """Segundos até a chave poder tentar de novo (0 se estiver liberada)"""
+        agora = time.monotonic()
+        with self._lock:
+            fila = self._tentativas.get(chave)
+            if not fila:
+                return 0
+            self._descartar_antigas(fila, agora)
+            if len(fila) < self.maximo:
+                return 0
+            return int(fila[0] + self.janela - agora) + 1
+
+    def registrar(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            if len(self._tentativas) >= self.MAXIMO_CHAVES:
+                for antiga in [c for c, f in self._tentativas.items() if not f or f[-1] <= agora - self.janela]:
+                    del self._tentativas[antiga]
+            fila = self._tentativas.setdefault(chave, deque())
+            self._descartar_antigas(fila, agora)
+            fila.append(agora)
+
+    def limpar(self, chave):
+        with self._lock:
+            self._tentativas.pop(chave, None)
+
+_pool = None
+_limitadores = {}
+_prefixos_metodo = {}
+_lock = threading.Lock()
+
+def obter_pool_senhas():
+    """Retorna o pool de hashing compartilhado pelo processo"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = PoolSenhas(
+                _config('SENHAS_PROCESSOS', 2),
+                _config('SENHAS_FILA_MAXIMA', 32),
+                _config('SENHAS_TIMEOUT', 10)
+            )
+        return _pool
+
+def iniciar_pool_senhas(app):
+    """Cria os processos de hashing (chamar antes de iniciar qualquer thread)"""
+    if not app.config.get('SENHAS_PROCESSOS', 2):
+        return
+    with app.app_context():
+        obter_pool_senhas().iniciar()
+
+def _obter_limitador(nome, chave_config, padrao):
+    with _lock:
+        if nome not in _limitadores:
+            maximo, janela = _config(chave_config, padrao)
+            _limitadores[nome] = LimitadorTentativas(maximo, janela)
+        return _limitadores[nome]
+
+def _limitador_ip():
+    return _obter_limitador('ip', 'SENHAS_LIMITE_IP', (20, 60))
+
+def _limitador_conta():
+    return _obter_limitador('conta', 'SENHAS_LIMITE_CONTA', (5, 900))
+
+def _executar(funcao, *args):
+    if not _config('SENHAS_PROCESSOS', 2):
+        return funcao(*args)
+    return obter_pool_senhas().executar(funcao, *args)
+
+def gerar_hash(senha):
+    """Hash da senha no método e custo configurados (SENHAS_METODO)"""
+    return _executar(generate_password_hash, senha, _config('SENHAS_METODO', METODO_PADRAO))
+
+def verificar_senha(senha_hash, senha):
+    return _executar(check_password_hash, senha_hash, senha)
+
+def _prefixo_metodo(metodo):
+    """Prefixo que o werkzeug grava para o método (ex.: 'scrypt' -> 'scrypt:32768:8:1')"""
+    with _lock:
+        prefixo = _prefixos_metodo.get(metodo)
+    if prefixo is None:
+        prefixo = _executar(generate_password_hash, '', metodo).split('$', 1)[0]
+        with _lock:
+            _prefixos_metodo[metodo] = prefixo
+    return prefixo
+
+def precisa_rehash(senha_hash):
+    """Indica se o hash foi gerado com outro método ou custo"""
+    return senha_hash.split('$', 1)[0] != _prefixo_metodo(_config('SENHAS_METODO', METODO_PADRAO))
+
+def atualizar_hash(conta, senha):
+    """Regrava o hash da conta no método/custo atual após um login bem-sucedido.
+
+    Retorna True se o hash mudou (o commit fica a cargo de quem chama). Se o
+    pool estiver ocupado, deixa para o próximo login.
+    """
+    try:
+        if not precisa_rehash(conta.senha_hash):
+            return False
+        conta.set_senha(senha)
+    except ErroSenhas:
+        return False
+    return True
+
+def _ip():
+    """IP do cliente (atrás de um proxy, só é o real com PROXY_CONFIAVEL configurado)"""
+    return request.remote_addr or '-'
+
+def verificar_limites(conta=None):
+    """Recusa (ErroSenhas 429) a tentativa se o IP ou a conta excederam o limite.
+
+    Toda tentativa conta para o limite do IP; para a conta, só as falhas
+    (registrar_falha), que são zeradas no login bem-sucedido (limpar_falhas).
+    As falhas da conta são contadas por (conta, IP): quem erra a senha de
+    outra pessoa bloqueia apenas o próprio IP, não o login do dono da conta.
+    """
+    ip = _ip()
+    chave_conta = (conta, ip) if conta is not None else None
+    for limitador, chave in ((_limitador_ip(), ip), (_limitador_conta(), chave_conta)):
+        if chave is None:
+            continue
+        espera = limitador.espera(chave)
+        if espera:
+            raise ErroSenhas('Muitas tentativas, tente novamente mais tarde', 429, espera)
+    _limitador_ip().registrar(ip)
+
+def registrar_falha(conta):
+    _limitador_conta().registrar((conta, _ip()))
+
+def limpar_falhas(conta):
+    _limitador_conta().limpar((conta, _ip()))
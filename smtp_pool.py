@@ -0,0 +1,261 @@
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app
+
+# Erros que indicam que a conexão SMTP não pode mais ser reutilizada
+ERROS_CONEXAO = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+class ErroMensagem(Exception):
+    """Falha local ao gerar o conteúdo da mensagem (ex.: anexo ilegível).
+
+    Só a mensagem falha: a conexão não é considerada com problema. Como a
+    falha acontece no meio do DATA, a conexão é descartada (o servidor ainda
+    espera o restante da mensagem) e o envio segue numa nova.
+    """
+
+class ConexaoSMTP:
+    """Conexão SMTP autenticada mantida pelo pool"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.mensagens_enviadas = 0
+        self.ultimo_uso = time.monotonic()
+
+    def ativa(self):
+        """Verifica com NOOP se o servidor ainda responde"""
+        try:
+            codigo, _ = self.smtp.noop()
+            return codigo == 250
+        except ERROS_CONEXAO:
+            return False
+
+    def fechar(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+def transmitir(smtp, mensagem, remetente=None, destinatarios=None):
+    """Envia a mensagem pela conexão.
+
+    Mensagens que sabem se gerar em blocos (gerar_bytes) são transmitidas
+    diretamente no comando DATA, sem montar o conteúdo inteiro na memória.
+    """
+    if not hasattr(mensagem, 'gerar_bytes'):
+        smtp.send_message(mensagem, remetente, destinatarios)
+        return
+
+    cabecalhos = mensagem.mensagem
+    remetente = remetente or cabecalhos['Sender'] or cabecalhos['From']
+    if destinatarios is None:
+        destinatarios = [cabecalhos['To']]
+
+    smtp.ehlo_or_helo_if_needed()
+    codigo, resposta = smtp.mail(remetente)
+    if codigo != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(codigo, resposta, remetente)
+
+    recusados = {}
+    for destinatario in destinatarios:
+        codigo, resposta = smtp.rcpt(destinatario)
+        if codigo not in (250, 251):
+            recusados[destinatario] = (codigo, resposta)
+    if len(recusados) == len(destinatarios):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(recusados)
+
+    codigo, resposta = smtp.docmd('data')
+    if codigo != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(codigo, resposta)
+
+    blocos = mensagem.gerar_bytes()
+    while True:
+        # Erros de leitura dos anexos não são erros da conexão (OSError também)
+        try:
+            bloco = next(blocos, None)
+        except OSError as e:
+            raise ErroMensagem(f'Erro ao ler a mensagem: {e}') from e
+        if bloco is None:
+            break
+        smtp.send(bloco)
+    smtp.send(b'.\r\n')
+
+    codigo, resposta = smtp.getreply()
+    if codigo != 250:
+        raise smtplib.SMTPDataError(codigo, resposta)
+
+class PoolSMTP:
+    """Pool de sessões SMTP autenticadas para um conjunto de configurações"""
+
+    def __init__(self, host, porta, usuario=None, senha=None, usar_tls=True,
+                 tamanho_maximo=4, max_mensagens=100, verificar_apos=10, timeout=30):
+        self.host = host
+        self.porta = porta
+        self.usuario = usuario
+        self.senha = senha
+        self.usar_tls = usar_tls
+        self.tamanho_maximo = tamanho_maximo
+        self.max_mensagens = max_mensagens
+        self.verificar_apos = verificar_apos
+        self.timeout = timeout
+        self._livres = []
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(tamanho_maximo)
+
+    def _conectar(self):
+        smtp = smtplib.SMTP(self.host, self.porta, timeout=self.timeout)
+        try:
+            if self.usar_tls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.senha)
+        except Exception:
+            smtp.close()
+            raise
+        return ConexaoSMTP(smtp)
+
+    def _obter(self):
+        """Retorna uma conexão livre e válida, abrindo uma nova se necessário"""
+        while True:
+            with self._lock:
+                conexao = self._livres.pop() if self._livres else None
+            if conexao is None:
+                return self._conectar()
+            ocioso = time.monotonic() - conexao.ultimo_uso
+            if ocioso < self.verificar_apos or conexao.ativa():
+                return conexao
+            conexao.fechar()
+
+    def _devolver(self, conexao):
+        conexao.ultimo_uso = time.monotonic()
+        if conexao.mensagens_enviadas >= self.max_mensagens:
+            conexao.fechar()
+            return
+        with self._lock:
+            self._livres.append(conexao)
+
+    @contextmanager
+    def sessao(self):
+        """Empresta uma conexão do pool durante o bloco"""
+        self._vagas.acquire()
+        conexao = None
+        try:
+            conexao = self._obter()
+            yield conexao
+        except ERROS_CONEXAO + (ErroMensagem,):
+            if conexao is not None:
+                conexao.fechar()
+                conexao = None
+            raise
+        finally:
+            if conexao is not None:
+                self._devolver(conexao)
+            self._vagas.release()
+
+    def enviar(self, mensagem, remetente=None, destinatarios=None):
+        """Envia uma mensagem, reabrindo a conexão uma vez se ela tiver caído"""
+        for tentativa in range(2):
+            try:
+                with self.sessao() as conexao:
+                    transmitir(conexao.smtp, mensagem, remetente, destinatarios)
+                    conexao.mensagens_enviadas += 1
+                    return
+            except ERROS_CONEXAO:
+                if tentativa == 1:
+                    raise
+
+    def enviar_lote(self, mensagens):
+        """Envia várias mensagens reaproveitando a mesma sessão.
+
+        Recebe uma sequência de (mensagem, remetente, destinatarios) e retorna
+        uma lista de (sucesso, erro) na mesma ordem.
+        """
+        resultados = []
+        pendentes = list(mensagens)
+        falhas_conexao = 0
+        while pendentes:
+            try:
+                with self.sessao() as conexao:
+                    while pendentes and conexao.mensagens_enviadas < self.max_mensagens:
+                        mensagem, remetente, destinatarios = pendentes[0]
+                        try:
+                            transmitir(conexao.smtp, mensagem, remetente, destinatarios)
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except smtplib.SMTPException as e:
+                            resultados.append((False, str(e)))
+                        except ErroMensagem as e:
+                            # Falha só desta mensagem; a sessão é descartada ao sair do bloco
+                            resultados.append((False, str(e)))
+                            pendentes.pop(0)
+                            raise
+                        else:
+                            conexao.mensagens_enviadas += 1
+                            resultados.append((True, None))
+                        pendentes.pop(0)
+                        falhas_conexao = 0
+            except ErroMensagem:
+                continue
+            except ERROS_CONEXAO as e:
+                # Tenta a mensagem atual em uma nova conexão; se falhar de novo,
+                # o servidor está indisponível e as restantes também falham
+                falhas_conexao += 1
+                if falhas_conexao > 1:
+                    resultados.extend((False, str(e)) for _ in pendentes)
+                    break
+        return resultados
+
+    def fechar(self):
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for conexao in livres:
+            conexao.fechar()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obter_pool(config, usar_tls=None, **opcoes):
+    """Retorna o pool compartilhado para as configurações SMTP da loja"""
+    if usar_tls is None:
+        usar_tls = current_app.config.get('SMTP_USAR_TLS', True)
+    opcoes.setdefault('tamanho_maximo', current_app.config.get('SMTP_POOL_TAMANHO', 4))
+    opcoes.setdefault('max_mensagens', current_app.config.get('SMTP_MAX_MENSAGENS_SESSAO', 100))
+
+    chave = (
+        config.email_smtp_host,
+        config.email_smtp_port,
+        config.email_usuario,
+        config.email_senha,
+        usar_tls
+    )
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            # Configurações antigas não serão mais usadas
+            for antigo in _pools.values():
+                antigo.fechar()
+            _pools.clear()
+            pool = PoolSMTP(
+                config.email_smtp_host,
+                config.email_smtp_port,
+                config.email_usuario,
+                config.email_senha,
+                usar_tls=usar_tls,
+                **opcoes
+            )
+            _pools[chave] = pool
+        return pool
+
+def fechar_pools():
+    """Fecha todas as conexões mantidas pelos pools"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.fechar()
+        _pools.clear()
@@ -1,11 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.senhas import gerar_hash, verificar_senha
 
 db = SQLAlchemy()
 
 class Produto(db.Model):
     __tablename__ = 'produtos'
+    __table_args__ = (
+        # Catálogo público: filtra por ativo e pagina por id
+        db.Index('ix_produtos_ativo_id', 'ativo', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(200), nullable=False)
@@ -13,6 +17,8 @@ class Produto(db.Model):
     preco = db.Column(db.Float, nullable=False)
     caminho_pdf = db.Column(db.String(500), nullable=False)
     imagem_capa = db.Column(db.String(500), nullable=True)
+    # Variantes redimensionadas da capa: {'versao', 'larguras', 'formatos'} (src.utils.miniaturas)
+    miniaturas = db.Column(db.JSON(none_as_null=True), nullable=True)
     ativo = db.Column(db.Boolean, default=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -30,17 +36,23 @@ class Produto(db.Model):
             'preco': self.preco,
             'caminho_pdf': self.caminho_pdf,
             'imagem_capa': self.imagem_capa,
+            'miniaturas': self.miniaturas,
             'ativo': self.ativo,
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None
         }
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
+    __table_args__ = (
+        db.Index('ix_clientes_ativo', 'ativo'),
+        # Exportação por período de cadastro
+        db.Index('ix_clientes_data_cadastro_id', 'data_cadastro', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    senha_hash = db.Column(db.String(128), nullable=False)
+    senha_hash = db.Column(db.String(255), nullable=False)
     ativo = db.Column(db.Boolean, default=True)
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -51,10 +63,10 @@ class Cliente(db.Model):
         return f'<Cliente {self.nome}>'
     
     def set_senha(self, senha):
-        self.senha_hash = generate_password_hash(senha)
+        self.senha_hash = gerar_hash(senha)
     
     def check_senha(self, senha):
-        return check_password_hash(self.senha_hash, senha)
+        return verificar_senha(self.senha_hash, senha)
     
     def to_dict(self):
         return {
@@ -67,6 +79,16 @@ class Cliente(db.Model):
 
 class Venda(db.Model):
     __tablename__ = 'vendas'
+    __table_args__ = (
+        # Listagem administrativa paginada por (data_venda, id)
+        db.Index('ix_vendas_data_venda_id', 'data_venda', 'id'),
+        # Compras do cliente, na mesma ordem
+        db.Index('ix_vendas_cliente_data_venda', 'id_cliente', 'data_venda', 'id'),
+        db.Index('ix_vendas_produto', 'id_produto'),
+        # Envio em lote dos emails pendentes
+        db.Index('ix_vendas_status_email', 'status', 'email_enviado'),
+        db.Index('ix_vendas_pedido', 'id_pedido'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     id_cliente = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
@@ -75,6 +97,10 @@ class Venda(db.Model):
     preco_total = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), default='pendente')  # pendente, concluida, cancelada
     email_enviado = db.Column(db.Boolean, default=False)
+    id_pedido = db.Column(db.String(32), nullable=True)  # vendas finalizadas juntas no carrinho
+    
+    # Relacionamento com a fila de entrega de emails
+    entregas = db.relationship('EntregaEmail', backref='venda', lazy=True)
     
     def __repr__(self):
         return f'<Venda {self.id}>'
@@ -88,16 +114,122 @@ class Venda(db.Model):
             'preco_total': self.preco_total,
             'status': self.status,
             'email_enviado': self.email_enviado,
+            'id_pedido': self.id_pedido,
             'cliente_nome': self.cliente.nome if self.cliente else None,
             'produto_nome': self.produto.nome if self.produto else None
         }
+    
+    @classmethod
+    def consulta_lista(cls, query=None):
+        """Projeção das colunas de to_dict já com os nomes de cliente e produto.
+
+        Usada para serializar listas de vendas com uma única consulta, sem
+        carregar os relacionamentos linha a linha.
+        """
+        if query is None:
+            query = cls.query
+        return query.with_entities(
+            cls.id,
+            cls.id_cliente,
+            cls.id_produto,
+            cls.data_venda,
+            cls.preco_total,
+            cls.status,
+            cls.email_enviado,
+            cls.id_pedido,
+            Cliente.nome.label('cliente_nome'),
+            Produto.nome.label('produto_nome')
+        ).outerjoin(Cliente, cls.id_cliente == Cliente.id).outerjoin(Produto, cls.id_produto == Produto.id)
+    
+    @staticmethod
+    def linha_to_dict(linha):
+        """Serializa uma linha de consulta_lista no mesmo formato de to_dict"""
+        return {
+            'id': linha.id,
+            'id_cliente': linha.id_cliente,
+            'id_produto': linha.id_produto,
+            'data_venda': linha.data_venda.isoformat() if linha.data_venda else None,
+            'preco_total': linha.preco_total,
+            'status': linha.status,
+            'email_enviado': linha.email_enviado,
+            'id_pedido': linha.id_pedido,
+            'cliente_nome': linha.cliente_nome,
+            'produto_nome': linha.produto_nome
+        }
+
+class EntregaEmail(db.Model):
+    __tablename__ = 'entregas_email'
+    __table_args__ = (
+        db.Index('ix_entregas_email_venda', 'id_venda'),
+        db.Index('ix_entregas_email_pedido', 'id_pedido'),
+        # Reserva da próxima entrega pelos workers
+        db.Index('ix_entregas_email_status_proxima', 'status', 'proxima_tentativa'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    id_venda = db.Column(db.Integer, db.ForeignKey('vendas.id'), nullable=False)
+    # Entrega de um pedido inteiro (um email com todos os produtos); id_venda
+    # aponta para a primeira venda do pedido
+    id_pedido = db.Column(db.String(32), nullable=True)
+    status = db.Column(db.String(20), default='pendente')  # pendente, enviando, enviado, falhou
+    tentativas = db.Column(db.Integer, default=0)
+    proxima_tentativa = db.Column(db.DateTime, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_envio = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<EntregaEmail {self.id} venda={self.id_venda}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'id_venda': self.id_venda,
+            'id_pedido': self.id_pedido,
+            'status': self.status,
+            'tentativas': self.tentativas,
+            'proxima_tentativa': self.proxima_tentativa.isoformat() if self.proxima_tentativa else None,
+            'ultimo_erro': self.ultimo_erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_envio': self.data_envio.isoformat() if self.data_envio else None
+        }
+
+class ResumoVendasDia(db.Model):
+    __tablename__ = 'resumo_vendas_dia'
+    
+    dia = db.Column(db.Date, primary_key=True)
+    total_vendas = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ResumoVendasDia {self.dia}>'
+
+class ResumoVendasProduto(db.Model):
+    __tablename__ = 'resumo_vendas_produto'
+    
+    id_produto = db.Column(db.Integer, db.ForeignKey('produtos.id'), primary_key=True)
+    total_vendas = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ResumoVendasProduto {self.id_produto}>'
+
+class ResumoVendasStatus(db.Model):
+    __tablename__ = 'resumo_vendas_status'
+    
+    status = db.Column(db.String(50), primary_key=True)
+    total_vendas = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ResumoVendasStatus {self.status}>'
 
 class Administrador(db.Model):
     __tablename__ = 'administradores'
     
     id = db.Column(db.Integer, primary_key=True)
     usuario = db.Column(db.String(80), unique=True, nullable=False)
-    senha_hash = db.Column(db.String(128), nullable=False)
+    senha_hash = db.Column(db.String(255), nullable=False)
     ativo = db.Column(db.Boolean, default=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -105,10 +237,10 @@ class Administrador(db.Model):
         return f'<Administrador {self.usuario}>'
     
     def set_senha(self, senha):
-        self.senha_hash = generate_password_hash(senha)
+        self.senha_hash = gerar_hash(senha)
     
     def check_senha(self, senha):
-        return check_password_hash(self.senha_hash, senha)
+        return verificar_senha(self.senha_hash, senha)
     
     def to_dict(self):
         return {
@@ -131,6 +263,9 @@ class ConfiguracaoLoja(db.Model):
     email_usuario = db.Column(db.String(120), nullable=True)
     email_senha = db.Column(db.String(128), nullable=True)
     email_remetente = db.Column(db.String(120), nullable=True)
+    modo_entrega = db.Column(db.String(20), default='anexo')  # anexo, link
+    validade_link_horas = db.Column(db.Integer, default=72)
+    versao = db.Column(db.Integer, default=1)  # incrementada a cada alteração (invalida os caches)
     
     def to_dict(self):
         return {
@@ -142,6 +277,8 @@ class ConfiguracaoLoja(db.Model):
             'email_smtp_host': self.email_smtp_host,
             'email_smtp_port': self.email_smtp_port,
             'email_usuario': self.email_usuario,
-            'email_remetente': self.email_remetente
+            'email_remetente': self.email_remetente,
+            'modo_entrega': self.modo_entrega,
+            'validade_link_horas': self.validade_link_horas
         }
 
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from flask import current_app
+from sqlalchemy import update
+from src.models.store import db, Produto
+from src.utils.armazenamento import chave_conteudo, obter_armazenamento
+from src.utils.cache_catalogo import invalidar_catalogo
+
+TAMANHO_BLOCO = 64 * 1024
+
+class ErroUpload(Exception):
+    """Erro de validação de um upload (a mensagem é devolvida ao cliente)"""
+
+    def __init__(self, mensagem, status=400, **detalhes):
+        super().__init__(mensagem)
+        self.status = status
+        self.detalhes = detalhes
+
+def extensao(nome_arquivo):
+    return nome_arquivo.rsplit('.', 1)[1].lower() if '.' in nome_arquivo else ''
+
+def armazenar_stream(armazenamento, parciais, stream, ext, maximo=None):
+    """Grava um stream num arquivo temporário em `parciais` calculando o
+    SHA-256 em blocos e o entrega ao armazenamento, com chave pelo conteúdo.
+    Arquivos idênticos são gravados uma vez. Retorna (chave, digest, tamanho).
+
+    Com `maximo`, um stream maior que `maximo` bytes é descartado com
+    ErroUpload (413) assim que o ultrapassa."""
+    os.makedirs(parciais, exist_ok=True)
+    temporario = os.path.join(parciais, f'{uuid.uuid4().hex}.tmp')
+
+    sha = hashlib.sha256()
+    tamanho = 0
+    try:
+        with open(temporario, 'wb') as saida:
+            while True:
+                bloco = stream.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                tamanho += len(bloco)
+                if maximo is not None and tamanho > maximo:
+                    raise ErroUpload('Tamanho de arquivo não permitido', 413)
+                sha.update(bloco)
+                saida.write(bloco)
+        digest = sha.hexdigest()
+        chave = chave_conteudo(digest, ext)
+        armazenamento.gravar_arquivo(temporario, chave)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return chave, digest, tamanho
+
+def caminhos_absolutos_inacessiveis(armazenamento):
+    """Caminhos absolutos de produtos (anteriores às chaves) que o
+    armazenamento não serve: fora de UPLOAD_DIR ou inexistentes no backend
+    local, e todos no S3. Devem ser levados com migrar_caminhos_absolutos."""
+    inacessiveis = []
+    for coluna in (Produto.caminho_pdf, Produto.imagem_capa):
+        for caminho, in db.session.query(coluna).distinct():
+            if not caminho or not os.path.isabs(caminho):
+                continue
+            if armazenamento.nome != 'local' or not armazenamento.existe(caminho):
+                inacessiveis.append(caminho)
+    return inacessiveis
+
+def migrar_caminhos_absolutos(armazenamento, parciais):
+    """Envia ao armazenamento os arquivos de produtos gravados com caminho
+    absoluto no disco (anteriores às chaves) e troca o caminho pela chave.
+
+    Os arquivos originais são mantidos. Capas migradas perdem o registro das
+    miniaturas, que devem ser geradas de novo. Retorna uma lista de
+    (caminho, chave ou erro, sucesso).
+    """
+    resultados = []
+    for coluna in (Produto.caminho_pdf, Produto.imagem_capa):
+        caminhos = [caminho for caminho, in db.session.query(coluna).distinct() if caminho and os.path.isabs(caminho)]
+        for caminho in caminhos:
+            try:
+                with open(caminho, 'rb') as entrada:
+                    chave, _, _ = armazenar_stream(armazenamento, parciais, entrada, extensao(caminho))
+            except OSError as e:
+                resultados.append((caminho, str(e), False))
+                continue
+            valores = {coluna.key: chave}
+            if coluna is Produto.imagem_capa:
+                valores['miniaturas'] = None
+            db.session.execute(update(Produto).where(coluna == caminho).values(**valores))
+            db.session.commit()
+            resultados.append((caminho, chave, True))
+    if any(sucesso for _, _, sucesso in resultados):
+        invalidar_catalogo()
+    return resultados
+
+class UploadsRetomaveis:
+    """Uploads em partes que podem ser retomados após queda da conexão.
+
+    O estado de cada upload (nome, tamanho esperado e bytes recebidos) fica em
+    disco ao lado do arquivo parcial, então a retomada funciona mesmo em outro
+    worker ou após reiniciar o processo (com vários nós, `raiz` precisa ser
+    compartilhada ou as partes de um upload devem ir ao mesmo nó). O SHA-256 é
+    calculado incrementalmente quando as partes chegam ao mesmo processo;
+    caso contrário, é recalculado lendo o arquivo parcial ao final. O arquivo
+    completo vai para o `armazenamento`.
+
+    Uploads sem nenhuma parte recebida há mais de `validade_horas` são
+    descartados (a limpeza roda ao criar o gerenciador e, no máximo uma vez
+    por INTERVALO_LIMPEZA, ao receber partes, além de a cada upload
+    iniciado). A soma dos tamanhos declarados dos uploads em andamento fica
+    limitada a `maximo_parciais` bytes; além disso, novos uploads são
+    recusados (507).
+    """
+
+    INTERVALO_LIMPEZA = 60  # segundos
+
+    def __init__(self, raiz, armazenamento, validade_horas=24, maximo_parciais=None):
+        self.raiz = raiz
+        self.armazenamento = armazenamento
+        self.diretorio = os.path.join(raiz, '.parciais')
+        self.validade = validade_horas * 3600
+        self.maximo_parciais = maximo_parciais
+        self._hashes = {}  # id_upload -> (bytes cobertos, objeto sha256)
+        self._lock = threading.Lock()
+        self._ultima_limpeza = None
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._limpar_se_preciso()
+
+    def _caminhos(self, id_upload):
+        if not id_upload.isalnum():
+            raise ErroUpload('Upload não encontrado', 404)
+        base = os.path.join(self.diretorio, id_upload)
+        return f'{base}.part', f'{base}.json'
+
+    def _ler_estado(self, id_upload):
+        parcial, meta = self._caminhos(id_upload)
+        try:
+            with open(meta) as arquivo:
+                estado = json.load(arquivo)
+        except (OSError, ValueError):
+            raise ErroUpload('Upload não encontrado', 404)
+        # O tamanho real do arquivo parcial é a fonte de verdade do progresso
+        estado['recebido'] = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        return estado
+
+    def iniciar(self, nome_arquivo, tamanho):
+        """Cria um upload e retorna o seu estado inicial"""
+        self.limpar_expirados()
+        if self.maximo_parciais is not None and self._reservado() + tamanho > self.maximo_parciais:
+            raise ErroUpload('Muitos uploads em andamento, tente novamente mais tarde', 507)
+        id_upload = uuid.uuid4().hex
+        parcial, meta = self._caminhos(id_upload)
+        estado = {
+            'id_upload': id_upload,
+            'nome_arquivo': nome_arquivo,
+            'tamanho': tamanho,
+            'criado_em': time.time()
+        }
+        open(parcial, 'wb').close()
+        with open(meta, 'w') as arquivo:
+            json.dump(estado, arquivo)
+        with self._lock:
+            self._hashes[id_upload] = (0, hashlib.sha256())
+        estado['recebido'] = 0
+        return estado
+
+    def estado(self, id_upload):
+        return self._ler_estado(id_upload)
+
+    def receber(self, id_upload, inicio, stream):
+        """Grava uma parte a partir do byte `inicio`.
+
+        Retorna o estado atualizado; quando todos os bytes chegam, o arquivo é
+        entregue ao armazenamento com chave pelo conteúdo e o estado inclui
+        'caminho' (a chave) e 'sha256'.
+        """
+        self._limpar_se_preciso()
+        estado = self._ler_estado(id_upload)
+        parcial, meta = self._caminhos(id_upload)
+
+        if inicio != estado['recebido']:
+            raise ErroUpload(
+                'Posição da parte não confere com os bytes já recebidos',
+                409,
+                recebido=estado['recebido']
+            )
+
+        # Mantém o upload vivo para a limpeza de abandonados
+        os.utime(meta)
+
+        with self._lock:
+            coberto, sha = self._hashes.pop(id_upload, (0, None))
+        if coberto != inicio:
+            sha = None
+
+        restante = estado['tamanho'] - inicio
+        recebido = inicio
+        try:
+            with open(parcial, 'ab') as saida:
+                while True:
+                    bloco = stream.read(TAMANHO_BLOCO)
+                    if not bloco:
+                        break
+                    if len(bloco) > restante:
+                        raise ErroUpload('Parte excede o tamanho declarado do arquivo', 413)
+                    saida.write(bloco)
+                    if sha is not None:
+                        sha.update(bloco)
+                    restante -= len(bloco)
+                    recebido += len(bloco)
+        finally:
+            if sha is not None:
+                with self._lock:
+                    self._hashes[id_upload] = (recebido, sha)
+
+        estado['recebido'] = recebido
+        if restante > 0:
+            return estado
+
+        with self._lock:
+            coberto, sha = self._hashes.pop(id_upload, (0, None))
+        if sha is None or coberto != recebido:
+            sha = hashlib.sha256()
+            with open(parcial, 'rb') as entrada:
+                for bloco in iter(lambda: entrada.read(TAMANHO_BLOCO), b''):
+                    sha.update(bloco)
+
+        digest = sha.hexdigest()
+        estado['caminho'] = chave_conteudo(digest, extensao(estado['nome_arquivo']))
+        self.armazenamento.gravar_arquivo(parcial, estado['caminho'])
+        estado['sha256'] = digest
+        os.remove(meta)
+        return estado
+
+    def cancelar(self, id_upload):
+        parcial, meta = self._caminhos(id_upload)
+        with self._lock:
+            self._hashes.pop(id_upload, None)
+        for caminho in (parcial, meta):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    def _reservado(self):
+        """Soma dos tamanhos declarados dos uploads em andamento (de todos os processos)"""
+        total = 0
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.diretorio, nome)) as arquivo:
+                    total += int(json.load(arquivo)['tamanho'])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        return total
+
+    def _limpar_se_preciso(self):
+        agora = time.monotonic()
+        with self._lock:
+            if self._ultima_limpeza is not None and agora - self._ultima_limpeza < self.INTERVALO_LIMPEZA:
+                return
+            self._ultima_limpeza = agora
+        self.limpar_expirados()
+
+    def limpar_expirados(self):
+        """Remove uploads abandonados há mais tempo que a validade"""
+        limite = time.time() - self.validade
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+_uploads = None
+_uploads_lock = threading.Lock()
+
+def obter_uploads():
+    """Retorna o gerenciador de uploads retomáveis do processo"""
+    global _uploads
+    with _uploads_lock:
+        if _uploads is None:
+            _uploads = UploadsRetomaveis(
+                current_app.config['UPLOAD_DIR'],
+                obter_armazenamento(),
+                current_app.config.get('UPLOAD_VALIDADE_HORAS', 24),
+                current_app.config.get('UPLOAD_PARCIAIS_MAXIMO')
+            )
+        return _uploads
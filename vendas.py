@@ -1,77 +1,295 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.store import db, Venda, Produto, Cliente, ConfiguracaoLoja
-import smtplib
+from src.models.store import db, Venda, Produto, EntregaEmail
+from src.routes.admin import admin_required
+from src.utils.entrega_email import enfileirar_email, enfileirar_email_pedido, notificar_entrega
+from src.utils.smtp_pool import obter_pool
+from src.utils.cache_anexos import montar_mensagem_pdf, montar_mensagem_pdfs, fechar_mensagem
+from src.utils.armazenamento import obter_armazenamento, nome_para_cliente
+from src.utils.links_download import gerar_link
+from src.utils.cache_clientes import cliente_ativo
+from src.utils.cache_configuracao import configuracao_loja
+from src.utils.metricas import medir_envio_email
+from src.utils.resumos_vendas import (
+    registrar_venda, registrar_vendas, registrar_mudanca_status, totais_vendas, vendas_por_status, produtos_mais_vendidos
+)
+from src.utils.paginacao import paginar, parametros_paginacao, ErroPaginacao
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import joinedload
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-import os
+import uuid
+from datetime import datetime
 from functools import wraps
 
 vendas_bp = Blueprint('vendas', __name__)
 
+# Produtos distintos aceitos em um único pedido
+MAXIMO_ITENS_PEDIDO = 100
+
 def login_required(f):
-    """Decorator para verificar se o cliente está logado"""
+    """Decorator para verificar se o cliente está logado (e ativo, pelo cache)"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'cliente_id' not in session:
             return jsonify({'erro': 'Login necessário'}), 401
+        if not cliente_ativo(session['cliente_id']):
+            session.pop('cliente_id', None)
+            session.pop('cliente_nome', None)
+            return jsonify({'erro': 'Login necessário'}), 401
         return f(*args, **kwargs)
     return decorated_function
 
-def enviar_email_pdf(cliente_email, cliente_nome, produto_nome, caminho_pdf):
-    """Envia o PDF por email para o cliente"""
+def montar_email_pdf(config, cliente_email, cliente_nome, produto_nome, caminho_pdf,
+                     produto_id=None, venda_id=None):
+    """Monta a mensagem com o PDF anexado ou com um link de download assinado,
+    conforme o modo de entrega da loja (retorna None se o arquivo não existir)"""
+    entrega_por_link = config.modo_entrega == 'link' and produto_id and venda_id
+    
+    msg = MIMEMultipart()
+    msg['From'] = config.email_remetente or config.email_usuario
+    msg['To'] = cliente_email
+    msg['Subject'] = f"Seu produto: {produto_nome}"
+    
+    # Corpo do email
+    if entrega_por_link:
+        link = gerar_link(produto_id, venda_id, config.validade_link_horas or 72)
+        corpo = f"""
+        Olá {cliente_nome},
+
+        Obrigado por sua compra! Baixe o PDF do produto "{produto_nome}" pelo link abaixo:
+
+        {link}
+
+        O link é válido por {config.validade_link_horas or 72} horas. Depois disso, solicite o reenvio na sua área de compras.
+
+        Atenciosamente,
+        {config.nome_loja}
+        """
+    else:
+        corpo = f"""
+        Olá {cliente_nome},
+
+        Obrigado por sua compra! Segue em anexo o PDF do produto "{produto_nome}".
+
+        Atenciosamente,
+        {config.nome_loja}
+        """
+    
+    msg.attach(MIMEText(corpo, 'plain'))
+    
+    if entrega_por_link:
+        if not caminho_pdf or not obter_armazenamento().existe(caminho_pdf):
+            return None
+        return msg
+    
+    # Anexar PDF (já codificado, lido do cache de anexos)
+    return montar_mensagem_pdf(msg, caminho_pdf, nome_para_cliente(produto_nome, caminho_pdf))
+
+@medir_envio_email('produto')
+def enviar_email_pdf(cliente_email, cliente_nome, produto_nome, caminho_pdf,
+                     produto_id=None, venda_id=None):
+    """Envia o PDF (ou o link de download) por email para o cliente"""
     try:
         # Obter configurações de email
-        config = ConfiguracaoLoja.query.first()
-        if not config or not config.email_smtp_host:
+        config = configuracao_loja()
+        if not config.email_smtp_host:
             return False, "Configurações de email não encontradas"
         
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = config.email_remetente or config.email_usuario
-        msg['To'] = cliente_email
-        msg['Subject'] = f"Seu produto: {produto_nome}"
+        msg = montar_email_pdf(
+            config, cliente_email, cliente_nome, produto_nome, caminho_pdf,
+            produto_id=produto_id, venda_id=venda_id
+        )
+        if msg is None:
+            return False, "Arquivo PDF não encontrado"
+        
+        # Enviar email reaproveitando uma sessão SMTP do pool
+        try:
+            obter_pool(config).enviar(msg, config.email_usuario, [cliente_email])
+        finally:
+            fechar_mensagem(msg)
         
-        # Corpo do email
+        return True, "Email enviado com sucesso"
+        
+    except Exception as e:
+        return False, f"Erro ao enviar email: {str(e)}"
+
+def montar_email_pedido(config, cliente_email, cliente_nome, vendas):
+    """Monta uma única mensagem com todos os produtos do pedido, anexados ou
+    como links de download assinados (retorna None se algum arquivo não existir)"""
+    entrega_por_link = config.modo_entrega == 'link'
+    validade = config.validade_link_horas or 72
+    
+    msg = MIMEMultipart()
+    msg['From'] = config.email_remetente or config.email_usuario
+    msg['To'] = cliente_email
+    msg['Subject'] = f"Seu pedido: {len(vendas)} produto(s)"
+    
+    if entrega_por_link:
+        itens = '\n'.join(
+            f'        - {venda.produto.nome}: {gerar_link(venda.id_produto, venda.id, validade)}'
+            for venda in vendas
+        )
         corpo = f"""
         Olá {cliente_nome},
 
-        Obrigado por sua compra! Segue em anexo o PDF do produto "{produto_nome}".
+        Obrigado por sua compra! Baixe os PDFs do seu pedido pelos links abaixo:
+
+{itens}
+
+        Os links são válidos por {validade} horas. Depois disso, solicite o reenvio na sua área de compras.
 
         Atenciosamente,
         {config.nome_loja}
         """
+    else:
+        itens = '\n'.join(f'        - {venda.produto.nome}' for venda in vendas)
+        corpo = f"""
+        Olá {cliente_nome},
+
+        Obrigado por sua compra! Seguem em anexo os PDFs do seu pedido:
+
+{itens}
+
+        Atenciosamente,
+        {config.nome_loja}
+        """
+    
+    msg.attach(MIMEText(corpo, 'plain'))
+    
+    caminhos = [venda.produto.caminho_pdf for venda in vendas]
+    if entrega_por_link:
+        armazenamento = obter_armazenamento()
+        if not all(caminho and armazenamento.existe(caminho) for caminho in caminhos):
+            return None
+        return msg
+    
+    return montar_mensagem_pdfs(msg, caminhos, [nome_para_cliente(venda.produto.nome, venda.produto.caminho_pdf) for venda in vendas])
+
+@medir_envio_email('pedido')
+def enviar_email_pedido(cliente_email, cliente_nome, vendas):
+    """Envia um email com os PDFs (ou links) de todas as vendas do pedido"""
+    try:
+        config = configuracao_loja()
+        if not config.email_smtp_host:
+            return False, "Configurações de email não encontradas"
         
-        msg.attach(MIMEText(corpo, 'plain'))
-        
-        # Anexar PDF
-        if os.path.exists(caminho_pdf):
-            with open(caminho_pdf, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename= {os.path.basename(caminho_pdf)}'
-                )
-                msg.attach(part)
-        else:
+        msg = montar_email_pedido(config, cliente_email, cliente_nome, vendas)
+        if msg is None:
             return False, "Arquivo PDF não encontrado"
         
-        # Enviar email
-        server = smtplib.SMTP(config.email_smtp_host, config.email_smtp_port)
-        server.starttls()
-        server.login(config.email_usuario, config.email_senha)
-        text = msg.as_string()
-        server.sendmail(config.email_usuario, cliente_email, text)
-        server.quit()
+        try:
+            obter_pool(config).enviar(msg, config.email_usuario, [cliente_email])
+        finally:
+            fechar_mensagem(msg)
         
         return True, "Email enviado com sucesso"
         
     except Exception as e:
         return False, f"Erro ao enviar email: {str(e)}"
 
+def enviar_emails_pendentes(limite=None):
+    """Envia em lote os PDFs das vendas concluídas que ainda não receberam email.
+
+    Todas as mensagens são enviadas pelas mesmas sessões SMTP do pool. Os
+    itens de um pedido vão numa única mensagem. Vendas com entrega em
+    andamento na fila são ignoradas para evitar duplicidade.
+    """
+    config = configuracao_loja()
+    if not config.email_smtp_host:
+        return {'enviados': 0, 'falhas': [], 'erro': 'Configurações de email não encontradas'}
+    
+    em_andamento = db.session.query(EntregaEmail.id_venda).filter(EntregaEmail.status == 'enviando')
+    pedidos_em_andamento = db.session.query(EntregaEmail.id_pedido).filter(
+        EntregaEmail.status == 'enviando',
+        EntregaEmail.id_pedido.isnot(None)
+    )
+    query = Venda.query.options(
+        joinedload(Venda.cliente),
+        joinedload(Venda.produto)
+    ).filter(
+        Venda.email_enviado == False,
+        Venda.status == 'concluida',
+        ~Venda.id.in_(em_andamento),
+        or_(Venda.id_pedido.is_(None), ~Venda.id_pedido.in_(pedidos_em_andamento))
+    ).order_by(Venda.id)
+    if limite:
+        query = query.limit(limite)
+    
+    # Os itens de um pedido vão juntos numa só mensagem, como na fila de entrega
+    grupos = {}
+    for venda in query.all():
+        grupos.setdefault(('pedido', venda.id_pedido) if venda.id_pedido else ('venda', venda.id), []).append(venda)
+    
+    lotes = []
+    mensagens = []
+    falhas = []
+    for (tipo, _), itens in grupos.items():
+        cliente = itens[0].cliente
+        if tipo == 'pedido':
+            msg = montar_email_pedido(config, cliente.email, cliente.nome, itens)
+        else:
+            venda = itens[0]
+            msg = montar_email_pdf(
+                config,
+                cliente.email,
+                cliente.nome,
+                venda.produto.nome,
+                venda.produto.caminho_pdf,
+                produto_id=venda.id_produto,
+                venda_id=venda.id
+            )
+        if msg is None:
+            falhas.extend({'id_venda': venda.id, 'erro': 'Arquivo PDF não encontrado'} for venda in itens)
+            continue
+        lotes.append(itens)
+        mensagens.append((msg, config.email_usuario, [cliente.email]))
+    
+    try:
+        resultados = obter_pool(config).enviar_lote(mensagens)
+    finally:
+        for msg, _, _ in mensagens:
+            fechar_mensagem(msg)
+    
+    enviados = []
+    avulsas = []
+    pedidos = set()
+    for itens, (sucesso, erro) in zip(lotes, resultados):
+        if not sucesso:
+            falhas.extend({'id_venda': venda.id, 'erro': erro} for venda in itens)
+            continue
+        for venda in itens:
+            enviados.append(venda.id)
+            venda.email_enviado = True
+            if venda.id_pedido:
+                pedidos.add(venda.id_pedido)
+            else:
+                avulsas.append(venda.id)
+    
+    # Entregas ainda pendentes na fila não são mais necessárias; a de um
+    # pedido só quando todos os itens dele já foram enviados (com o limite,
+    # parte dos itens pode ter ficado para depois)
+    if pedidos:
+        db.session.flush()
+        incompletos = db.session.query(Venda.id_pedido).filter(
+            Venda.id_pedido.in_(pedidos),
+            Venda.email_enviado == False
+        ).distinct()
+        pedidos -= {linha.id_pedido for linha in incompletos}
+    if avulsas or pedidos:
+        EntregaEmail.query.filter(
+            or_(
+                EntregaEmail.id_pedido.in_(pedidos),
+                and_(EntregaEmail.id_pedido.is_(None), EntregaEmail.id_venda.in_(avulsas))
+            ),
+            EntregaEmail.status == 'pendente'
+        ).update(
+            {'status': 'enviado', 'data_envio': datetime.utcnow(), 'ultimo_erro': None},
+            synchronize_session=False
+        )
+    
+    db.session.commit()
+    return {'enviados': len(enviados), 'falhas': falhas}
+
 @vendas_bp.route('/vendas/comprar', methods=['POST'])
 @login_required
 def processar_compra():
@@ -82,44 +300,128 @@ def processar_compra():
         if not data or not data.get('produto_id'):
             return jsonify({'erro': 'ID do produto é obrigatório'}), 400
         
-        # Verificar se o produto existe e está ativo
-        produto = Produto.query.filter_by(id=data['produto_id'], ativo=True).first()
+        try:
+            produto_id = int(data['produto_id'])
+        except (TypeError, ValueError):
+            return jsonify({'erro': 'ID do produto inválido'}), 400
+        
+        # Verificar se o produto existe e está ativo no banco: o cache do catálogo
+        # de outro processo pode ainda não ter visto a desativação
+        produto = (
+            db.session.query(Produto.id, Produto.preco)
+            .filter(Produto.id == produto_id, Produto.ativo == True)
+            .first()
+        )
         if not produto:
             return jsonify({'erro': 'Produto não encontrado'}), 404
         
-        # Obter cliente
-        cliente = Cliente.query.get(session['cliente_id'])
+        # Obter cliente (do cache)
+        cliente = cliente_ativo(session['cliente_id'])
         if not cliente:
             return jsonify({'erro': 'Cliente não encontrado'}), 404
         
         # Criar venda
         venda = Venda(
-            id_cliente=cliente.id,
+            id_cliente=cliente['id'],
             id_produto=produto.id,
             preco_total=produto.preco,
             status='concluida'  # Por simplicidade, consideramos a compra como concluída
         )
         
         db.session.add(venda)
+        registrar_venda(venda)
+        
+        # Agendar o envio do PDF por email na mesma transação da venda
+        enfileirar_email(venda)
         db.session.commit()
+        notificar_entrega()
         
-        # Tentar enviar email com o PDF
-        sucesso_email, mensagem_email = enviar_email_pdf(
-            cliente.email,
-            cliente.nome,
-            produto.nome,
-            produto.caminho_pdf
+        return jsonify({
+            'mensagem': 'Compra realizada com sucesso',
+            'venda': venda.to_dict(),
+            'email_enviado': False,
+            'email_agendado': True,
+            'mensagem_email': 'O envio do PDF por email foi agendado'
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
+@vendas_bp.route('/vendas/pedido', methods=['POST'])
+@login_required
+def finalizar_pedido():
+    """Compra todos os produtos do carrinho em uma única transação.
+
+    Recebe {'produto_ids': [...]}; cria uma venda por produto, todas com o
+    mesmo id_pedido, e agenda um único email com todos os PDFs.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        produto_ids = data.get('produto_ids')
+        
+        if not isinstance(produto_ids, list) or not produto_ids:
+            return jsonify({'erro': 'Lista de produtos é obrigatória'}), 400
+        try:
+            # Sem repetir produtos, mantendo a ordem do carrinho
+            produto_ids = list(dict.fromkeys(int(produto_id) for produto_id in produto_ids))
+        except (TypeError, ValueError):
+            return jsonify({'erro': 'IDs de produto inválidos'}), 400
+        if len(produto_ids) > MAXIMO_ITENS_PEDIDO:
+            return jsonify({'erro': f'O pedido pode ter no máximo {MAXIMO_ITENS_PEDIDO} produtos'}), 400
+        
+        # Validar todos os produtos com uma única consulta
+        precos = dict(
+            db.session.query(Produto.id, Produto.preco)
+            .filter(Produto.id.in_(produto_ids), Produto.ativo == True)
+            .all()
         )
+        indisponiveis = [produto_id for produto_id in produto_ids if produto_id not in precos]
+        if indisponiveis:
+            return jsonify({
+                'erro': 'Produto não encontrado',
+                'produtos_indisponiveis': indisponiveis
+            }), 404
+        
+        cliente = cliente_ativo(session['cliente_id'])
+        if not cliente:
+            return jsonify({'erro': 'Cliente não encontrado'}), 404
         
-        if sucesso_email:
-            venda.email_enviado = True
-            db.session.commit()
+        id_pedido = uuid.uuid4().hex
+        agora = datetime.utcnow()
+        linhas = [
+            {
+                'id_cliente': cliente['id'],
+                'id_produto': produto_id,
+                'preco_total': precos[produto_id],
+                'data_venda': agora,
+                'status': 'concluida',  # Por simplicidade, consideramos a compra como concluída
+                'id_pedido': id_pedido
+            }
+            for produto_id in produto_ids
+        ]
+        # Todas as vendas em um único INSERT (executemany)
+        db.session.execute(insert(Venda), linhas)
+        registrar_vendas([Venda(**linha) for linha in linhas])
+        
+        itens = [
+            Venda.linha_to_dict(linha)
+            for linha in Venda.consulta_lista(Venda.query.filter_by(id_pedido=id_pedido)).order_by(Venda.id)
+        ]
+        
+        # Um único email para o pedido, na mesma transação das vendas
+        enfileirar_email_pedido(id_pedido, itens[0]['id'])
+        db.session.commit()
+        notificar_entrega()
         
         return jsonify({
             'mensagem': 'Compra realizada com sucesso',
-            'venda': venda.to_dict(),
-            'email_enviado': sucesso_email,
-            'mensagem_email': mensagem_email
+            'id_pedido': id_pedido,
+            'vendas': itens,
+            'preco_total': sum(precos[produto_id] for produto_id in produto_ids),
+            'email_enviado': False,
+            'email_agendado': True,
+            'mensagem_email': 'O envio dos PDFs por email foi agendado'
         }), 201
         
     except Exception as e:
@@ -129,10 +431,18 @@ def processar_compra():
 @vendas_bp.route('/vendas/minhas-compras', methods=['GET'])
 @login_required
 def minhas_compras():
-    """Lista as compras do cliente logado"""
+    """Lista as compras do cliente logado (paginadas por cursor)"""
     try:
-        vendas = Venda.query.filter_by(id_cliente=session['cliente_id']).order_by(Venda.data_venda.desc()).all()
-        return jsonify([venda.to_dict() for venda in vendas]), 200
+        pagina = paginar(
+            Venda.consulta_lista(Venda.query.filter_by(id_cliente=session['cliente_id'])),
+            [Venda.data_venda, Venda.id],
+            lambda vendas: [Venda.linha_to_dict(venda) for venda in vendas],
+            descendente=True,
+            **parametros_paginacao()
+        )
+        return jsonify(pagina), 200
+    except ErroPaginacao as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -146,39 +456,48 @@ def reenviar_email(venda_id):
         if not venda:
             return jsonify({'erro': 'Venda não encontrada'}), 404
         
-        # Obter dados necessários
-        cliente = venda.cliente
-        produto = venda.produto
-        
-        # Tentar enviar email
-        sucesso_email, mensagem_email = enviar_email_pdf(
-            cliente.email,
-            cliente.nome,
-            produto.nome,
-            produto.caminho_pdf
-        )
-        
-        if sucesso_email:
-            venda.email_enviado = True
+        # Evitar entregas duplicadas enquanto houver uma em andamento: a da
+        # própria venda ou a do pedido, que inclui os itens ainda não enviados
+        da_venda = and_(EntregaEmail.id_pedido.is_(None), EntregaEmail.id_venda == venda.id)
+        if venda.id_pedido and not venda.email_enviado:
+            da_venda = or_(da_venda, EntregaEmail.id_pedido == venda.id_pedido)
+        entrega_pendente = EntregaEmail.query.filter(
+            da_venda,
+            EntregaEmail.status.in_(['pendente', 'enviando'])
+        ).first()
+        
+        if not entrega_pendente:
+            enfileirar_email(venda)
             db.session.commit()
+        notificar_entrega()
         
         return jsonify({
-            'mensagem': 'Tentativa de reenvio realizada',
-            'email_enviado': sucesso_email,
-            'mensagem_email': mensagem_email
-        }), 200
+            'mensagem': 'Reenvio agendado',
+            'email_enviado': False,
+            'email_agendado': True,
+            'mensagem_email': 'O reenvio do PDF por email foi agendado'
+        }), 202
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
 # Rotas administrativas para gerenciar vendas
 @vendas_bp.route('/admin/vendas', methods=['GET'])
 def listar_vendas():
-    """Lista todas as vendas (rota administrativa)"""
+    """Lista as vendas, paginadas por cursor (rota administrativa)"""
     try:
         # TODO: Adicionar verificação de autenticação de admin
-        vendas = Venda.query.order_by(Venda.data_venda.desc()).all()
-        return jsonify([venda.to_dict() for venda in vendas]), 200
+        pagina = paginar(
+            Venda.consulta_lista(),
+            [Venda.data_venda, Venda.id],
+            lambda vendas: [Venda.linha_to_dict(venda) for venda in vendas],
+            descendente=True,
+            **parametros_paginacao()
+        )
+        return jsonify(pagina), 200
+    except ErroPaginacao as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
@@ -207,7 +526,9 @@ def atualizar_status_venda(venda_id):
         if data['status'] not in status_validos:
             return jsonify({'erro': f'Status deve ser um dos: {", ".join(status_validos)}'}), 400
         
-        venda.status = data['status']
+        if not registrar_mudanca_status(venda, data['status']):
+            db.session.rollback()
+            return jsonify({'erro': 'O status da venda foi alterado por outra requisição; tente novamente'}), 409
         db.session.commit()
         
         return jsonify({
@@ -219,41 +540,42 @@ def atualizar_status_venda(venda_id):
         db.session.rollback()
         return jsonify({'erro': str(e)}), 500
 
+@vendas_bp.route('/admin/vendas/enviar-pendentes', methods=['POST'])
+@admin_required
+def enviar_pendentes():
+    """Envia em lote os emails de todas as vendas pendentes (rota administrativa)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        resultado = enviar_emails_pendentes(data.get('limite'))
+        
+        if 'erro' in resultado:
+            return jsonify({'erro': resultado['erro']}), 400
+        
+        return jsonify({
+            'mensagem': f"{resultado['enviados']} email(s) enviado(s)",
+            'enviados': resultado['enviados'],
+            'falhas': resultado['falhas']
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': str(e)}), 500
+
 @vendas_bp.route('/admin/vendas/estatisticas', methods=['GET'])
 def estatisticas_vendas():
     """Obtém estatísticas de vendas (rota administrativa)"""
     try:
         # TODO: Adicionar verificação de autenticação de admin
-        from sqlalchemy import func
-        
-        # Total de vendas
-        total_vendas = Venda.query.count()
-        
-        # Total de receita
-        total_receita = db.session.query(func.sum(Venda.preco_total)).scalar() or 0
         
-        # Vendas por status
-        vendas_por_status = db.session.query(
-            Venda.status,
-            func.count(Venda.id)
-        ).group_by(Venda.status).all()
-        
-        # Produtos mais vendidos
-        produtos_mais_vendidos = db.session.query(
-            Produto.nome,
-            func.count(Venda.id).label('total_vendas')
-        ).join(Venda).group_by(Produto.id, Produto.nome).order_by(func.count(Venda.id).desc()).limit(5).all()
+        # Lidas dos resumos mantidos a cada venda e mudança de status
+        total_vendas, total_receita = totais_vendas()
         
         return jsonify({
             'total_vendas': total_vendas,
-            'total_receita': float(total_receita),
-            'vendas_por_status': dict(vendas_por_status),
-            'produtos_mais_vendidos': [
-                {'nome': nome, 'total_vendas': total}
-                for nome, total in produtos_mais_vendidos
-            ]
+            'total_receita': total_receita,
+            'vendas_por_status': vendas_por_status(),
+            'produtos_mais_vendidos': produtos_mais_vendidos(5)
         }), 200
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
-
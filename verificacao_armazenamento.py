@@ -0,0 +1,190 @@
+"""Verificação de um backend de armazenamento.
+
+Grava, lê e remove uma chave temporária, conferindo os metadados, o erro de
+chave inexistente, a deduplicação de gravar_arquivo e a URL assinada.
+Confere também se os caminhos absolutos dos produtos antigos são servidos. Roda
+contra o backend configurado (ex.: um MinIO local, com ARMAZENAMENTO=s3 e
+ARMAZENAMENTO_S3_ENDPOINT) ou, com --memoria, contra o backend S3 ligado a
+um cliente em memória, sem rede nem boto3.
+
+Uso: flask --app main verificar-armazenamento [--memoria]
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlparse, parse_qs
+from src.utils.armazenamento import ArmazenamentoS3, ClientError, criar_armazenamento
+from src.utils.uploads import caminhos_absolutos_inacessiveis
+
+TAMANHO_TESTE = 256 * 1024
+
+class ClienteS3Memoria:
+    """Cliente S3 em memória com as operações usadas por ArmazenamentoS3.
+
+    Responde e falha como o S3: HEAD de chave inexistente dá erro '404' e GET
+    dá 'NoSuchKey'. As URLs assinadas usam o esquema memoria:// e só servem
+    para conferir os parâmetros.
+    """
+
+    def __init__(self):
+        self.objetos = {}  # (bucket, chave) -> (conteúdo, tipo, data)
+        self._lock = threading.Lock()
+
+    def _objeto(self, bucket, chave, codigo, operacao):
+        with self._lock:
+            objeto = self.objetos.get((bucket, chave))
+        if objeto is None:
+            raise ClientError({'Error': {'Code': codigo, 'Message': 'Not Found'}}, operacao)
+        return objeto
+
+    def head_object(self, Bucket, Key):
+        conteudo, tipo, data = self._objeto(Bucket, Key, '404', 'HeadObject')
+        return {
+            'ContentLength': len(conteudo),
+            'ETag': f'"{hashlib.md5(conteudo, usedforsecurity=False).hexdigest()}"',
+            'LastModified': data,
+            'ContentType': tipo
+        }
+
+    def get_object(self, Bucket, Key):
+        conteudo, tipo, _ = self._objeto(Bucket, Key, 'NoSuchKey', 'GetObject')
+        return {'Body': io.BytesIO(conteudo), 'ContentLength': len(conteudo), 'ContentType': tipo}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        conteudo = Fileobj.read()
+        with self._lock:
+            self.objetos[(Bucket, Key)] = (
+                conteudo,
+                (ExtraArgs or {}).get('ContentType', 'binary/octet-stream'),
+                datetime.now(timezone.utc).replace(microsecond=0)
+            )
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        with open(Filename, 'rb') as arquivo:
+            self.upload_fileobj(arquivo, Bucket, Key, ExtraArgs, Config)
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objetos.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        parametros = {nome: valor for nome, valor in Params.items() if nome not in ('Bucket', 'Key')}
+        parametros['Expires'] = ExpiresIn
+        return f"memoria://{Params['Bucket']}/{Params['Key']}?{urlencode(parametros)}"
+
+class _ContadorEnvios:
+    """Repassa as chamadas ao cliente S3, contando os envios de arquivos"""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+        self.envios = 0
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._cliente, nome)
+        if nome not in ('upload_file', 'upload_fileobj'):
+            return atributo
+
+        def enviar(*args, **kwargs):
+            self.envios += 1
+            return atributo(*args, **kwargs)
+        return enviar
+
+def _baixar(url):
+    with urllib.request.urlopen(url, timeout=30) as resposta:
+        return resposta.read(), resposta.headers.get('Content-Disposition')
+
+def verificar_armazenamento(armazenamento):
+    """Exercita o backend com uma chave temporária e retorna (etapa, sucesso, detalhe)"""
+    resultados = []
+
+    def conferir(etapa, sucesso, detalhe=''):
+        resultados.append((etapa, bool(sucesso), detalhe))
+        return sucesso
+
+    contador = None
+    if isinstance(armazenamento, ArmazenamentoS3):
+        contador = armazenamento.cliente = _ContadorEnvios(armazenamento.cliente)
+
+    conteudo = os.urandom(TAMANHO_TESTE)
+    chave = f'verificacao/{uuid.uuid4().hex}.pdf'
+    try:
+        conferir('metadados de chave inexistente', armazenamento.metadados(chave) is None)
+        try:
+            armazenamento.abrir(chave).close()
+            conferir('abrir chave inexistente', False, 'não gerou FileNotFoundError')
+        except FileNotFoundError:
+            conferir('abrir chave inexistente', True)
+
+        info = armazenamento.gravar_stream(chave, io.BytesIO(conteudo))
+        conferir(
+            'gravar_stream', info is not None and info.tamanho == len(conteudo) and info.mimetype == 'application/pdf',
+            str(info)
+        )
+        with armazenamento.abrir(chave) as entrada:
+            conferir('abrir', entrada.read() == conteudo)
+
+        # O mesmo conteúdo de novo: o arquivo local é descartado, sem novo envio
+        descritor, temporario = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        caminho = armazenamento.caminho_local(chave)
+        inode = os.stat(caminho).st_ino if caminho else None
+        envios = contador.envios if contador else None
+        armazenamento.gravar_arquivo(temporario, chave)
+        reaproveitado = os.stat(caminho).st_ino == inode if caminho else contador.envios == envios
+        conferir('gravar_arquivo com chave existente', reaproveitado and not os.path.exists(temporario))
+
+        url = armazenamento.url_assinada(chave, 60, 'attachment; filename="teste.pdf"', 'application/pdf')
+        if caminho is not None:
+            conferir('url_assinada', url is None, 'o backend local não gera URLs')
+        elif url.startswith(('http://', 'https://')):
+            try:
+                baixado, disposicao = _baixar(url)
+                conferir('url_assinada', baixado == conteudo and disposicao == 'attachment; filename="teste.pdf"', disposicao)
+            except OSError as e:
+                conferir('url_assinada', False, str(e))
+        else:
+            parametros = parse_qs(urlparse(url).query)
+            conferir(
+                'url_assinada',
+                urlparse(url).path.endswith(chave) and
+                parametros.get('ResponseContentDisposition') == ['attachment; filename="teste.pdf"'],
+                url
+            )
+    except Exception as e:
+        conferir('erro inesperado', False, f'{type(e).__name__}: {e}')
+    finally:
+        try:
+            armazenamento.remover(chave)
+            conferir('remover', armazenamento.metadados(chave) is None)
+        except Exception as e:
+            conferir('remover', False, f'{type(e).__name__}: {e}')
+        if contador is not None:
+            armazenamento.cliente = contador._cliente
+    return resultados
+
+def executar(config, memoria=False):
+    """Ponto de entrada do comando: imprime as etapas e retorna o código de saída"""
+    if memoria:
+        armazenamento = ArmazenamentoS3('verificacao', 'arquivos', cliente=ClienteS3Memoria())
+    else:
+        # Instância própria: a verificação não passa pelo cache do app
+        armazenamento = criar_armazenamento(config)
+    resultados = verificar_armazenamento(armazenamento)
+    if not memoria:
+        inacessiveis = caminhos_absolutos_inacessiveis(armazenamento)
+        resultados.append((
+            'caminhos absolutos de produtos', not inacessiveis,
+            f'{len(inacessiveis)} fora do armazenamento (ex.: {inacessiveis[0]}); rode flask migrar-arquivos'
+            if inacessiveis else ''
+        ))
+    for etapa, sucesso, detalhe in resultados:
+        print(f"{'OK   ' if sucesso else 'FALHA'} {etapa}" + (f': {detalhe}' if detalhe and not sucesso else ''))
+    falhas = sum(1 for _, sucesso, _ in resultados if not sucesso)
+    print(f'{armazenamento.nome}: {len(resultados) - falhas} etapa(s) ok, {falhas} falha(s)')
+    return 1 if falhas else 0